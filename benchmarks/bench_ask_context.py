@@ -0,0 +1,89 @@
+"""
+Latency of the /ask service path (context loading plus history writes).
+
+Usage: python -m benchmarks.bench_ask_context [--users 16] [--questions 40] [--history 300]
+
+Seeds a file SQLite database (production profile) with ``--history`` messages,
+meals, water and weight entries per user, then lets every user ask
+``--questions`` questions concurrently through ask_service.handle_question. The
+dietitian runs without an API key, so the reply is the local stub and the
+numbers are the database cost of the handler. Reports p50/p99 per question.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from bot import db, models  # noqa: F401
+from bot.models import ConversationMessage, Meal, User, WaterIntake, WeightLog
+from bot.services.ai_dietitian import AiDietitianService
+from bot.services.ask_service import handle_question
+
+
+async def _seed(users: int, history: int) -> list[User]:
+    now = datetime.now(timezone.utc)
+    async with db.get_session_maker()() as session:
+        seeded = [User(telegram_id=20_000 + n, language="en") for n in range(users)]
+        session.add_all(seeded)
+        await session.flush()
+        for user in seeded:
+            for i in range(history):
+                at = now - timedelta(minutes=10 * i)
+                session.add_all(
+                    [
+                        ConversationMessage(user_id=user.id, role="user", content=f"question {i}", created_at=at),
+                        Meal(user_id=user.id, meal_type="lunch", raw_text=f"meal {i}", created_at=at),
+                        WaterIntake(user_id=user.id, volume_ml=250, datetime=at),
+                        WeightLog(user_id=user.id, weight_kg=70 + i / 100, datetime=at),
+                    ]
+                )
+        await session.commit()
+    return seeded
+
+
+async def run(users: int, questions: int, history: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db.setup_database(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", sqlite_profile="production")
+        await db.init_db()
+        seeded = await _seed(users, history)
+        session_maker = db.get_session_maker()
+        service = AiDietitianService(openai_api_key=None)
+        latencies: list[float] = []
+
+        async def ask(user: User) -> None:
+            for i in range(questions):
+                started = time.perf_counter()
+                async with session_maker() as session:
+                    await handle_question(session, service, user, f"what about dinner {i}?", "en")
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(ask(user) for user in seeded))
+        elapsed = time.perf_counter() - started
+        await db.dispose_database()
+
+    latencies.sort()
+    return {
+        "questions": len(latencies),
+        "seconds": round(elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--questions", type=int, default=40)
+    parser.add_argument("--history", type=int, default=300)
+    args = parser.parse_args()
+    print(await run(args.users, args.questions, args.history))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
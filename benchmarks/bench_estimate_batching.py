@@ -0,0 +1,82 @@
+"""
+Throughput of text meal estimates with and without micro-batching.
+
+Usage: python -m benchmarks.bench_estimate_batching [--calls 200] [--users 64] [--latency-ms 400]
+
+Starts benchmarks.fake_openai in-process and points the openai SDK at it, then lets
+``--users`` concurrent users log ``--calls`` distinct meals through
+AiNutritionService (estimate cache disabled, default admission limits from
+settings.llm). Reports wall time, estimates/s, caller latency and upstream requests.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from dataclasses import replace
+
+from benchmarks.fake_openai import FakeOpenAIConfig, start_fake_openai
+from bot.services.ai_nutrition import AiNutritionService
+from bot.settings import settings
+
+_PORT = 8199
+
+
+async def run(batching: bool, calls: int, users: int) -> dict:
+    service = AiNutritionService(
+        openai_api_key="bench",
+        batching=replace(settings.estimate_batching, enabled=batching),
+    )
+    gate = asyncio.Semaphore(users)
+    latencies: list[float] = []
+    fallbacks = 0
+
+    async def one(index: int) -> None:
+        nonlocal fallbacks
+        async with gate:
+            started = time.perf_counter()
+            result = await service.estimate_meal_from_text(f"meal number {index} with rice", "en", user_id=index)
+            latencies.append(time.perf_counter() - started)
+            if result.get("ai_notes") != "fake estimate":
+                fallbacks += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(calls)))
+    elapsed = time.perf_counter() - started
+    await service.client.close()
+
+    latencies.sort()
+    return {
+        "batching": batching,
+        "seconds": round(elapsed, 2),
+        "estimates_per_sec": round(calls / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000),
+        "fallbacks": fallbacks,
+        "batches": service.batches_sent,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    args = parser.parse_args()
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{_PORT}/v1"
+    runner, stats = await start_fake_openai(port=_PORT, config=FakeOpenAIConfig(latency_ms=args.latency_ms))
+    try:
+        for batching in (False, True):
+            before = stats.requests
+            result = await run(batching, args.calls, args.users)
+            result["upstream_requests"] = stats.requests - before
+            print(result)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
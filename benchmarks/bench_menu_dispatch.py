@@ -0,0 +1,97 @@
+"""
+Dispatch cost per text update: F.text.in_ filters vs the menu index.
+
+Usage: python -m benchmarks.bench_menu_dispatch [--updates 2000]
+
+Builds an aiogram Dispatcher with one router per menu entry (plus the catch-all
+text router last, like misc.unknown_text) for a grid of language and entry
+counts, with synthetic button texts. "filters" gives each router an F.text.in_
+filter over all languages, as the handlers used to; "index" uses
+MenuActionMiddleware + MenuAction. Half of the updates press a random button,
+half are free text that falls through to the catch-all. Handlers do nothing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import Chat, Message, Update, User
+
+from bot.menu import MenuAction, build_menu_index
+from bot.middlewares import MenuActionMiddleware
+
+
+async def _noop(message: Message) -> None:
+    return None
+
+
+def _dispatcher(mode: str, strings_by_lang: dict[str, dict[str, str]], keys: list[str]) -> Dispatcher:
+    dp = Dispatcher()
+    for key in keys:
+        router = Router()
+        if mode == "filters":
+            router.message.register(_noop, F.text.in_({strings[key] for strings in strings_by_lang.values()}))
+        else:
+            router.message.register(_noop, MenuAction(key))
+        dp.include_router(router)
+    fallback = Router()
+    fallback.message.register(_noop, F.text)
+    dp.include_router(fallback)
+    if mode == "index":
+        dp.message.outer_middleware(MenuActionMiddleware(build_menu_index(tuple(keys), strings_by_lang)))
+    return dp
+
+
+def _update(update_id: int, text: str) -> Update:
+    user = User(id=1000 + update_id % 50, is_bot=False, first_name="bench")
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=user.id, type="private"),
+        from_user=user,
+        text=text,
+    )
+    return Update(update_id=update_id, message=message)
+
+
+async def run(mode: str, languages: int, entries: int, updates: int) -> float:
+    keys = [f"action_{n}" for n in range(entries)]
+    strings_by_lang = {f"l{lang}": {key: f"Button {key} [{lang}]" for key in keys} for lang in range(languages)}
+    buttons = [text for strings in strings_by_lang.values() for text in strings.values()]
+    rng = random.Random(7)
+    batch = [
+        _update(n, rng.choice(buttons) if n % 2 else f"some free text {n}") for n in range(updates)
+    ]
+
+    dp = _dispatcher(mode, strings_by_lang, keys)
+    bot = Bot(token="42:BENCH")
+    for update in batch[:200]:  # warm up
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for update in batch:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return elapsed / updates
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2_000)
+    args = parser.parse_args()
+
+    print(f"{'languages':>9} {'entries':>7} {'filters_us':>10} {'index_us':>9}")
+    for languages in (3, 10, 30):
+        for entries in (8, 16, 32):
+            filters = await run("filters", languages, entries, args.updates)
+            index = await run("index", languages, entries, args.updates)
+            print(f"{languages:>9} {entries:>7} {filters * 1e6:>10.1f} {index * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
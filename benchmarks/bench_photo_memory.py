@@ -0,0 +1,137 @@
+"""
+Peak memory per in-flight photo on the meal photo path.
+
+Usage: python -m benchmarks.bench_photo_memory [--photos 24] [--size-mb 4.5]
+
+Each mode runs in a fresh subprocess, so ``ru_maxrss`` starts from the same baseline.
+``--photos`` uploads are "downloaded" concurrently from 64 KiB chunks (as aiogram
+streams them) and turned into the data URL sent to the vision model:
+
+- legacy:   BytesIO -> getvalue() -> base64.b64encode().decode() -> f-string
+- zerocopy: DownloadBuffer memoryview -> encode_data_url (no resizing)
+- pipeline: DownloadBuffer memoryview -> prepare_photo -> encode_data_url (what the bot does)
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+from bot.services.photo_pipeline import DownloadBuffer, encode_data_url, prepare_photo_async
+
+MODES = ("legacy", "zerocopy", "pipeline")
+_CHUNK = 64 * 1024
+
+
+def _make_photo(size_mb: float) -> bytes:
+    from PIL import Image
+
+    # Noise compresses badly, so the JPEG gets close to the requested size.
+    side = int((size_mb * 1024 * 1024 / 0.9) ** 0.5)
+    image = Image.effect_noise((side, side), 90).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95)
+    return output.getvalue()
+
+
+async def _stream(source: bytes):
+    for start in range(0, len(source), _CHUNK):
+        await asyncio.sleep(0)
+        yield source[start : start + _CHUNK]
+
+
+async def _legacy(source: bytes) -> str:
+    buffer = io.BytesIO()
+    async for chunk in _stream(source):
+        buffer.write(chunk)
+    photo_bytes = buffer.getvalue()
+    b64_image = base64.b64encode(photo_bytes).decode()
+    return f"data:image/jpeg;base64,{b64_image}"
+
+
+async def _zerocopy(source: bytes) -> str:
+    buffer = DownloadBuffer(len(source), len(source))
+    async for chunk in _stream(source):
+        buffer.write(chunk)
+    return encode_data_url(buffer.getbuffer(), "image/jpeg")
+
+
+async def _pipeline(source: bytes) -> str:
+    buffer = DownloadBuffer(len(source), len(source))
+    async for chunk in _stream(source):
+        buffer.write(chunk)
+    prepared = await prepare_photo_async(buffer.getbuffer())
+    return encode_data_url(prepared.data, prepared.mime_type)
+
+
+def _rss_kib() -> int:
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+async def run_child(mode: str, photos: int, size_mb: float) -> dict:
+    from bot.settings import settings
+
+    source = _make_photo(size_mb)
+    settings.limits.max_photo_size_bytes = max(settings.limits.max_photo_size_bytes, len(source))
+    handler = {"legacy": _legacy, "zerocopy": _zerocopy, "pipeline": _pipeline}[mode]
+    await handler(source)  # warm up imports and thread pool outside the measurement
+
+    rss_before = _rss_kib()
+    tracemalloc.start()
+    payloads = await asyncio.gather(*(handler(source) for _ in range(photos)))
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_peak = _rss_kib()
+
+    return {
+        "mode": mode,
+        "photos": photos,
+        "photo_kib": len(source) // 1024,
+        "payload_kib": len(payloads[0]) // 1024,
+        "python_peak_kib_per_photo": traced_peak // 1024 // photos,
+        "rss_growth_kib_per_photo": (rss_peak - rss_before) // photos,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=24)
+    parser.add_argument("--size-mb", type=float, default=4.5)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_child(args.mode, args.photos, args.size_mb))))
+        return
+
+    for mode in MODES:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_photo_memory",
+                "--mode",
+                mode,
+                "--photos",
+                str(args.photos),
+                "--size-mb",
+                str(args.size_mb),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        print(json.loads(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Cost of building a typical reply: translated texts plus the main menu keyboard.
+
+Usage: python -m benchmarks.bench_replies [--number 20000]
+
+"rebuilt" constructs the keyboard from scratch and formats every template (how
+replies were built before the keyboard registry and compiled templates);
+"prebuilt" goes through keyboards.main_menu() and i18n.t(). Times are per reply.
+"""
+
+from __future__ import annotations
+
+import argparse
+import timeit
+
+from bot import keyboards
+from bot.i18n import SUPPORTED_LANGUAGES, t, translations
+
+
+def _format_t(lang: str, key: str, **kwargs) -> str:
+    # t() as it was: look up and always run str.format.
+    lang_map = translations.get(lang) or translations["en"]
+    template = lang_map.get(key) or translations["en"].get(key, key)
+    return template.format(**kwargs)
+
+
+def _reply(translate, menu) -> None:
+    for lang in SUPPORTED_LANGUAGES:
+        translate(lang, "stats_today_title")
+        translate(lang, "stats_today_line", calories=1850, protein=92, fat=61, carbs=210)
+        translate(lang, "stats_today_macros_title")
+        menu(lang)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    cases = {
+        "rebuilt": lambda: _reply(_format_t, keyboards._build_main_menu),
+        "prebuilt": lambda: _reply(t, keyboards.main_menu),
+        "t_plain_format": lambda: _format_t("ru", "stats_today_title"),
+        "t_plain_compiled": lambda: t("ru", "stats_today_title"),
+    }
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=args.number, repeat=3))
+        per_call = seconds / args.number
+        if name in ("rebuilt", "prebuilt"):
+            per_call /= len(SUPPORTED_LANGUAGES)
+        print(f"{name:18} {per_call * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
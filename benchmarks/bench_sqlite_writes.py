@@ -0,0 +1,84 @@
+"""
+Concurrent write/read throughput of the SQLite "default" vs "production" profile.
+
+Usage: python -m benchmarks.bench_sqlite_writes [--workers 32] [--ops 50]
+
+Every worker logs meals, water and weight for its own user and reads /stats in
+between, the same mix the handlers produce. Failed operations (e.g. "database is
+locked") are counted rather than raised.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from bot import db, models  # noqa: F401
+from bot.models import User
+from bot.services.meal_service import log_text_meal
+from bot.services.stats_service import fetch_daily_stats
+from bot.services.water_service import add_water_and_total
+from bot.services.weight_service import log_weight
+
+
+async def _worker(user: User, ops: int, errors: list[str]) -> None:
+    session_maker = db.get_session_maker()
+    for i in range(ops):
+        try:
+            async with session_maker() as session:
+                kind = i % 4
+                if kind == 0:
+                    await log_text_meal(session, user.id, "lunch", "oatmeal with banana", "en", None)
+                elif kind == 1:
+                    await add_water_and_total(session, user.id, 250)
+                elif kind == 2:
+                    await log_weight(session, user, 70 + i / 100)
+                else:
+                    await fetch_daily_stats(session, user.id)
+        except Exception as exc:  # noqa: BLE001
+            errors.append(type(exc).__name__ + ": " + str(exc).splitlines()[0])
+
+
+async def run_profile(profile: str, workers: int, ops: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db.setup_database(f"sqlite+aiosqlite:///{path}", sqlite_profile=profile)
+        await db.init_db()
+
+        async with db.get_session_maker()() as session:
+            users = [User(telegram_id=10_000 + n, language="en") for n in range(workers)]
+            session.add_all(users)
+            await session.commit()
+
+        errors: list[str] = []
+        started = time.perf_counter()
+        await asyncio.gather(*(_worker(user, ops, errors) for user in users))
+        elapsed = time.perf_counter() - started
+        await db.dispose_database()
+
+    total = workers * ops
+    return {
+        "profile": profile,
+        "ops": total,
+        "seconds": round(elapsed, 3),
+        "ops_per_sec": round((total - len(errors)) / elapsed, 1),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=50)
+    args = parser.parse_args()
+
+    for profile in ("default", "production"):
+        print(await run_profile(profile, args.workers, args.ops))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+Sustained update throughput of webhook mode.
+
+Usage: python -m benchmarks.bench_webhook [--updates 3000] [--connections 40] [--in-flight 64]
+
+Runs the real dispatcher (bot.main.create_dispatcher) behind bot.webhook on a
+temporary SQLite database with seeded users, with a Bot pointed at
+benchmarks.fake_telegram. Then it posts synthetic updates the way Telegram does:
+``--connections`` requests open at once, each with the secret token header. The
+mix is /help, the Stats button, /stats week and free text. Reports updates/s
+until every update was handled, plus the time it took to acknowledge each request.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import aiohttp
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+from benchmarks.fake_telegram import FakeTelegramConfig, start_fake_telegram
+from bot import db
+from bot.config import Settings
+from bot.i18n import t
+from bot.main import create_dispatcher
+from bot.models import User
+from bot.services import build_ai_dietitian_service, build_ai_nutrition_service
+from bot.settings import settings
+from bot.webhook import create_webhook_app
+
+_TELEGRAM_PORT = 8181
+_WEBHOOK_PORT = 8182
+_SECRET = "bench-secret"
+_TEXTS = ("/help", t("en", "menu_stats"), "/stats week", "how are you today?")
+
+
+def _update(update_id: int, telegram_id: int, text: str) -> dict:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": telegram_id, "type": "private"},
+        "from": {"id": telegram_id, "is_bot": False, "first_name": "bench"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=3_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=40)
+    parser.add_argument("--in-flight", type=int, default=64)
+    parser.add_argument("--telegram-latency-ms", type=float, default=30.0)
+    args = parser.parse_args()
+    # aiogram logs every handled update at INFO.
+    logging.getLogger("aiogram").setLevel(logging.WARNING)
+    # Each synthetic user sends far more than a person would; measure the pipeline, not the throttle.
+    settings.flood_control.enabled = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.setup_database(database_url)
+        await db.init_db()
+        async with db.get_session_maker()() as session:
+            session.add_all([User(telegram_id=50_000 + n, language="en") for n in range(args.users)])
+            await session.commit()
+
+        telegram_runner, telegram = await start_fake_telegram(
+            port=_TELEGRAM_PORT, config=FakeTelegramConfig(latency_ms=args.telegram_latency_ms)
+        )
+        config = Settings(
+            telegram_bot_token="42:BENCH",
+            database_url=database_url,
+            bot_mode="webhook",
+            webhook_secret=_SECRET,
+            webhook_max_in_flight=args.in_flight,
+        )
+        bot = Bot(
+            token=config.telegram_bot_token,
+            session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{_TELEGRAM_PORT}")),
+            default=DefaultBotProperties(parse_mode="HTML"),
+        )
+        bot.ai_service = build_ai_nutrition_service(config, session_maker=db.get_session_maker())
+        bot.ai_dietitian_service = build_ai_dietitian_service(config, session_maker=db.get_session_maker())
+        bot.session_maker = db.get_session_maker()
+
+        app, handler = create_webhook_app(create_dispatcher(), bot, config)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", _WEBHOOK_PORT).start()
+        url = f"http://127.0.0.1:{_WEBHOOK_PORT}{config.webhook_path}"
+
+        ack_times: list[float] = []
+        queue: asyncio.Queue[dict] = asyncio.Queue()
+        for n in range(args.updates):
+            queue.put_nowait(_update(n + 1, 50_000 + n % args.users, _TEXTS[n % len(_TEXTS)]))
+
+        async with aiohttp.ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": _SECRET}) as client:
+            async with client.post(url, json=_update(0, 1, "/help"), headers={"X-Telegram-Bot-Api-Secret-Token": "x"}) as resp:
+                assert resp.status == 401, resp.status
+
+            async def connection() -> None:
+                while not queue.empty():
+                    update = queue.get_nowait()
+                    started = time.perf_counter()
+                    async with client.post(url, json=update) as resp:
+                        await resp.read()
+                    ack_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(connection() for _ in range(args.connections)))
+            while handler.handled + handler.failed < args.updates:
+                await asyncio.sleep(0.005)
+            elapsed = time.perf_counter() - started
+
+        await runner.cleanup()
+        await telegram_runner.cleanup()
+        await db.dispose_database()
+
+    ack_times.sort()
+    print(
+        {
+            "updates": args.updates,
+            "seconds": round(elapsed, 2),
+            "updates_per_sec": round(args.updates / elapsed, 1),
+            "ack_p50_ms": round(ack_times[len(ack_times) // 2] * 1000, 1),
+            "ack_p99_ms": round(ack_times[int(len(ack_times) * 0.99)] * 1000, 1),
+            **handler.stats(),
+            "telegram_calls": telegram.stats.by_method,
+        }
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,174 @@
+"""
+Query plan regression check for the service layer.
+
+Usage: python -m benchmarks.check_query_plans [-v]
+
+Runs every service query against a seeded in-memory SQLite database, captures the
+SQL that was actually emitted and runs ``EXPLAIN QUERY PLAN`` on each SELECT,
+UPDATE and DELETE. Exits with status 1 if any of them falls back to a full table
+scan or sorts through a temporary B-tree instead of walking an index.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import event
+
+from bot import db, models  # noqa: F401
+from bot.fsm_storage import SqlAlchemyStorage
+from bot.models import User
+from bot.services import (
+    ask_service,
+    conversation_memory,
+    history_archive,
+    recipe_service,
+    stats_service,
+    user_service,
+)
+from bot.services.ai_dietitian import AiDietitianService
+from bot.services.estimate_cache import EstimateCache
+from bot.services.photo_cache import PhotoEstimateCache
+from bot.services.meal_service import log_text_meal
+from bot.services.water_service import add_water_and_total
+from bot.services.weight_service import log_weight
+from bot.settings import settings
+
+_CHECKED_PREFIXES = ("SELECT", "UPDATE", "DELETE")
+# Statements that walk a whole cache table's index on purpose, cut off by LIMIT: cache
+# eviction's "find the N-th newest row". They read a bounded number of index entries;
+# every other index walk still counts as a scan.
+_BOUNDED_INDEX_WALKS = (
+    "SELECT estimate_cache.last_used_at FROM estimate_cache ORDER BY ",
+    "SELECT photo_estimate_cache.last_used_at FROM photo_estimate_cache ORDER BY ",
+)
+
+
+def _bad_plan_rows(statement: str, rows: list[tuple]) -> list[str]:
+    bounded = " ".join(statement.split()).startswith(_BOUNDED_INDEX_WALKS) and " LIMIT " in statement.upper()
+    # Reading back a subquery's own (already index-driven) result is not a table scan.
+    subqueries = {
+        str(row[-1]).split(" ", 1)[1] for row in rows if str(row[-1]).startswith(("CO-ROUTINE ", "MATERIALIZE "))
+    }
+    bad = []
+    for row in rows:
+        detail = str(row[-1])
+        if detail.startswith("SCAN ") and detail[5:] in subqueries:
+            continue
+        if bounded and detail.startswith("SCAN") and " USING " in detail and "INDEX" in detail:
+            continue
+        if detail.startswith("SCAN") and "CONSTANT ROW" not in detail:
+            bad.append(detail)
+        elif "USE TEMP B-TREE" in detail:
+            bad.append(detail)
+    return bad
+
+
+async def _exercise_services(session_maker) -> None:
+    async with session_maker() as session:
+        user = User(telegram_id=1, language="en")
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+
+    await user_service.get_cached_user(session_maker, user.telegram_id)
+
+    ai_dietitian = AiDietitianService(openai_api_key=None)
+    async with session_maker() as session:
+        await log_text_meal(session, user.id, "lunch", "soup", "en", None)
+        await add_water_and_total(session, user.id, 250)
+        await log_weight(session, user, 70.0)
+        await stats_service.fetch_daily_stats(session, user.id)
+        await stats_service.fetch_range_stats(session, user.id, *stats_service.preset_range("month"))
+        await ask_service.handle_question(session, ai_dietitian, user, "What should I eat?", "en")
+        await conversation_memory.save_summary(session, user.id, "Wants to eat less sugar.", datetime.now(timezone.utc))
+        await conversation_memory.load_unsummarized(session, user.id, 10)
+        await ask_service.handle_question(session, ai_dietitian, user, "And for dinner?", "en")
+        await history_archive.archive_user_history(
+            session, user.id, replace(settings.history_retention, keep_messages=1, min_chunk=1)
+        )
+        await history_archive.export_history(session, user.id)
+        recipe = await recipe_service.create_recipe(session, user.id, "Soup", "Boil water")
+        await recipe_service.list_recipes(session, user.id)
+        await recipe_service.get_recipe(session, user.id, recipe.id)
+        await recipe_service.update_recipe_title(session, user.id, recipe.id, "Soup 2")
+        await recipe_service.delete_recipe(session, user.id, recipe.id)
+        await stats_service.reset_today(session, user.id)
+        await stats_service.reset_all(session, user.id)
+
+    async with session_maker() as session:
+        async with session.begin():
+            await user_service.delete_user_with_data(session, user.id)
+
+    estimate_cache = EstimateCache(session_maker)
+    await estimate_cache.put("oatmeal with banana", "en", "model", {"calories": 350.0})
+    estimate_cache.memory.clear()
+    await estimate_cache.get("oatmeal with banana", "en", "model")
+    async with session_maker() as session:
+        await estimate_cache.evict(session)
+        await session.commit()
+
+    photo_cache = PhotoEstimateCache(session_maker)
+    await photo_cache.put("file-1", user.id, 0x0F0F0F0F0F0F0F0F, "model", {"calories": 500.0})
+    photo_cache.memory.clear()
+    photo_cache._hashes.clear()
+    await photo_cache.get_by_file("file-1")
+    await photo_cache.get_similar(user.id, 0x0F0F0F0F0F0F0F0E)
+    async with session_maker() as session:
+        await photo_cache.evict(session)
+        await session.commit()
+
+    fsm_storage = SqlAlchemyStorage(session_maker)
+    key = StorageKey(bot_id=42, chat_id=1, user_id=1)
+    await fsm_storage.update_data(key, {"meal_type": "lunch"})
+    await fsm_storage.flush()
+    await fsm_storage.set_data(key, {})
+    await fsm_storage.flush()
+    await fsm_storage.expire()
+    await fsm_storage.close()
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan, not only failures")
+    args = parser.parse_args()
+
+    db.setup_database("sqlite+aiosqlite:///:memory:")
+    await db.init_db()
+    assert db.engine is not None
+
+    captured: dict[str, tuple] = {}
+
+    @event.listens_for(db.engine.sync_engine, "before_cursor_execute")
+    def _capture(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().upper().startswith(_CHECKED_PREFIXES):
+            captured.setdefault(statement, parameters)
+
+    await _exercise_services(db.get_session_maker())
+    event.remove(db.engine.sync_engine, "before_cursor_execute", _capture)
+
+    failures = 0
+    async with db.engine.connect() as conn:
+        for statement, parameters in captured.items():
+            result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            rows = [tuple(row) for row in result]
+            bad = _bad_plan_rows(statement, rows)
+            if bad:
+                failures += 1
+            if bad or args.verbose:
+                print("FAIL" if bad else "ok", " ".join(statement.split()))
+                for row in rows:
+                    print("    ", row[-1])
+
+    await db.dispose_database()
+    print(f"{len(captured)} statements checked, {failures} with scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,198 @@
+"""
+Local stand-in for the OpenAI Chat Completions API, for benchmarks and load tests.
+
+Usage: python -m benchmarks.fake_openai [--port 8099] [--latency-ms 400] [--error-rate 0]
+
+Point the bot at it with ``OPENAI_BASE_URL=http://127.0.0.1:8099/v1`` (read by the
+openai SDK) and any non-empty ``OPENAI_API_KEY``. Answers are deterministic per
+input text. A user message that is a JSON array is answered as a batch
+(``{"items": [...]}``); ``"stream": true`` requests get server-sent event chunks.
+``GET /stats`` returns request counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+# Roughly what a 1024px "detail: low/auto" image costs on the real API.
+_IMAGE_TOKENS = 765
+
+
+@dataclass
+class FakeOpenAIConfig:
+    latency_ms: float = 400.0
+    # Extra latency per item of a batched request (the model writes more tokens).
+    per_item_ms: float = 40.0
+    jitter_ms: float = 50.0
+    error_rate: float = 0.0
+    # Delay between streamed chunks; ``latency_ms`` is then the time to the first one.
+    chunk_interval_ms: float = 30.0
+
+
+@dataclass
+class FakeOpenAIStats:
+    requests: int = 0
+    items: int = 0
+    errors: int = 0
+    by_kind: dict[str, int] = field(default_factory=dict)
+
+
+def _estimate_for(text: str) -> dict:
+    seed = int(hashlib.sha256(text.encode()).hexdigest()[:8], 16)
+    calories = 150 + seed % 700
+    return {
+        "calories": float(calories),
+        "protein_g": round(calories * 0.05, 1),
+        "fat_g": round(calories * 0.03, 1),
+        "carbs_g": round(calories * 0.12, 1),
+        "fiber_g": 4.0,
+        "sugar_g": 8.0,
+        "ai_notes": "fake estimate",
+    }
+
+
+def _completion(content: str, prompt_chars: int) -> dict:
+    completion_tokens = max(1, len(content) // 4)
+    prompt_tokens = max(1, prompt_chars // 4)
+    return {
+        "id": f"chatcmpl-fake-{time.monotonic_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "fake",
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _chunk(delta: str) -> dict:
+    return {
+        "id": "chatcmpl-fake-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "fake",
+        "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+    }
+
+
+def _prompt_chars(messages: list[dict]) -> int:
+    chars = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            for part in content:
+                # The real API bills an image by tiles, not by the size of its base64 payload.
+                chars += len(part.get("text", "")) if part.get("type") == "text" else _IMAGE_TOKENS * 4
+        else:
+            chars += len(content)
+    return chars
+
+
+def _user_text(messages: list[dict]) -> str:
+    content = messages[-1].get("content", "") if messages else ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return content
+
+
+def create_app(config: FakeOpenAIConfig | None = None) -> web.Application:
+    config = config or FakeOpenAIConfig()
+    stats = FakeOpenAIStats()
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app["stats"] = stats
+
+    async def stream_completion(request: web.Request, content: str) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = content.split(" ")
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(config.chunk_interval_ms / 1000)
+            delta = word if index == 0 else " " + word
+            await response.write(f"data: {json.dumps(_chunk(delta))}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt_chars = _prompt_chars(messages)
+        text = _user_text(messages)
+        stats.requests += 1
+
+        try:
+            batch = json.loads(text)
+        except ValueError:
+            batch = None
+        items = len(batch) if isinstance(batch, list) else 1
+        stats.items += items
+
+        is_json = (body.get("response_format") or {}).get("type") == "json_object"
+        kind = "batch" if isinstance(batch, list) else ("estimate" if is_json else "chat")
+        stats.by_kind[kind] = stats.by_kind.get(kind, 0) + 1
+
+        delay = config.latency_ms + config.per_item_ms * (items - 1) + random.uniform(0, config.jitter_ms)
+        await asyncio.sleep(delay / 1000)
+        if random.random() < config.error_rate:
+            stats.errors += 1
+            return web.json_response({"error": {"message": "fake overload", "type": "server_error"}}, status=503)
+
+        if kind == "batch":
+            content = json.dumps(
+                {"items": [{"id": item.get("id"), **_estimate_for(str(item.get("description")))} for item in batch]}
+            )
+        elif kind == "estimate":
+            content = json.dumps(_estimate_for(text))
+        else:
+            content = f"Fake advice for: {text[-80:]}"
+        if body.get("stream"):
+            return await stream_completion(request, content)
+        return web.json_response(_completion(content, prompt_chars))
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats.__dict__)
+
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+async def start_fake_openai(
+    host: str = "127.0.0.1", port: int = 8099, config: FakeOpenAIConfig | None = None
+) -> tuple[web.AppRunner, FakeOpenAIStats]:
+    app = create_app(config)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, app["stats"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--per-item-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(latency_ms=args.latency_ms, per_item_ms=args.per_item_ms, error_rate=args.error_rate)
+    web.run_app(create_app(config), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
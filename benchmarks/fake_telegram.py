@@ -0,0 +1,198 @@
+"""
+Local stand-in for the Telegram Bot API, for load tests.
+
+Usage: python -m benchmarks.fake_telegram [--port 8081] [--latency-ms 30]
+
+Answers ``POST /bot<token>/<method>`` like the real API closely enough for the bot's
+handlers: send*/edit* methods echo a Message built from the request, ``getUpdates``
+long-polls a queue fed with ``FakeTelegram.push_update`` (or ``POST /updates``),
+``getFile`` describes a generated JPEG that ``GET /file/bot<token>/<path>`` serves,
+everything else returns ``true``. Point an aiogram Bot at it with
+``AiohttpSession(api=TelegramAPIServer.from_base("http://127.0.0.1:8081"))``, or run
+the bot with ``TELEGRAM_API_BASE=http://127.0.0.1:8081``. ``GET /stats`` returns
+per-method counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import random
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+_BOT_USER = {"id": 42, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+@dataclass
+class FakeTelegramConfig:
+    latency_ms: float = 30.0
+    jitter_ms: float = 10.0
+    # Distinct generated photos served by file download (chosen by file_id).
+    photo_variants: int = 16
+    photo_side_px: int = 640
+
+
+@dataclass
+class FakeTelegramStats:
+    requests: int = 0
+    by_method: dict[str, int] = field(default_factory=dict)
+    updates_pushed: int = 0
+    updates_delivered: int = 0
+    downloads: int = 0
+
+
+def _message(message_id: int, params: dict) -> dict:
+    chat_id = int(params.get("chat_id", 0))
+    message = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": _BOT_USER,
+    }
+    if "text" in params:
+        message["text"] = params["text"]
+    if "caption" in params:
+        message["caption"] = params["caption"]
+    return message
+
+
+def _photo(seed: int, side: int) -> bytes:
+    from PIL import Image
+
+    # Noise differs on every call, so variants do not collapse in the bot's dHash photo cache.
+    image = Image.effect_noise((side, side), 60 + seed % 40).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+class FakeTelegram:
+    """State behind the app: counters, the getUpdates queue and what the bot sent per chat."""
+
+    def __init__(self, config: FakeTelegramConfig | None = None) -> None:
+        self.config = config or FakeTelegramConfig()
+        self.stats = FakeTelegramStats()
+        self.sent: dict[int, list[dict]] = defaultdict(list)
+        self._updates: list[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._photos: dict[int, bytes] = {}
+
+    def push_update(self, update: dict) -> int:
+        """Queue an update for getUpdates (``update_id`` is assigned); returns its id."""
+
+        update_id = next(self._update_ids)
+        self._updates.append({**update, "update_id": update_id})
+        self.stats.updates_pushed += 1
+        self._new_updates.set()
+        return update_id
+
+    async def get_updates(self, offset: int, limit: int, timeout: float) -> list[dict]:
+        # Like Telegram, an offset confirms every update before it.
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        batch = [update for update in self._updates if update["update_id"] >= offset][:limit]
+        self.stats.updates_delivered += len(batch)
+        return batch
+
+    def photo(self, file_id: str) -> bytes:
+        variant = zlib.crc32(file_id.encode()) % self.config.photo_variants
+        if variant not in self._photos:
+            self._photos[variant] = _photo(variant, self.config.photo_side_px)
+        return self._photos[variant]
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app["telegram"] = self
+        app["stats"] = self.stats
+        app.router.add_post("/bot{token}/{method}", self._call_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self._download)
+        app.router.add_post("/updates", self._push)
+        app.router.add_get("/stats", self._get_stats)
+        return app
+
+    async def _call_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        stats = self.stats
+        stats.requests += 1
+        stats.by_method[method] = stats.by_method.get(method, 0) + 1
+
+        if method == "getUpdates":
+            # Long polling waits for updates instead of simulating network latency.
+            result: object = await self.get_updates(
+                int(params.get("offset") or 0), int(params.get("limit") or 100), float(params.get("timeout") or 0)
+            )
+            return web.json_response({"ok": True, "result": result})
+
+        config = self.config
+        await asyncio.sleep((config.latency_ms + random.uniform(0, config.jitter_ms)) / 1000)
+        if method == "getMe":
+            result = _BOT_USER
+        elif method == "getFile":
+            file_id = str(params.get("file_id", ""))
+            result = {
+                "file_id": file_id,
+                "file_unique_id": file_id,
+                "file_size": len(self.photo(file_id)),
+                "file_path": f"photos/{file_id}.jpg",
+            }
+        elif method.startswith(("send", "edit")):
+            result = _message(int(params.get("message_id") or next(self._message_ids)), params)
+            self.sent[result["chat"]["id"]].append(result)
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result}, dumps=json.dumps)
+
+    async def _download(self, request: web.Request) -> web.Response:
+        path = request.match_info["path"]
+        self.stats.downloads += 1
+        file_id = path.rsplit("/", 1)[-1].removesuffix(".jpg")
+        return web.Response(body=self.photo(file_id), content_type="image/jpeg")
+
+    async def _push(self, request: web.Request) -> web.Response:
+        return web.json_response({"update_id": self.push_update(await request.json())})
+
+    async def _get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats.__dict__)
+
+
+def create_app(config: FakeTelegramConfig | None = None) -> web.Application:
+    return FakeTelegram(config).create_app()
+
+
+async def start_fake_telegram(
+    host: str = "127.0.0.1", port: int = 8081, config: FakeTelegramConfig | None = None
+) -> tuple[web.AppRunner, FakeTelegram]:
+    app = create_app(config)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, app["telegram"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    args = parser.parse_args()
+    web.run_app(create_app(FakeTelegramConfig(latency_ms=args.latency_ms)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
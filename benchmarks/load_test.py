@@ -0,0 +1,260 @@
+"""
+End-to-end load test: simulated users against the real bot, with Telegram and OpenAI faked.
+
+Usage: python -m benchmarks.load_test [--users 50] [--rounds 2] [--think-ms 100]
+       [--llm-latency-ms 400] [--llm-error-rate 0.02] [--with-limits]
+
+Starts benchmarks.fake_telegram and benchmarks.fake_openai, a temporary SQLite database
+and the bot as bot.main builds it (build_bot + create_dispatcher, long polling). Every
+user goes through onboarding once, then ``--rounds`` times through a text meal, a photo
+meal, water, weight, a new recipe, /stats and an /ask question. Users wait until the bot
+has finished an update before sending the next one. Flood control and outbound shaping
+are off unless ``--with-limits``: synthetic users click far faster than people, and
+Telegram's 30 messages/s would otherwise cap the run.
+
+Reports updates/s, update latency, latency per handler, SQL statements by kind and
+LLM calls.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from aiogram.types import Update
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.fake_openai import FakeOpenAIConfig, start_fake_openai
+from benchmarks.fake_telegram import FakeTelegramConfig, start_fake_telegram
+from bot import db
+from bot.config import Settings
+from bot.i18n import t
+from bot.main import build_bot, create_dispatcher
+from bot.flood_control import flood_control
+from bot.fsm_storage import SqlAlchemyStorage
+from bot.metrics import LatencyWindow, handler_timings
+from bot.services.llm_limiter import llm_limiter
+from bot.settings import settings
+
+_BOT_MESSAGE = {"message_id": 1, "chat": {"type": "private"}, "from": {"id": 42, "is_bot": True, "first_name": "Bench"}}
+_MEALS = ("oatmeal with banana", "chicken soup", "greek salad", "two boiled eggs and toast", "rice with vegetables")
+
+
+class _UpdateTracker:
+    """Outer update middleware that tells the driver when an update has been handled."""
+
+    def __init__(self) -> None:
+        self.waiters: dict[int, asyncio.Future] = {}
+        self.errors = 0
+
+    async def __call__(self, handler, event: Update, data: dict):
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            future = self.waiters.pop(event.update_id, None)
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+class _SimUser:
+    def __init__(self, driver: _Driver, telegram_id: int, lang: str) -> None:
+        self.driver = driver
+        self.telegram_id = telegram_id
+        self.lang = lang
+        self.profile = {"id": telegram_id, "is_bot": False, "first_name": "load", "language_code": lang}
+        self.chat = {"id": telegram_id, "type": "private"}
+
+    def _message(self, **content) -> dict:
+        return {"message": {"message_id": 1, "date": int(time.time()), "chat": self.chat, "from": self.profile, **content}}
+
+    async def text(self, text: str) -> None:
+        content: dict = {"text": text}
+        if text.startswith("/"):
+            content["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        await self.driver.send(self._message(**content))
+
+    async def button(self, key: str) -> None:
+        await self.text(t(self.lang, key))
+
+    async def photo(self, file_id: str) -> None:
+        size = {"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 640, "file_size": 60_000}
+        await self.driver.send(self._message(photo=[size]))
+
+    async def callback(self, data: str) -> None:
+        query = {
+            "id": str(random.getrandbits(32)),
+            "from": self.profile,
+            "chat_instance": str(self.telegram_id),
+            "data": data,
+            "message": {**_BOT_MESSAGE, "date": int(time.time()), "chat": self.chat, "text": "-"},
+        }
+        await self.driver.send({"callback_query": query})
+
+    async def onboard(self) -> None:
+        await self.text("/start")
+        await self.callback(f"lang_{self.lang}")
+        await self.button("sex_f")
+        await self.text("17.05.1990")
+        await self.text("168")
+        await self.text("72.5")
+        await self.button("skip")
+        for _ in range(4):  # GI diagnoses, other diagnoses, medications, allergies
+            await self.text("-")
+        await self.button("activity_medium")
+        await self.button("goal_maintenance")
+
+    async def round(self, rng: random.Random) -> None:
+        await self.button("menu_log_meal")
+        await self.callback("mealtype_lunch")
+        await self.text(rng.choice(_MEALS))
+
+        await self.button("menu_photo_meal")
+        await self.callback("mealtype_dinner")
+        # A limited pool, so some photos repeat like resent ones do.
+        await self.photo(f"photo-{rng.randrange(64)}")
+
+        await self.button("menu_water")
+        await self.callback("water_ml_250")
+
+        await self.button("menu_weight")
+        await self.text(f"{rng.uniform(60, 90):.1f}")
+
+        await self.button("btn_recipes")
+        await self.callback("recipes_add")
+        await self.text("Porridge")
+        await self.text("Oats, milk, 10 minutes on low heat")
+
+        await self.button("menu_stats")
+
+        await self.button("menu_ask_dietitian")
+        await self.text("What should I eat before a morning run?")
+        await self.text("/start")  # leaves the /ask dialog
+
+
+class _Driver:
+    def __init__(self, telegram, tracker: _UpdateTracker, think_ms: float) -> None:
+        self.telegram = telegram
+        self.tracker = tracker
+        self.think_ms = think_ms
+        self.latency = LatencyWindow(maxlen=1_000_000)
+        self.updates = 0
+
+    async def send(self, update: dict) -> None:
+        started = time.perf_counter()
+        done = asyncio.get_running_loop().create_future()
+        self.tracker.waiters[self.telegram.push_update(update)] = done
+        await done
+        self.latency.add(time.perf_counter() - started)
+        self.updates += 1
+        if self.think_ms:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.think_ms / 1000)
+
+
+async def _run_user(driver: _Driver, telegram_id: int, lang: str, rounds: int) -> None:
+    user = _SimUser(driver, telegram_id, lang)
+    rng = random.Random(telegram_id)
+    await user.onboard()
+    for _ in range(rounds):
+        await user.round(rng)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--think-ms", type=float, default=100.0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=30.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.02)
+    parser.add_argument("--telegram-port", type=int, default=8281)
+    parser.add_argument("--openai-port", type=int, default=8299)
+    parser.add_argument("--with-limits", action="store_true", help="keep flood control and outbound shaping on")
+    args = parser.parse_args()
+    # bot.main configures INFO logging on import; aiogram and httpx log every update and request.
+    logging.getLogger().setLevel(logging.WARNING)
+    if not args.with_limits:
+        settings.flood_control.enabled = False
+        settings.outbound.enabled = False
+
+    statements: Counter[str] = Counter()
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+    telegram_runner, telegram = await start_fake_telegram(
+        port=args.telegram_port, config=FakeTelegramConfig(latency_ms=args.telegram_latency_ms)
+    )
+    openai_runner, openai_stats = await start_fake_openai(
+        port=args.openai_port,
+        config=FakeOpenAIConfig(latency_ms=args.llm_latency_ms, error_rate=args.llm_error_rate),
+    )
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.openai_port}/v1"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Settings(
+            telegram_bot_token="42:LOADTEST",
+            database_url=f"sqlite+aiosqlite:///{os.path.join(tmp, 'load.db')}",
+            openai_api_key="fake",
+            telegram_api_base=f"http://127.0.0.1:{args.telegram_port}",
+        )
+        db.setup_database(config.database_url, sqlite_profile=config.sqlite_profile)
+        await db.init_db()
+        bot = build_bot(config)
+        fsm_storage = SqlAlchemyStorage(db.get_session_maker())
+        dp = create_dispatcher(fsm_storage)
+        tracker = _UpdateTracker()
+        dp.update.outer_middleware(tracker)
+        polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+
+        driver = _Driver(telegram, tracker, args.think_ms)
+        languages = ("en", "ru", "pl")
+        statements.clear()
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(_run_user(driver, 70_000 + n, languages[n % len(languages)], args.rounds) for n in range(args.users))
+        )
+        elapsed = time.perf_counter() - started
+        sql = dict(statements)
+
+        await dp.stop_polling()
+        await polling
+        await bot.ai_dietitian_service.wait_for_background()
+        await db.dispose_database()
+    await telegram_runner.cleanup()
+    await openai_runner.cleanup()
+    event.remove(Engine, "before_cursor_execute", _count)
+
+    print(
+        {
+            "users": args.users,
+            "updates": driver.updates,
+            "seconds": round(elapsed, 2),
+            "updates_per_sec": round(driver.updates / elapsed, 1),
+            "handler_errors": tracker.errors,
+            **driver.latency.stats("update_"),
+        }
+    )
+    print("sql statements:", sql)
+    print("llm calls:", {**openai_stats.__dict__, "limiter": llm_limiter.stats()})
+    print("telegram calls:", telegram.stats.by_method, "downloads:", telegram.stats.downloads)
+    if args.with_limits:
+        print("flood control:", flood_control.stats())
+        print("outbound:", bot.outbound.stats())
+    print(f"{'handler':<40} {'count':>6} {'p50_ms':>8} {'p95_ms':>8} {'max_ms':>8}")
+    for name, stats in handler_timings.stats().items():
+        print(f"{name:<40} {stats['count']:>6} {stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['max_ms']:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -9,6 +9,28 @@ class Settings:
     telegram_bot_token: str
     database_url: str
     openai_api_key: str | None = None
+    sqlite_profile: str = "production"
+    estimate_batching: bool = False
+    # "polling" (default) or "webhook"; the webhook_* fields only matter for the latter.
+    bot_mode: str = "polling"
+    webhook_url: str | None = None
+    webhook_path: str = "/telegram/webhook"
+    webhook_secret: str | None = None
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_max_in_flight: int = 64
+    # Bot API server base URL (a local telegram-bot-api server or benchmarks.fake_telegram).
+    telegram_api_base: str | None = None
+
+
+def database_url_from_env() -> str:
+    return os.getenv("DATABASE_URL", "sqlite+aiosqlite:///bot.db")
+
+
+def sqlite_profile_from_env() -> str:
+    # "production" enables WAL + a single writer connection for file-based SQLite,
+    # "default" keeps SQLAlchemy's stock engine settings.
+    return os.getenv("SQLITE_PROFILE", "production").strip().lower()
 
 
 def load_config() -> Settings:
@@ -17,11 +39,29 @@ def load_config() -> Settings:
     if not token:
         raise ValueError("TELEGRAM_BOT_TOKEN is not set in the environment")
 
-    database_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///bot.db")
+    database_url = database_url_from_env()
     openai_api_key = os.getenv("OPENAI_API_KEY") or os.getenv("LLM_API_KEY")
+    sqlite_profile = sqlite_profile_from_env()
+    estimate_batching = os.getenv("ESTIMATE_BATCHING", "off").strip().lower() in ("1", "on", "true", "yes")
+    bot_mode = os.getenv("BOT_MODE", "polling").strip().lower()
+    if bot_mode not in ("polling", "webhook"):
+        raise ValueError(f"BOT_MODE must be 'polling' or 'webhook', got {bot_mode!r}")
+    webhook_secret = os.getenv("WEBHOOK_SECRET") or None
+    if bot_mode == "webhook" and not webhook_secret:
+        raise ValueError("WEBHOOK_SECRET must be set when BOT_MODE=webhook")
 
     return Settings(
         telegram_bot_token=token,
         database_url=database_url,
         openai_api_key=openai_api_key,
+        sqlite_profile=sqlite_profile,
+        estimate_batching=estimate_batching,
+        bot_mode=bot_mode,
+        webhook_url=os.getenv("WEBHOOK_URL") or None,
+        webhook_path=os.getenv("WEBHOOK_PATH", "/telegram/webhook"),
+        webhook_secret=webhook_secret,
+        webhook_host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=int(os.getenv("WEBHOOK_PORT", "8080")),
+        webhook_max_in_flight=int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "64")),
+        telegram_api_base=os.getenv("TELEGRAM_API_BASE") or None,
     )
@@ -1,8 +1,13 @@
 from collections.abc import AsyncIterator
 from typing import Optional
 
+from sqlalchemy import Select, event, inspect
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .settings import settings
 
 
 class Base(DeclarativeBase):
@@ -10,12 +15,97 @@ class Base(DeclarativeBase):
 
 
 engine: Optional[AsyncEngine] = None
+read_engine: Optional[AsyncEngine] = None
 async_session_maker: Optional[async_sessionmaker[AsyncSession]] = None
 
 
-def setup_database(database_url: str) -> None:
-    global engine, async_session_maker
+class RoutingSession(Session):
+    """
+    Session used by the SQLite production profile: flushes and DML go to the single
+    writer connection, plain SELECTs go to the read-only pool. Once a transaction has
+    touched the writer, it stays there so it can read its own uncommitted changes.
+    """
+
+    _uses_writer = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if read_engine is None or engine is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        if self._uses_writer or self._flushing or not isinstance(clause, Select):
+            self._uses_writer = True
+            return engine.sync_engine
+        return read_engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_writer_flag(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session._uses_writer = False
+
+
+def is_file_sqlite(database_url: str) -> bool:
+    url = make_url(database_url)
+    database = url.database or ""
+    return (
+        url.get_backend_name() == "sqlite"
+        and database not in ("", ":memory:")
+        and "mode=memory" not in database
+        and not database.startswith("file::memory:")
+    )
+
+
+def _install_pragmas(target: AsyncEngine, *, writer: bool) -> None:
+    tuning = settings.sqlite
+
+    @event.listens_for(target.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        if writer:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(tuning.busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(tuning.mmap_size_bytes)}")
+        # Negative cache_size is interpreted by SQLite as KiB rather than pages.
+        cursor.execute(f"PRAGMA cache_size=-{int(tuning.cache_size_kib)}")
+        if not writer:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def setup_database(database_url: str, sqlite_profile: str = "production") -> None:
+    global engine, read_engine, async_session_maker
+
+    if sqlite_profile == "production" and is_file_sqlite(database_url):
+        tuning = settings.sqlite
+        # A single pooled writer connection serializes commits in-process, so concurrent
+        # handlers queue on checkout instead of failing with "database is locked".
+        engine = create_async_engine(
+            database_url,
+            echo=False,
+            future=True,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=tuning.writer_queue_timeout_seconds,
+        )
+        read_engine = create_async_engine(
+            database_url,
+            echo=False,
+            future=True,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=tuning.read_pool_size,
+            max_overflow=0,
+            pool_timeout=tuning.writer_queue_timeout_seconds,
+        )
+        _install_pragmas(engine, writer=True)
+        _install_pragmas(read_engine, writer=False)
+        async_session_maker = async_sessionmaker(
+            engine, expire_on_commit=False, sync_session_class=RoutingSession
+        )
+        return
+
     engine = create_async_engine(database_url, echo=False, future=True)
+    read_engine = None
     async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
@@ -25,6 +115,41 @@ async def init_db() -> None:
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+
+
+def _add_missing_columns(sync_conn) -> None:
+    # Same idea for plain nullable columns added to existing tables (e.g. users.timezone).
+    inspector = inspect(sync_conn)
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+            )
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    # create_all() skips tables that already exist, so indexes added to the models later
+    # would never reach older databases without this pass.
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+
+
+async def dispose_database() -> None:
+    for target in (read_engine, engine):
+        if target is not None:
+            await target.dispose()
 
 
 async def get_session() -> AsyncIterator[AsyncSession]:
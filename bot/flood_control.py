@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from aiogram.types import Message, TelegramObject
+
+from .settings import FloodControlSettings, settings
+
+
+class _Bucket:
+    __slots__ = ("level", "updated", "warn_after")
+
+    def __init__(self, level: float, now: float) -> None:
+        self.level = level
+        self.updated = now
+        self.warn_after = 0.0
+
+
+class FloodControl:
+    """
+    Token buckets for incoming updates: one per user plus a global one.
+
+    All bookkeeping happens between awaits, so no locks are needed. A user who is out of
+    tokens is dropped. When only the global bucket is short, the update takes its tokens
+    ahead of time (the level goes negative) and waits until they would have refilled, up to
+    ``max_delay_seconds``; later updates queue behind it the same way.
+    """
+
+    def __init__(self, config: FloodControlSettings | None = None) -> None:
+        self.config = config or settings.flood_control
+        now = time.monotonic()
+        self._users: dict[int, _Bucket] = {}
+        self._global = _Bucket(self.config.global_burst, now)
+        self._next_sweep = now + self.config.idle_seconds
+        self.admitted = 0
+        self.delayed = 0
+        self.dropped_user = 0
+        self.dropped_global = 0
+        self.warnings = 0
+
+    def cost(self, event: TelegramObject, data: dict[str, Any]) -> float:
+        costs = self.config.costs
+        if isinstance(event, Message):
+            if event.photo:
+                return costs.get("photo", 1.0)
+            text = event.text or ""
+            if text.startswith("/"):
+                command = text[1:].split(maxsplit=1)[0].split("@", 1)[0] if len(text) > 1 else ""
+                return costs.get(command, 1.0)
+            action = data.get("menu_action")
+            if action:
+                return costs.get(action, 1.0)
+            raw_state = data.get("raw_state")
+            if raw_state:
+                return self.config.state_costs.get(raw_state.split(":", 1)[0], 1.0)
+        return 1.0
+
+    def admit(self, user_id: int, cost: float) -> float | None:
+        """Seconds to wait before handling the update, or None if it should be dropped."""
+
+        config = self.config
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = _Bucket(config.user_burst, now)
+        else:
+            bucket.level = min(config.user_burst, bucket.level + (now - bucket.updated) * config.user_rate_per_second)
+            bucket.updated = now
+        if bucket.level < min(cost, config.user_burst):
+            self.dropped_user += 1
+            return None
+
+        shared = self._global
+        shared.level = min(config.global_burst, shared.level + (now - shared.updated) * config.global_rate_per_second)
+        shared.updated = now
+        delay = max(0.0, cost - shared.level) / config.global_rate_per_second
+        if delay > config.max_delay_seconds:
+            self.dropped_global += 1
+            return None
+
+        shared.level -= cost
+        bucket.level -= cost
+        self.admitted += 1
+        if delay:
+            self.delayed += 1
+        return delay
+
+    def should_warn(self, user_id: int) -> bool:
+        """True at most once per ``warn_window_seconds`` for a dropped user."""
+
+        bucket = self._users.get(user_id)
+        now = time.monotonic()
+        if bucket is None or now < bucket.warn_after:
+            return False
+        bucket.warn_after = now + self.config.warn_window_seconds
+        self.warnings += 1
+        return True
+
+    def _sweep(self, now: float) -> None:
+        # A bucket idle this long has refilled, so forgetting it changes nothing.
+        cutoff = now - self.config.idle_seconds
+        for user_id in [uid for uid, bucket in self._users.items() if bucket.updated < cutoff]:
+            del self._users[user_id]
+        self._next_sweep = now + self.config.idle_seconds
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "buckets": len(self._users),
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "dropped_user": self.dropped_user,
+            "dropped_global": self.dropped_global,
+            "warnings": self.warnings,
+        }
+
+
+flood_control = FloodControl()
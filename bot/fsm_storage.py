@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .models import FsmState
+from .settings import FsmStorageSettings, settings
+
+logger = logging.getLogger(__name__)
+
+# Marks "leave as is" for SqlAlchemyStorage.write and unread values in BufferedFSMContext.
+KEEP: Any = object()
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"FSM data value of type {type(value).__name__} is not serializable")
+
+
+def _object_hook(obj: dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def dumps_data(data: dict[str, Any]) -> str:
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads_data(raw: str | None) -> dict[str, Any]:
+    return json.loads(raw, object_hook=_object_hook) if raw else {}
+
+
+def storage_key(key: StorageKey) -> str:
+    return ":".join(
+        str(part if part is not None else "")
+        for part in (
+            key.bot_id,
+            key.chat_id,
+            key.user_id,
+            key.thread_id,
+            getattr(key, "business_connection_id", None),
+            key.destiny,
+        )
+    )
+
+
+@dataclass
+class _Entry:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    version: int = 0
+    flushed_version: int = 0
+    last_used: float = 0.0
+
+
+class SqlAlchemyStorage(BaseStorage):
+    """
+    FSM storage on the bot's database with a per-process hot map in front of it.
+
+    Reads and writes go to memory; changed keys are written back in one batch every
+    ``flush_interval_ms``, so a handler's get_data/update_data/set_state calls never
+    wait on the database. "No state" is cached too, because aiogram reads the state of
+    every update. A key missing from memory is loaded once from the database, which
+    keeps flows alive across restarts. Processes sharing the database should each
+    see a given chat consistently, e.g. one webhook instance per bot.
+    """
+
+    def __init__(
+        self, session_maker: async_sessionmaker[AsyncSession], config: FsmStorageSettings | None = None
+    ) -> None:
+        self.session_maker = session_maker
+        self.config = config or settings.fsm_storage
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._loading: dict[str, asyncio.Task] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._next_expiry = 0.0
+        self.hits = 0
+        self.loads = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    async def _entry(self, key: StorageKey) -> _Entry:
+        name = storage_key(key)
+        entry = self._entries.get(name)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(name)
+        else:
+            entry = await self._load(name)
+        entry.last_used = time.monotonic()
+        return entry
+
+    async def _load(self, name: str) -> _Entry:
+        # Concurrent misses for one key share a single query.
+        task = self._loading.get(name)
+        if task is None:
+            task = self._loading[name] = asyncio.ensure_future(self._read(name))
+            task.add_done_callback(lambda _: self._loading.pop(name, None))
+            self.loads += 1
+        state, data = await task
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._entries[name] = _Entry(state=state, data=data)
+        return entry
+
+    async def _read(self, name: str) -> tuple[str | None, dict[str, Any]]:
+        async with self.session_maker() as session:
+            row = (await session.execute(select(FsmState.state, FsmState.data).where(FsmState.key == name))).first()
+        return (row.state, loads_data(row.data)) if row else (None, {})
+
+    def _touch(self, key: StorageKey, entry: _Entry) -> None:
+        entry.version += 1
+        self._dirty.add(storage_key(key))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._touch(key, entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        entry = await self._entry(key)
+        entry.data = data.copy()
+        self._touch(key, entry)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._entry(key)).data.copy()
+
+    async def write(
+        self,
+        key: StorageKey,
+        state: StateType = KEEP,
+        data: Mapping[str, Any] = KEEP,
+        update: Mapping[str, Any] = KEEP,
+    ) -> None:
+        """Set state and/or data (replaced by ``data`` or merged with ``update``) as one change."""
+
+        entry = await self._entry(key)
+        if state is not KEEP:
+            entry.state = state.state if isinstance(state, State) else state
+        if data is not KEEP:
+            entry.data = dict(data)
+        if update is not KEEP:
+            entry.data = {**entry.data, **update}
+        self._touch(key, entry)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.flush_interval_ms / 1000)
+            try:
+                await self.flush()
+                self._evict_idle()
+                if time.monotonic() >= self._next_expiry:
+                    self._next_expiry = time.monotonic() + self.config.expire_check_seconds
+                    await self.expire()
+            except Exception as exc:  # noqa: BLE001
+                # Entries stay dirty and are retried on the next tick.
+                logger.warning("FSM storage flush failed: %s", exc)
+
+    async def flush(self) -> int:
+        """Write changed keys in one transaction; returns how many were written."""
+
+        async with self._flush_lock:
+            batch: list[tuple[str, _Entry, int]] = []
+            upserts: list[dict[str, Any]] = []
+            deletes: list[str] = []
+            now = datetime.now(timezone.utc)
+            for name in list(self._dirty)[: self.config.max_batch]:
+                entry = self._entries[name]
+                if entry.state is None and not entry.data:
+                    deletes.append(name)
+                else:
+                    try:
+                        payload = dumps_data(entry.data)
+                    except TypeError as exc:
+                        logger.error("Dropping unserializable FSM data for %s: %s", name, exc)
+                        self._dirty.discard(name)
+                        continue
+                    upserts.append({"key": name, "state": entry.state, "data": payload, "updated_at": now})
+                batch.append((name, entry, entry.version))
+            if not batch:
+                return 0
+
+            async with self.session_maker() as session:
+                if upserts:
+                    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+                    stmt = insert(FsmState).values(upserts)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[FsmState.key],
+                        set_={column: stmt.excluded[column] for column in ("state", "data", "updated_at")},
+                    )
+                    await session.execute(stmt)
+                if deletes:
+                    await session.execute(delete(FsmState).where(FsmState.key.in_(deletes)))
+                await session.commit()
+
+            for name, entry, version in batch:
+                entry.flushed_version = version
+                if entry.version == version:
+                    self._dirty.discard(name)
+            self.flushes += 1
+            self.rows_written += len(batch)
+            return len(batch)
+
+    def _evict_idle(self) -> None:
+        # The map is in access order, so idle entries sit at the front.
+        threshold = time.monotonic() - self.config.idle_seconds
+        while self._entries:
+            name, entry = next(iter(self._entries.items()))
+            if entry.last_used > threshold or name in self._dirty or name in self._loading:
+                break
+            del self._entries[name]
+
+    async def expire(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.config.expire_after_days)
+        async with self.session_maker() as session:
+            await session.execute(delete(FsmState).where(FsmState.updated_at < cutoff))
+            await session.commit()
+
+    async def forget(self, key: StorageKey) -> None:
+        """Drop a key from memory and the database right away, e.g. when a user deletes their data."""
+
+        name = storage_key(key)
+        loading = self._loading.get(name)
+        if loading is not None:
+            await asyncio.gather(loading, return_exceptions=True)
+        # Under the flush lock, so a batch already being written cannot bring the row back.
+        async with self._flush_lock:
+            self._entries.pop(name, None)
+            self._dirty.discard(name)
+            async with self.session_maker() as session:
+                await session.execute(delete(FsmState).where(FsmState.key == name))
+                await session.commit()
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+        while self._dirty:
+            if not await self.flush():
+                break
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "loads": self.loads,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+class BufferedFSMContext(FSMContext):
+    """
+    FSMContext for a single update. State and data are read from storage at most once,
+    changes are kept locally, and ``commit()`` writes them in one call (see
+    ``BufferedFSMMiddleware``). Like ``FSMContext.update_data``, updated keys are merged
+    into the data as stored at commit time, so updates handled meanwhile are kept; only
+    ``set_data``/``clear`` replace the whole dict.
+    """
+
+    def __init__(self, storage: BaseStorage, key: StorageKey, raw_state: str | None = KEEP) -> None:
+        super().__init__(storage, key)
+        self._state = raw_state
+        self._data: dict[str, Any] | None = None
+        self._state_changed = False
+        self._data_replaced = False
+        self._updated_keys: set[str] = set()
+
+    async def get_state(self) -> str | None:
+        if self._state is KEEP:
+            self._state = await self.storage.get_state(self.key)
+        return self._state
+
+    async def set_state(self, state: StateType = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def _loaded_data(self) -> dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(self.key)
+        return self._data
+
+    async def get_data(self) -> dict[str, Any]:
+        return (await self._loaded_data()).copy()
+
+    async def get_value(self, key: str, default: Any | None = None) -> Any | None:
+        return (await self._loaded_data()).get(key, default)
+
+    async def set_data(self, data: Mapping[str, Any]) -> None:
+        self._data = dict(data)
+        self._data_replaced = True
+        self._updated_keys.clear()
+
+    async def update_data(self, data: Mapping[str, Any] | None = None, **kwargs: Any) -> dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        current = await self._loaded_data()
+        current.update(kwargs)
+        if not self._data_replaced:
+            self._updated_keys.update(kwargs)
+        return current.copy()
+
+    @property
+    def changed(self) -> bool:
+        return self._state_changed or self._data_replaced or bool(self._updated_keys)
+
+    async def commit(self) -> None:
+        if not self.changed:
+            return
+        state = self._state if self._state_changed else KEEP
+        data = self._data if self._data_replaced else KEEP
+        update = {name: self._data[name] for name in self._updated_keys} if self._updated_keys else KEEP
+        self._state_changed = self._data_replaced = False
+        self._updated_keys = set()
+        if isinstance(self.storage, SqlAlchemyStorage):
+            await self.storage.write(self.key, state=state, data=data, update=update)
+            return
+        if state is not KEEP:
+            await self.storage.set_state(self.key, state)
+        if data is not KEEP:
+            await self.storage.set_data(self.key, data)
+        elif update is not KEEP:
+            await self.storage.update_data(self.key, update)
@@ -9,6 +9,7 @@ __all__ = [
     "ask",
     "help",
     "delete_me",
+    "export_history",
     "recipes",
     "misc",
 ]
@@ -1,24 +1,33 @@
 from __future__ import annotations
 
-from aiogram import F, Router
+import asyncio
+import contextlib
+import time
+
+from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
+from ..menu import MenuAction
 from ..models import User
 from ..services.ai_dietitian import AiDietitianService
-from ..services.ask_service import handle_question
+from ..services.ask_service import handle_question, stream_question
+from ..settings import settings
 
 router = Router()
 
+MAX_MESSAGE_LENGTH = 4096
+
 
 class AskDialog(StatesGroup):
     awaiting_question = State()
 
 
 @router.message(Command("ask"))
-@router.message(F.text.in_({t(lang, "menu_ask_dietitian") for lang in SUPPORTED_LANGUAGES}))
+@router.message(MenuAction("menu_ask_dietitian"))
 async def start_ask(message: Message, state: FSMContext, user: User | None, lang: str) -> None:
     if not user:
         return
@@ -55,6 +64,10 @@ async def receive_question(
         await message.answer(t(lang, "ask_dietitian_error"))
         return
 
+    if settings.ask_streaming.enabled:
+        await _stream_answer(message, user, lang, question, ai_service, session_maker)
+        return
+
     try:
         async with session_maker() as session:
             reply_text = await handle_question(
@@ -69,3 +82,62 @@ async def receive_question(
         return
 
     await message.answer(reply_text)
+
+
+async def _show(placeholder: Message, text: str) -> float:
+    """Edit the placeholder; returns how long Telegram asked us to back off (0 if none)."""
+
+    try:
+        await placeholder.edit_text(text[:MAX_MESSAGE_LENGTH], parse_mode=None)
+    except TelegramRetryAfter as exc:
+        return float(exc.retry_after)
+    except TelegramBadRequest:
+        # "message is not modified" and similar: nothing to do for an intermediate edit.
+        pass
+    return 0.0
+
+
+async def _stream_answer(
+    message: Message,
+    user: User,
+    lang: str,
+    question: str,
+    ai_service: AiDietitianService,
+    session_maker,
+) -> None:
+    interval = settings.ask_streaming.edit_interval_seconds
+    placeholder = await message.answer(t(lang, "ask_dietitian_thinking"))
+    reply_text = shown = ""
+    next_edit = 0.0  # show the first tokens right away, then throttle
+    try:
+        async with session_maker() as session:
+            # aclosing: if this loop is left early, the stream's LLM slot is released and
+            # its session work finishes here, not when the generator is garbage collected.
+            async with contextlib.aclosing(
+                stream_question(
+                    session=session,
+                    ai_service=ai_service,
+                    user=user,
+                    question=question,
+                    lang=lang,
+                )
+            ) as replies:
+                async for reply_text in replies:
+                    now = time.monotonic()
+                    if now >= next_edit:
+                        backoff = await _show(placeholder, reply_text)
+                        shown = reply_text
+                        next_edit = now + max(interval, backoff)
+    except Exception:
+        if not reply_text:
+            await _show(placeholder, t(lang, "ask_dietitian_error"))
+            return
+        # The partial answer was not saved; keep it visible but mark it as incomplete.
+        notice = "\n\n" + t(lang, "ask_dietitian_cut_off")
+        reply_text = reply_text[: MAX_MESSAGE_LENGTH - len(notice)] + notice
+
+    if reply_text and reply_text != shown:
+        backoff = await _show(placeholder, reply_text)
+        if backoff:
+            await asyncio.sleep(backoff)
+            await _show(placeholder, reply_text)
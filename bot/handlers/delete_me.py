@@ -2,10 +2,13 @@ from __future__ import annotations
 
 from aiogram import F, Router
 from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from ..fsm_storage import SqlAlchemyStorage
 from ..i18n import t
 from ..models import User
-from ..services.user_service import delete_user_with_data
+from ..services.ai_nutrition import AiNutritionService
+from ..services.user_service import delete_user_with_data, invalidate_user
 
 router = Router()
 
@@ -29,6 +32,13 @@ def _confirm_keyboard(lang: str, telegram_id: int) -> InlineKeyboardMarkup:
     )
 
 
+async def _forget_fsm(state: FSMContext) -> None:
+    if isinstance(state.storage, SqlAlchemyStorage):
+        await state.storage.forget(state.key)
+    else:
+        await state.clear()
+
+
 @router.message(Command("delete_me"))
 async def delete_me_command(message: Message, user: User | None, lang: str) -> None:
     if not user:
@@ -52,11 +62,15 @@ async def delete_me_cancel(callback: CallbackQuery, user: User | None, lang: str
 
 
 @router.callback_query(F.data.startswith("delete_me_yes:"))
-async def delete_me_confirm(callback: CallbackQuery, user: User | None, lang: str, session_maker) -> None:
+async def delete_me_confirm(
+    callback: CallbackQuery, state: FSMContext, user: User | None, lang: str, session_maker
+) -> None:
     _, telegram_id = callback.data.split(":", 1)
     if str(callback.from_user.id) != telegram_id:
         await callback.answer()
         return
+    # FSM data can hold unfinished onboarding answers (diagnoses, medications, allergies).
+    await _forget_fsm(state)
     if not user:
         await callback.message.answer(t(lang, "profile_missing"))
         await callback.answer()
@@ -65,6 +79,10 @@ async def delete_me_confirm(callback: CallbackQuery, user: User | None, lang: st
     async with session_maker() as session:
         async with session.begin():
             await delete_user_with_data(session, user.id)
+    invalidate_user(user.telegram_id)
+    ai_service: AiNutritionService | None = getattr(callback.bot, "ai_service", None)
+    if ai_service and ai_service.photo_cache:
+        ai_service.photo_cache.forget_user(user.id)
 
     await callback.message.answer(t(lang, "delete_me_done"))
     await callback.answer()
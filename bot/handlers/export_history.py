@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import json
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import BufferedInputFile, Message
+from ..i18n import t
+from ..models import User
+from ..services.history_archive import export_history
+
+router = Router()
+
+
+@router.message(Command("export_history"))
+async def export_history_command(message: Message, user: User | None, lang: str, session_maker) -> None:
+    if not user:
+        await message.answer(t(lang, "profile_missing"))
+        return
+
+    async with session_maker() as session:
+        messages = await export_history(session, user.id)
+    if not messages:
+        await message.answer(t(lang, "export_history_empty"))
+        return
+
+    data = json.dumps(messages, ensure_ascii=False, indent=1).encode()
+    await message.answer_document(
+        BufferedInputFile(data, filename="ask_history.json"),
+        caption=t(lang, "export_history_caption", count=len(messages)),
+    )
@@ -6,8 +6,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
 from ..keyboards import main_menu, meal_type_keyboard
+from ..menu import MenuAction
 from ..models import User
 from ..services.meal_service import log_text_meal
 from ..services.ai_nutrition import AiNutritionService
@@ -21,7 +22,7 @@ class MealLog(StatesGroup):
 
 
 @router.message(Command("meal", "food"))
-@router.message(F.text.in_({t(lang, "menu_log_meal") for lang in SUPPORTED_LANGUAGES}))
+@router.message(MenuAction("menu_log_meal"))
 async def start_meal_log(message: Message, state: FSMContext, user: User | None, lang: str) -> None:
     if not user:
         return
@@ -79,6 +80,7 @@ async def meal_text_received(
             raw_text=raw_text,
             lang=lang,
             ai_service=ai_service,
+            tz=user.timezone,
         )
 
     await message.answer(t(lang, "meal_saved"))
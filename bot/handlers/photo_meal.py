@@ -1,18 +1,19 @@
 from __future__ import annotations
 
-import io
-
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
 from ..keyboards import main_menu, meal_type_keyboard
+from ..menu import MenuAction
 from ..models import User
 from ..services.ai_nutrition import AiNutritionService
 from ..services.meal_service import log_photo_meal
+from ..services.photo_pipeline import PhotoRejected, download_photo, pick_photo_size, prepare_photo_async
+from ..settings import settings
 
 router = Router()
 
@@ -23,7 +24,7 @@ class PhotoMealLog(StatesGroup):
 
 
 @router.message(Command("photo_meal", "meal_photo", "mealpic"))
-@router.message(F.text.in_({t(lang, "menu_photo_meal") for lang in SUPPORTED_LANGUAGES}))
+@router.message(MenuAction("menu_photo_meal"))
 async def start_photo_meal_log(message: Message, state: FSMContext, user: User | None, lang: str) -> None:
     if not user:
         return
@@ -72,24 +73,33 @@ async def meal_photo_received(
         await message.answer(t(lang, "error_no_photo"))
         return
 
-    photo = message.photo[-1]
+    photo = pick_photo_size(message.photo)
     file_id = photo.file_id
 
     ai_service: AiNutritionService | None = getattr(message.bot, "ai_service", None)
     await message.answer(t(lang, "meal_photo_received"))
     try:
         photo_bytes = None
-        if ai_service:
+        photo_metadata = {"file_id": file_id, "file_unique_id": photo.file_unique_id}
+        # A photo Telegram has seen before is answered from the cache without downloading it.
+        cached = (
+            await ai_service.cached_photo_estimate(photo.file_unique_id, photo_metadata) if ai_service else None
+        )
+        if ai_service and cached is None:
             try:
-                file = await message.bot.get_file(file_id)
-                buffer = io.BytesIO()
-                await message.bot.download(file, destination=buffer)
-                buffer.seek(0)
-                photo_bytes = buffer.getvalue()
+                # The buffer is only ever passed on as a memoryview: no getvalue()/bytes() copies.
+                prepared = await prepare_photo_async(await download_photo(message.bot, photo))
+            except PhotoRejected as exc:
+                mb = settings.limits.max_photo_size_bytes // (1024 * 1024)
+                await message.answer(t(lang, exc.message_key, mb=mb))
+                return
             except Exception:
-                photo_bytes = None
+                prepared = None
+
+            if prepared:
+                photo_bytes = prepared.data
+                photo_metadata["mime_type"] = prepared.mime_type
 
-        photo_metadata = {"file_id": file_id, "file_unique_id": photo.file_unique_id}
         async with session_maker() as session:
             _, estimates = await log_photo_meal(
                 session=session,
@@ -101,6 +111,8 @@ async def meal_photo_received(
                 ai_service=ai_service,
                 photo_bytes=photo_bytes,
                 photo_metadata=photo_metadata,
+                tz=user.timezone,
+                estimates=cached,
             )
     except Exception:
         await message.answer(t(lang, "error_photo_processing"))
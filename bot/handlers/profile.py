@@ -10,6 +10,8 @@ from sqlalchemy import select
 from ..i18n import t
 from ..keyboards import activity_keyboard, main_menu, nutrition_goal_keyboard, profile_edit_keyboard
 from ..models import User
+from ..services.day_boundaries import normalize_timezone
+from ..services.user_service import invalidate_user
 
 router = Router()
 
@@ -19,6 +21,7 @@ class EditProfile(StatesGroup):
     waiting_height = State()
     waiting_activity = State()
     waiting_goal = State()
+    waiting_timezone = State()
 
 
 def format_profile(user: User, lang: str) -> str:
@@ -38,6 +41,7 @@ def format_profile(user: User, lang: str) -> str:
         f"{t(lang, 'profile_field_allergies')}: {display(user.allergies_intolerances)}",
         f"{t(lang, 'profile_field_activity_level')}: {display(user.activity_level)}",
         f"{t(lang, 'profile_field_nutrition_goal')}: {display(user.nutrition_goal)}",
+        f"{t(lang, 'profile_field_timezone')}: {user.timezone or 'UTC'}",
     ]
     return "\n".join(lines)
 
@@ -71,6 +75,11 @@ async def edit_goal(callback: CallbackQuery, state: FSMContext, user: User | Non
     await set_edit_state(callback, state, EditProfile.waiting_goal, user, lang, keyboard=nutrition_goal_keyboard)
 
 
+@router.callback_query(F.data == "edit_timezone")
+async def edit_timezone(callback: CallbackQuery, state: FSMContext, user: User | None, lang: str) -> None:
+    await set_edit_state(callback, state, EditProfile.waiting_timezone, user, lang, prompt_key="ask_timezone")
+
+
 async def set_edit_state(
     callback: CallbackQuery,
     state: FSMContext,
@@ -78,6 +87,7 @@ async def set_edit_state(
     user: User | None,
     lang: str,
     keyboard=None,
+    prompt_key: str = "profile_edit_prompt",
 ) -> None:
     if not user:
         await callback.message.answer(t("en", "profile_missing"))
@@ -86,7 +96,7 @@ async def set_edit_state(
     await state.set_state(new_state)
     await state.update_data(language=lang)
     reply_markup = keyboard(lang) if keyboard else None
-    await callback.message.answer(t(lang, "profile_edit_prompt"), reply_markup=reply_markup)
+    await callback.message.answer(t(lang, prompt_key), reply_markup=reply_markup)
     await callback.answer()
 
 
@@ -135,6 +145,18 @@ async def update_goal(message: Message, state: FSMContext, session_maker) -> Non
     await finish_edit(message, state, lang)
 
 
+@router.message(EditProfile.waiting_timezone)
+async def update_timezone(message: Message, state: FSMContext, session_maker) -> None:
+    data = await state.get_data()
+    lang = data.get("language", "en")
+    value = normalize_timezone(message.text or "")
+    if value is None:
+        await message.answer(t(lang, "invalid_timezone"))
+        return
+    await save_field(session_maker, message.from_user.id, "timezone", value)
+    await finish_edit(message, state, lang)
+
+
 def parse_float(value: str) -> float | None:
     try:
         normalized = value.replace(",", ".")
@@ -161,6 +183,7 @@ async def save_field(session_maker, telegram_id: int, field_name: str, value) ->
             return
         setattr(user, field_name, value)
         await session.commit()
+    invalidate_user(telegram_id)
 
 
 async def finish_edit(message: Message, state: FSMContext, lang: str) -> None:
@@ -6,8 +6,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
 from ..keyboards import main_menu
+from ..menu import MenuAction
 from ..models import Recipe, User
 from ..services.ai_dietitian import AiDietitianService
 from ..services.recipe_service import (
@@ -72,7 +73,7 @@ async def _send_recipes_home(message: Message, session_maker, user: User, lang:
 
 
 @router.message(Command("recipes"))
-@router.message(F.text.in_({t(lang, "btn_recipes") for lang in SUPPORTED_LANGUAGES}))
+@router.message(MenuAction("btn_recipes"))
 async def recipes_menu(message: Message, state: FSMContext, user: User | None, lang: str, session_maker) -> None:
     if not user:
         await message.answer(t(lang, "profile_missing"))
@@ -339,7 +340,7 @@ async def recipes_ai_generate(callback: CallbackQuery, state: FSMContext, user:
     ai_service: AiDietitianService | None = getattr(callback.bot, "ai_dietitian_service", None)
     recipe_text = None
     if ai_service:
-        recipe_text = await ai_service.suggest_recipe(title, lang)
+        recipe_text = await ai_service.suggest_recipe(title, lang, user_id=user.id if user else None)
 
     if not recipe_text:
         await callback.message.answer(t(lang, "recipes_ai_failed"))
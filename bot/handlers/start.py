@@ -19,7 +19,9 @@ from ..keyboards import (
     sex_keyboard,
     skip_keyboard,
 )
+from ..menu import MenuAction
 from ..models import User
+from ..services.user_service import cache_user, get_cached_user, invalidate_user
 
 router = Router()
 
@@ -71,6 +73,7 @@ async def get_or_create_user(telegram_id: int, language: str, session_maker, mes
             session.add(user)
         await session.commit()
         await session.refresh(user)
+    cache_user(user)
     return user
 
 
@@ -266,25 +269,14 @@ async def save_onboarding(state: FSMContext, telegram_id: int, session_maker) ->
         user.activity_level = data.get("activity_level")
         user.nutrition_goal = data.get("nutrition_goal")
         await session.commit()
+    invalidate_user(telegram_id)
 
 
-@router.message(
-    F.text.in_(
-        {
-            t(lang, key)
-            for lang in SUPPORTED_LANGUAGES
-            for key in [
-                "btn_fridge",
-                "btn_budget",
-            ]
-        }
-    )
-)
+@router.message(MenuAction("btn_fridge", "btn_budget"))
 async def stub_features(message: Message, state: FSMContext, session_maker) -> None:
     data = await state.get_data()
     lang = data.get("language")
     if not lang:
-        async with session_maker() as session:
-            user = await session.scalar(select(User).where(User.telegram_id == message.from_user.id))
-            lang = user.language if user else "en"
+        user = await get_cached_user(session_maker, message.from_user.id)
+        lang = user.language if user else "en"
     await message.answer(t(lang, "not_implemented"))
@@ -1,76 +1,209 @@
 from __future__ import annotations
 
+from datetime import date
+
 from aiogram import F, Router
-from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Message
 
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
+from ..menu import MenuAction
 from ..models import User
-from ..services.stats_service import fetch_daily_stats, reset_all, reset_today
+from ..services.stats_service import (
+    MAX_RANGE_DAYS,
+    RANGE_PRESETS,
+    RangeStats,
+    fetch_daily_stats,
+    fetch_range_stats,
+    preset_range,
+    reset_all,
+    reset_today,
+)
 
 router = Router()
 
+_SPARK_BARS = "▁▂▃▄▅▆▇█"
+
+
+def _range_keyboard(lang: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text=t(lang, "stats_btn_week"), callback_data="stats_range:week"),
+                InlineKeyboardButton(text=t(lang, "stats_btn_month"), callback_data="stats_range:month"),
+            ]
+        ]
+    )
+
+
+def _parse_range(args: list[str], tz: str | None = None) -> tuple[date, date] | None:
+    if len(args) == 1 and args[0].lower() in RANGE_PRESETS:
+        return preset_range(args[0].lower(), tz)
+    if len(args) == 2:
+        try:
+            start, end = date.fromisoformat(args[0]), date.fromisoformat(args[1])
+        except ValueError:
+            return None
+        if start <= end and (end - start).days < MAX_RANGE_DAYS:
+            return start, end
+    return None
+
+
+def _sparkline(values: list[float | None]) -> str:
+    present = [value for value in values if value is not None]
+    if not present:
+        return ""
+    low, high = min(present), max(present)
+    span = (high - low) or 1.0
+    return "".join(
+        "·" if value is None else _SPARK_BARS[int((value - low) / span * (len(_SPARK_BARS) - 1))]
+        for value in values
+    )
+
+
+def format_range(stats: RangeStats, lang: str) -> str:
+    lines = [t(lang, "stats_range_title", start=stats.start.isoformat(), end=stats.end.isoformat())]
+    if not stats.days or not (stats.logged or stats.average_water_ml or stats.weights):
+        lines.append(t(lang, "stats_range_empty"))
+        return "\n".join(lines)
+
+    if stats.logged:
+        lines.append(
+            t(
+                lang,
+                "stats_range_avg_line",
+                calories=_fmt(stats.average("calories")),
+                protein=_fmt(stats.average("protein_g")),
+                fat=_fmt(stats.average("fat_g")),
+                carbs=_fmt(stats.average("carbs_g")),
+                logged=len(stats.logged),
+                total=stats.total_days,
+            )
+        )
+    if stats.average_water_ml:
+        lines.append(t(lang, "stats_range_water_line", ml=int(stats.average_water_ml)))
+    slope = stats.calories_slope
+    if slope is not None:
+        lines.append(
+            t(lang, "stats_range_trend_line", spark=_sparkline(stats.calories_by_day), slope=f"{slope:+.0f}")
+        )
+    weights = stats.weights
+    if len(weights) >= 2:
+        lines.append(
+            t(
+                lang,
+                "stats_range_weight_line",
+                first=_fmt(weights[0]),
+                last=_fmt(weights[-1]),
+                delta=f"{weights[-1] - weights[0]:+.1f}",
+            )
+        )
+
+    lines.append("")
+    lines.append(t(lang, "stats_range_days_title"))
+    for day in stats.days:
+        if not (day.meal_count or day.water_ml):
+            continue
+        lines.append(
+            t(
+                lang,
+                "stats_range_day_line",
+                date=day.day.strftime("%d.%m"),
+                calories=int(day.calories),
+                meals=day.meal_count,
+                ml=int(day.water_ml),
+            )
+        )
+    return "\n".join(lines)
+
+
+async def _send_range(message: Message, user: User, lang: str, session_maker, start: date, end: date) -> None:
+    try:
+        async with session_maker() as session:
+            stats = await fetch_range_stats(session, user.id, start, end)
+    except Exception:
+        await message.answer(t(lang, "stats_error"))
+        return
+    await message.answer(format_range(stats, lang), reply_markup=_range_keyboard(lang))
+
 
 @router.message(Command("stats"))
-@router.message(F.text.in_({t(lang, "menu_stats") for lang in SUPPORTED_LANGUAGES}))
-async def daily_stats(message: Message, user: User | None, lang: str, session_maker) -> None:
+@router.message(MenuAction("menu_stats"))
+async def daily_stats(
+    message: Message,
+    user: User | None,
+    lang: str,
+    session_maker,
+    command: CommandObject | None = None,
+) -> None:
     if not user:
         await message.answer(t(lang, "profile_missing"))
         return
 
+    args = command.args.split() if command and command.args else []
+    if args:
+        period = _parse_range(args, user.timezone)
+        if period is None:
+            await message.answer(t(lang, "stats_range_usage"))
+            return
+        await _send_range(message, user, lang, session_maker, *period)
+        return
+
     try:
         async with session_maker() as session:
-            totals, water_total, last_weight = await fetch_daily_stats(session, user.id)
+            stats = await fetch_daily_stats(session, user.id, user.timezone)
     except Exception:
         await message.answer(t(lang, "stats_error"))
         return
 
     lines = [t(lang, "stats_today_title")]
-    if totals and not all(value is None for value in totals):
-        calories, protein, fat, carbs, fiber, sugar = (
-            totals[0] or 0,
-            totals[1] or 0,
-            totals[2] or 0,
-            totals[3] or 0,
-            totals[4] or 0,
-            totals[5] or 0,
-        )
-
+    if stats.meal_count:
         lines.append(
             t(
                 lang,
                 "stats_today_line",
-                calories=_fmt(calories),
-                protein=_fmt(protein),
-                fat=_fmt(fat),
-                carbs=_fmt(carbs),
+                calories=_fmt(stats.calories),
+                protein=_fmt(stats.protein_g),
+                fat=_fmt(stats.fat_g),
+                carbs=_fmt(stats.carbs_g),
             )
         )
-        if fiber or sugar:
+        if stats.fiber_g or stats.sugar_g:
             lines.append(
                 t(
                     lang,
                     "stats_today_macros_title",
                 )
-                + f"\nFiber: {_fmt(fiber)} g, Sugar: {_fmt(sugar)} g"
+                + f"\nFiber: {_fmt(stats.fiber_g)} g, Sugar: {_fmt(stats.sugar_g)} g"
             )
     else:
         lines.append(t(lang, "stats_today_no_meals"))
 
-    if water_total:
-        lines.append(t(lang, "stats_today_water_line", ml=int(water_total)))
+    if stats.water_ml:
+        lines.append(t(lang, "stats_today_water_line", ml=int(stats.water_ml)))
 
-    if last_weight:
+    if stats.last_weight_kg is not None and stats.last_weight_at is not None:
         lines.append(
             t(
                 lang,
                 "stats_last_weight_line",
-                weight=_fmt(last_weight.weight_kg),
-                date=last_weight.datetime.date().isoformat(),
+                weight=_fmt(stats.last_weight_kg),
+                date=stats.last_weight_at.date().isoformat(),
             )
         )
 
-    await message.answer("\n".join(lines))
+    await message.answer("\n".join(lines), reply_markup=_range_keyboard(lang))
+
+
+@router.callback_query(F.data.startswith("stats_range:"))
+async def range_stats_selected(callback: CallbackQuery, user: User | None, lang: str, session_maker) -> None:
+    preset = callback.data.split(":", 1)[1]
+    if not user or preset not in RANGE_PRESETS:
+        await callback.answer()
+        return
+
+    await _send_range(callback.message, user, lang, session_maker, *preset_range(preset, user.timezone))
+    await callback.answer()
 
 
 @router.message(Command("reset_stats"))
@@ -81,7 +214,7 @@ async def reset_stats(message: Message, user: User | None, lang: str, session_ma
 
     try:
         async with session_maker() as session:
-            await reset_today(session, user.id)
+            await reset_today(session, user.id, user.timezone)
     except Exception:
         await message.answer(t(lang, "stats_reset_error"))
         return
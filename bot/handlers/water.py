@@ -6,8 +6,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
 from ..keyboards import main_menu, water_presets_keyboard
+from ..menu import MenuAction
 from ..models import User
 from ..services.water_service import add_water_and_total
 
@@ -26,7 +27,7 @@ def _parse_amount(text: str) -> float | None:
 
 
 @router.message(Command("water"))
-@router.message(F.text.in_({t(lang, "menu_water") for lang in SUPPORTED_LANGUAGES}))
+@router.message(MenuAction("menu_water"))
 async def start_water_log(
     message: Message,
     state: FSMContext,
@@ -38,7 +39,7 @@ async def start_water_log(
         return
 
     await state.set_state(WaterStates.waiting_amount)
-    await state.update_data(user_id=user.id, language=lang)
+    await state.update_data(user_id=user.id, language=lang, timezone=user.timezone)
     await message.answer(t(lang, "ask_water_amount"), reply_markup=water_presets_keyboard(lang))
 
 
@@ -60,7 +61,7 @@ async def water_preset_selected(callback: CallbackQuery, state: FSMContext, sess
         return
 
     async with session_maker() as session:
-        total_ml = await add_water_and_total(session, user_id, volume)
+        total_ml = await add_water_and_total(session, user_id, volume, data.get("timezone"))
     await callback.message.answer(
         "\n".join(
             [
@@ -98,7 +99,7 @@ async def water_amount_entered(message: Message, state: FSMContext, session_make
         return
 
     async with session_maker() as session:
-        total_ml = await add_water_and_total(session, user_id, amount)
+        total_ml = await add_water_and_total(session, user_id, amount, data.get("timezone"))
     await message.answer(
         "\n".join(
             [t(lang, "water_saved"), t(lang, "water_today_total", ml=int(total_ml))]
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from aiogram import F, Router
+from aiogram import Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
 
-from ..i18n import SUPPORTED_LANGUAGES, t
+from ..i18n import t
 from ..keyboards import main_menu
+from ..menu import MenuAction
 from ..models import User
 from ..services.weight_service import log_weight
 
@@ -32,7 +33,7 @@ def _parse_weight(text: str) -> float | None:
 
 
 @router.message(Command("weight"))
-@router.message(F.text.in_({t(lang, "menu_weight") for lang in SUPPORTED_LANGUAGES}))
+@router.message(MenuAction("menu_weight"))
 async def start_weight_log(message: Message, state: FSMContext, user: User | None, lang: str) -> None:
     if not user:
         return
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Any
+from typing import Any, Callable
 
 translations: dict[str, dict[str, str]] = {
     "en": {
@@ -31,6 +31,7 @@ translations: dict[str, dict[str, str]] = {
         "profile_field_allergies": "Allergies / intolerances",
         "profile_field_activity_level": "Activity level",
         "profile_field_nutrition_goal": "Nutrition goal",
+        "profile_field_timezone": "Time zone",
         "profile_edit_prompt": "Select what you want to edit:",
         "menu_main": "Main menu",
         "not_implemented": "This feature is not implemented yet in this version.",
@@ -75,6 +76,8 @@ translations: dict[str, dict[str, str]] = {
         "goal_symptom_control": "Symptom control",
         "invalid_date": "Couldn't understand the date, please use DD.MM.YYYY or YYYY-MM-DD",
         "invalid_number": "Please enter a valid number.",
+        "ask_timezone": "Send your time zone, e.g. Europe/Warsaw or UTC+3. Days in /stats start at your local midnight.",
+        "invalid_timezone": "Unknown time zone. Try a name like Europe/Warsaw or an offset like UTC+3.",
         "skip": "Skip",
         "profile_missing": "Profile not found. Please run /start first.",
         "updated": "Updated!",
@@ -104,12 +107,25 @@ translations: dict[str, dict[str, str]] = {
         "stats_today_water_line": "Water: {ml} ml",
         "stats_last_weight_line": "Last weight: {weight} kg on {date}.",
         "stats_error": "Error while calculating stats. Please try again later.",
+        "stats_range_title": "Stats for {start} – {end}:",
+        "stats_range_empty": "No meals or water logged in this period.",
+        "stats_range_avg_line": "Average per logged day: {calories} kcal (P {protein} g / F {fat} g / C {carbs} g), {logged} of {total} days logged.",
+        "stats_range_water_line": "Average water: {ml} ml per day.",
+        "stats_range_trend_line": "Calories trend: {spark} ({slope} kcal/day)",
+        "stats_range_weight_line": "Weight: {first} → {last} kg ({delta} kg).",
+        "stats_range_days_title": "By day:",
+        "stats_range_day_line": "{date}: {calories} kcal, {meals} meals, water {ml} ml",
+        "stats_range_usage": "Use /stats, /stats week, /stats month or /stats YYYY-MM-DD YYYY-MM-DD (up to 92 days).",
+        "stats_btn_week": "Last 7 days",
+        "stats_btn_month": "Last 30 days",
         "stats_reset_done": "Today's meals and water stats have been cleared.",
         "stats_reset_error": "Could not reset stats. Please try again later.",
         "stats_reset_all_done": "All your meals, water, and weight logs have been cleared.",
         "stats_reset_all_error": "Could not reset all stats. Please try again later.",
         "error_no_photo": "I did not find a photo in your message. Please send a picture of your meal.",
         "error_photo_processing": "Error while processing the photo. Please try again.",
+        "error_photo_too_large": "The photo is too large (max {mb} MB). Please send a smaller one.",
+        "error_photo_unsupported": "This image format is not supported. Please send a JPEG, PNG or WebP photo.",
         "ask_water_amount": "How much water did you drink? (in ml)",
         "water_preset_200": "200 ml",
         "water_preset_250": "250 ml",
@@ -127,8 +143,10 @@ translations: dict[str, dict[str, str]] = {
         "weight_invalid": "Please enter a valid weight in kg.",
         "ask_dietitian_intro": "You can ask a question about your diet, digestion, symptoms, or your logs. I will answer as an AI nutrition assistant.",
         "ask_dietitian_prompt": "What would you like to ask?",
+        "ask_dietitian_thinking": "Thinking…",
         "ask_dietitian_disclaimer": "I am not a doctor and this is not medical advice. For serious or persistent symptoms, please consult a healthcare professional.",
         "ask_dietitian_error": "Error while generating a response. Please try again later.",
+        "ask_dietitian_cut_off": "(The answer was cut off. Please ask again.)",
         "unknown_command": "I don’t understand this command. Use /help to see available features.",
         "help_text": (
             "I am your AI nutrition and digestion assistant. I can:\n"
@@ -142,12 +160,13 @@ translations: dict[str, dict[str, str]] = {
             "Commands:\n"
             "/start - start or reset onboarding\n"
             "/profile - show and edit your profile\n"
-            "/stats - today’s stats\n"
+            "/stats - today’s stats (/stats week, /stats month)\n"
             "/water - add water intake\n"
             "/weight - log weight\n"
             "/ask - ask the AI dietitian\n"
             "/reset_stats - clear today’s meals and water\n"
             "/reset_all - delete all meals, water, and weight logs\n"
+            "/export_history - download your AI chat history\n"
             "/delete_me - delete all your data"
         ),
         "delete_me_intro": "This will delete ALL your data: profile, meals, water, weight, history and AI chats. This action cannot be undone.",
@@ -156,6 +175,9 @@ translations: dict[str, dict[str, str]] = {
         "delete_me_confirm_button_no": "No, cancel",
         "delete_me_cancelled": "Deletion cancelled. Your data is safe.",
         "delete_me_done": "All your data has been deleted. If you start again with /start, a new profile will be created.",
+        "export_history_caption": "Your AI dietitian chat history: {count} messages.",
+        "export_history_empty": "You have no AI dietitian chat history yet.",
+        "flood_slow_down": "You're sending requests too fast. Please wait a few seconds and try again.",
     },
     "ru": {
         "welcome": "Добро пожаловать к вашему ИИ-диетологу! Давайте настроим профиль.",
@@ -185,6 +207,7 @@ translations: dict[str, dict[str, str]] = {
         "profile_field_allergies": "Аллергии / непереносимости",
         "profile_field_activity_level": "Активность",
         "profile_field_nutrition_goal": "Цель питания",
+        "profile_field_timezone": "Часовой пояс",
         "profile_edit_prompt": "Выберите, что изменить:",
         "menu_main": "Главное меню",
         "not_implemented": "Эта функция пока недоступна.",
@@ -229,6 +252,8 @@ translations: dict[str, dict[str, str]] = {
         "goal_symptom_control": "Контроль симптомов",
         "invalid_date": "Не получилось прочитать дату, используйте ДД.ММ.ГГГГ или ГГГГ-ММ-ДД",
         "invalid_number": "Пожалуйста, введите корректное число.",
+        "ask_timezone": "Отправьте ваш часовой пояс, например Europe/Moscow или UTC+3. Дни в /stats начинаются в вашу местную полночь.",
+        "invalid_timezone": "Неизвестный часовой пояс. Попробуйте название вроде Europe/Moscow или смещение вроде UTC+3.",
         "skip": "Пропустить",
         "profile_missing": "Профиль не найден. Сначала вызовите /start.",
         "updated": "Обновлено!",
@@ -258,12 +283,25 @@ translations: dict[str, dict[str, str]] = {
         "stats_today_water_line": "Вода: {ml} мл",
         "stats_last_weight_line": "Последний вес: {weight} кг от {date}.",
         "stats_error": "Ошибка при расчёте статистики. Попробуйте позже.",
+        "stats_range_title": "Статистика за {start} – {end}:",
+        "stats_range_empty": "За этот период нет записей еды или воды.",
+        "stats_range_avg_line": "В среднем за день с записями: {calories} ккал (Б {protein} г / Ж {fat} г / У {carbs} г), дней с записями: {logged} из {total}.",
+        "stats_range_water_line": "Вода в среднем: {ml} мл в день.",
+        "stats_range_trend_line": "Тренд калорий: {spark} ({slope} ккал/день)",
+        "stats_range_weight_line": "Вес: {first} → {last} кг ({delta} кг).",
+        "stats_range_days_title": "По дням:",
+        "stats_range_day_line": "{date}: {calories} ккал, приёмов: {meals}, вода {ml} мл",
+        "stats_range_usage": "Используйте /stats, /stats week, /stats month или /stats ГГГГ-ММ-ДД ГГГГ-ММ-ДД (до 92 дней).",
+        "stats_btn_week": "За 7 дней",
+        "stats_btn_month": "За 30 дней",
         "stats_reset_done": "Статистика за сегодня (еда и вода) очищена.",
         "stats_reset_error": "Не удалось сбросить статистику. Попробуйте позже.",
         "stats_reset_all_done": "Все записи еды, воды и веса очищены.",
         "stats_reset_all_error": "Не удалось сбросить все данные. Попробуйте позже.",
         "error_no_photo": "Не удалось найти фото в сообщении. Пожалуйста, отправьте снимок блюда.",
         "error_photo_processing": "Ошибка при обработке фото. Попробуйте ещё раз.",
+        "error_photo_too_large": "Фото слишком большое (максимум {mb} МБ). Отправьте, пожалуйста, фото поменьше.",
+        "error_photo_unsupported": "Этот формат изображения не поддерживается. Отправьте фото в JPEG, PNG или WebP.",
         "ask_water_amount": "Сколько воды вы выпили? (в мл)",
         "water_preset_200": "200 мл",
         "water_preset_250": "250 мл",
@@ -281,8 +319,10 @@ translations: dict[str, dict[str, str]] = {
         "weight_invalid": "Введите корректное значение веса в кг.",
         "ask_dietitian_intro": "Вы можете задать вопрос о питании, желудке, симптомах или ваших записях. Я отвечу как ИИ-помощник по питанию.",
         "ask_dietitian_prompt": "Что вы хотите спросить?",
+        "ask_dietitian_thinking": "Думаю…",
         "ask_dietitian_disclaimer": "Я не врач и это не медицинская консультация. При серьёзных или продолжающихся симптомах обратитесь к врачу.",
         "ask_dietitian_error": "Ошибка при подготовке ответа. Попробуйте позже.",
+        "ask_dietitian_cut_off": "(Ответ оборвался. Пожалуйста, задайте вопрос ещё раз.)",
         "unknown_command": "Не понимаю эту команду. Используйте /help, чтобы увидеть доступные функции.",
         "help_text": (
             "Я ваш ИИ-помощник по питанию и пищеварению. Я могу:\n"
@@ -296,12 +336,13 @@ translations: dict[str, dict[str, str]] = {
             "Команды:\n"
             "/start - начать или пройти онбординг заново\n"
             "/profile - показать и редактировать профиль\n"
-            "/stats - статистика за сегодня\n"
+            "/stats - статистика за сегодня (/stats week, /stats month)\n"
             "/water - добавить воду\n"
             "/weight - записать вес\n"
             "/ask - спросить ИИ-диетолога\n"
             "/reset_stats - очистить сегодняшние записи еды и воды\n"
             "/reset_all - удалить все записи еды, воды и веса\n"
+            "/export_history - скачать историю диалогов с ИИ\n"
             "/delete_me - удалить все данные"
         ),
         "delete_me_intro": "Это удалит ВСЕ ваши данные: профиль, приёмы пищи, воду, вес, историю и диалоги с ИИ. Действие необратимо.",
@@ -310,6 +351,9 @@ translations: dict[str, dict[str, str]] = {
         "delete_me_confirm_button_no": "Нет, отменить",
         "delete_me_cancelled": "Удаление отменено. Ваши данные в сохранности.",
         "delete_me_done": "Все ваши данные удалены. Если начнёте снова через /start, будет создан новый профиль.",
+        "export_history_caption": "История диалогов с ИИ-диетологом: {count} сообщений.",
+        "export_history_empty": "У вас пока нет истории диалогов с ИИ-диетологом.",
+        "flood_slow_down": "Вы отправляете запросы слишком часто. Подождите несколько секунд и попробуйте снова.",
     },
     "pl": {
         "welcome": "Witamy u twojego AI dietetyka! Ustawmy profil.",
@@ -339,6 +383,7 @@ translations: dict[str, dict[str, str]] = {
         "profile_field_allergies": "Alergie / nietolerancje",
         "profile_field_activity_level": "Aktywność",
         "profile_field_nutrition_goal": "Cel żywieniowy",
+        "profile_field_timezone": "Strefa czasowa",
         "profile_edit_prompt": "Wybierz co chcesz edytować:",
         "menu_main": "Menu główne",
         "not_implemented": "Ta funkcja nie jest jeszcze dostępna w tej wersji.",
@@ -383,6 +428,8 @@ translations: dict[str, dict[str, str]] = {
         "goal_symptom_control": "Kontrola objawów",
         "invalid_date": "Nie rozumiem daty, użyj DD.MM.RRRR lub RRRR-MM-DD",
         "invalid_number": "Podaj poprawną liczbę.",
+        "ask_timezone": "Podaj swoją strefę czasową, np. Europe/Warsaw lub UTC+2. Dni w /stats zaczynają się o lokalnej północy.",
+        "invalid_timezone": "Nieznana strefa czasowa. Spróbuj nazwy jak Europe/Warsaw lub przesunięcia jak UTC+2.",
         "skip": "Pomiń",
         "profile_missing": "Brak profilu. Uruchom /start.",
         "updated": "Zaktualizowano!",
@@ -412,8 +459,21 @@ translations: dict[str, dict[str, str]] = {
         "stats_today_water_line": "Woda: {ml} ml",
         "stats_last_weight_line": "Ostatnia waga: {weight} kg z dnia {date}.",
         "stats_error": "Błąd podczas liczenia statystyk. Spróbuj ponownie później.",
+        "stats_range_title": "Statystyki za {start} – {end}:",
+        "stats_range_empty": "Brak zapisanych posiłków i wody w tym okresie.",
+        "stats_range_avg_line": "Średnio na dzień z zapisami: {calories} kcal (B {protein} g / T {fat} g / W {carbs} g), dni z zapisami: {logged} z {total}.",
+        "stats_range_water_line": "Średnio wody: {ml} ml dziennie.",
+        "stats_range_trend_line": "Trend kalorii: {spark} ({slope} kcal/dzień)",
+        "stats_range_weight_line": "Waga: {first} → {last} kg ({delta} kg).",
+        "stats_range_days_title": "Według dni:",
+        "stats_range_day_line": "{date}: {calories} kcal, posiłki: {meals}, woda {ml} ml",
+        "stats_range_usage": "Użyj /stats, /stats week, /stats month lub /stats RRRR-MM-DD RRRR-MM-DD (do 92 dni).",
+        "stats_btn_week": "Ostatnie 7 dni",
+        "stats_btn_month": "Ostatnie 30 dni",
         "error_no_photo": "Nie znalazłem zdjęcia w wiadomości. Wyślij proszę zdjęcie posiłku.",
         "error_photo_processing": "Błąd podczas przetwarzania zdjęcia. Spróbuj ponownie.",
+        "error_photo_too_large": "Zdjęcie jest za duże (maks. {mb} MB). Wyślij proszę mniejsze.",
+        "error_photo_unsupported": "Ten format obrazu nie jest obsługiwany. Wyślij zdjęcie JPEG, PNG lub WebP.",
         "ask_water_amount": "Ile wody wypiłeś? (w ml)",
         "water_preset_200": "200 ml",
         "water_preset_250": "250 ml",
@@ -431,8 +491,10 @@ translations: dict[str, dict[str, str]] = {
         "weight_invalid": "Podaj poprawną wagę w kg.",
         "ask_dietitian_intro": "Możesz zadać pytanie o dietę, trawienie, objawy albo swoje logi. Odpowiem jako asystent żywieniowy AI.",
         "ask_dietitian_prompt": "O co chcesz zapytać?",
+        "ask_dietitian_thinking": "Myślę…",
         "ask_dietitian_disclaimer": "Nie jestem lekarzem i to nie jest porada medyczna. Przy poważnych lub utrzymujących się objawach skonsultuj się z lekarzem.",
         "ask_dietitian_error": "Błąd podczas generowania odpowiedzi. Spróbuj ponownie później.",
+        "ask_dietitian_cut_off": "(Odpowiedź została przerwana. Zadaj pytanie ponownie.)",
         "unknown_command": "Nie rozumiem tej komendy. Użyj /help, aby zobaczyć dostępne funkcje.",
         "help_text": (
             "Jestem twoim asystentem AI od żywienia i trawienia. Mogę:\n"
@@ -445,10 +507,11 @@ translations: dict[str, dict[str, str]] = {
             "Komendy:\n"
             "/start - rozpocznij lub zresetuj onboarding\n"
             "/profile - pokaż i edytuj profil\n"
-            "/stats - statystyki na dziś\n"
+            "/stats - statystyki na dziś (/stats week, /stats month)\n"
             "/water - dodaj wodę\n"
             "/weight - zapisz wagę\n"
             "/ask - zapytaj AI dietetyka\n"
+            "/export_history - pobierz historię rozmów z AI\n"
             "/delete_me - usuń wszystkie dane"
         ),
         "delete_me_intro": "To usunie WSZYSTKIE twoje dane: profil, posiłki, wodę, wagę, historię i czaty z AI. Tego nie da się cofnąć.",
@@ -457,14 +520,38 @@ translations: dict[str, dict[str, str]] = {
         "delete_me_confirm_button_no": "Nie, anuluj",
         "delete_me_cancelled": "Usuwanie anulowane. Twoje dane są bezpieczne.",
         "delete_me_done": "Wszystkie twoje dane zostały usunięte. Jeśli zaczniesz ponownie przez /start, zostanie utworzony nowy profil.",
+        "export_history_caption": "Historia rozmów z AI dietetykiem: {count} wiadomości.",
+        "export_history_empty": "Nie masz jeszcze historii rozmów z AI dietetykiem.",
+        "flood_slow_down": "Wysyłasz zapytania zbyt szybko. Poczekaj kilka sekund i spróbuj ponownie.",
     },
 }
 
 
 SUPPORTED_LANGUAGES = ("en", "ru", "pl")
 
+# Template -> callable that renders it. Strings without braces render as themselves, so
+# t() skips str.format for them; the rest keep their bound str.format.
+_Compiled = Callable[..., str]
+
+
+def _compile(template: str) -> _Compiled:
+    if "{" not in template and "}" not in template:
+        return lambda **_: template
+    return template.format
+
+
+def _compile_translations() -> dict[str, dict[str, _Compiled]]:
+    # English fills keys that are missing (or empty) in a language, as t() always did.
+    english = {key: _compile(value) for key, value in translations["en"].items()}
+    return {
+        lang: {**english, **{key: _compile(value) for key, value in strings.items() if value}}
+        for lang, strings in translations.items()
+    }
+
+
+_compiled = _compile_translations()
+
 
 def t(lang: str, key: str, **kwargs: Any) -> str:
-    lang_map = translations.get(lang) or translations["en"]
-    template = lang_map.get(key) or translations["en"].get(key, key)
-    return template.format(**kwargs)
+    render = (_compiled.get(lang) or _compiled["en"]).get(key)
+    return render(**kwargs) if render else key
@@ -1,3 +1,5 @@
+from types import MappingProxyType
+
 from aiogram.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
@@ -8,7 +10,7 @@ from aiogram.types import (
 from .i18n import SUPPORTED_LANGUAGES, t
 
 
-def language_keyboard() -> InlineKeyboardMarkup:
+def _build_language_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text=code.upper(), callback_data=f"lang_{code}")]
         for code in SUPPORTED_LANGUAGES
@@ -16,7 +18,7 @@ def language_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def sex_keyboard(lang: str) -> ReplyKeyboardMarkup:
+def _build_sex_keyboard(lang: str) -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(text=t(lang, "sex_m"))],
         [KeyboardButton(text=t(lang, "sex_f"))],
@@ -25,7 +27,7 @@ def sex_keyboard(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
 
 
-def activity_keyboard(lang: str) -> ReplyKeyboardMarkup:
+def _build_activity_keyboard(lang: str) -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(text=t(lang, "activity_low"))],
         [KeyboardButton(text=t(lang, "activity_medium"))],
@@ -34,7 +36,7 @@ def activity_keyboard(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
 
 
-def nutrition_goal_keyboard(lang: str) -> ReplyKeyboardMarkup:
+def _build_nutrition_goal_keyboard(lang: str) -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(text=t(lang, "goal_weight_loss"))],
         [KeyboardButton(text=t(lang, "goal_maintenance"))],
@@ -44,13 +46,13 @@ def nutrition_goal_keyboard(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True, one_time_keyboard=True)
 
 
-def skip_keyboard(lang: str) -> ReplyKeyboardMarkup:
+def _build_skip_keyboard(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text=t(lang, "skip"))]], resize_keyboard=True, one_time_keyboard=True
     )
 
 
-def main_menu(lang: str) -> ReplyKeyboardMarkup:
+def _build_main_menu(lang: str) -> ReplyKeyboardMarkup:
     buttons = [
         [
             KeyboardButton(text=t(lang, "menu_log_meal")),
@@ -66,17 +68,18 @@ def main_menu(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
 
-def profile_edit_keyboard(lang: str) -> InlineKeyboardMarkup:
+def _build_profile_edit_keyboard(lang: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text=t(lang, "profile_field_weight"), callback_data="edit_weight")],
         [InlineKeyboardButton(text=t(lang, "profile_field_height"), callback_data="edit_height")],
         [InlineKeyboardButton(text=t(lang, "profile_field_activity_level"), callback_data="edit_activity")],
         [InlineKeyboardButton(text=t(lang, "profile_field_nutrition_goal"), callback_data="edit_goal")],
+        [InlineKeyboardButton(text=t(lang, "profile_field_timezone"), callback_data="edit_timezone")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def meal_type_keyboard(lang: str) -> InlineKeyboardMarkup:
+def _build_meal_type_keyboard(lang: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text=t(lang, "meal_type_breakfast"), callback_data="mealtype_breakfast")],
         [InlineKeyboardButton(text=t(lang, "meal_type_lunch"), callback_data="mealtype_lunch")],
@@ -86,7 +89,7 @@ def meal_type_keyboard(lang: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def water_presets_keyboard(lang: str) -> InlineKeyboardMarkup:
+def _build_water_presets_keyboard(lang: str) -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text=t(lang, "water_preset_200"), callback_data="water_ml_200")],
         [InlineKeyboardButton(text=t(lang, "water_preset_250"), callback_data="water_ml_250")],
@@ -95,3 +98,65 @@ def water_presets_keyboard(lang: str) -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text=t(lang, "water_other_amount"), callback_data="water_other")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+_BUILDERS = {
+    "sex": _build_sex_keyboard,
+    "activity": _build_activity_keyboard,
+    "nutrition_goal": _build_nutrition_goal_keyboard,
+    "skip": _build_skip_keyboard,
+    "main_menu": _build_main_menu,
+    "profile_edit": _build_profile_edit_keyboard,
+    "meal_type": _build_meal_type_keyboard,
+    "water_presets": _build_water_presets_keyboard,
+}
+
+# Built once at import. The markup objects are shared between all replies, so they
+# must never be modified in place; build a new one if a reply needs a variation.
+_REGISTRY = MappingProxyType(
+    {
+        lang: MappingProxyType({name: build(lang) for name, build in _BUILDERS.items()})
+        for lang in SUPPORTED_LANGUAGES
+    }
+)
+_LANGUAGE_KEYBOARD = _build_language_keyboard()
+
+
+def _keyboard(lang: str, name: str):
+    return (_REGISTRY.get(lang) or _REGISTRY["en"])[name]
+
+
+def language_keyboard() -> InlineKeyboardMarkup:
+    return _LANGUAGE_KEYBOARD
+
+
+def sex_keyboard(lang: str) -> ReplyKeyboardMarkup:
+    return _keyboard(lang, "sex")
+
+
+def activity_keyboard(lang: str) -> ReplyKeyboardMarkup:
+    return _keyboard(lang, "activity")
+
+
+def nutrition_goal_keyboard(lang: str) -> ReplyKeyboardMarkup:
+    return _keyboard(lang, "nutrition_goal")
+
+
+def skip_keyboard(lang: str) -> ReplyKeyboardMarkup:
+    return _keyboard(lang, "skip")
+
+
+def main_menu(lang: str) -> ReplyKeyboardMarkup:
+    return _keyboard(lang, "main_menu")
+
+
+def profile_edit_keyboard(lang: str) -> InlineKeyboardMarkup:
+    return _keyboard(lang, "profile_edit")
+
+
+def meal_type_keyboard(lang: str) -> InlineKeyboardMarkup:
+    return _keyboard(lang, "meal_type")
+
+
+def water_presets_keyboard(lang: str) -> InlineKeyboardMarkup:
+    return _keyboard(lang, "water_presets")
@@ -3,13 +3,18 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import BaseStorage
 
 from . import models  # noqa: F401
-from .config import load_config
-from .db import init_db, setup_database
+from .config import Settings, load_config
+from .db import dispose_database, get_session_maker, init_db, setup_database
+from .fsm_storage import SqlAlchemyStorage
 from .handlers import (
     ask,
     delete_me,
+    export_history,
     food,
     help as help_handler,
     misc,
@@ -22,7 +27,21 @@ from .handlers import (
     weight,
 )
 from .services import build_ai_dietitian_service, build_ai_nutrition_service
-from .middlewares import UserContextMiddleware
+from .flood_control import flood_control
+from .metrics import handler_timings
+from .outbound import OutboundSender
+from .middlewares import (
+    BufferedFSMMiddleware,
+    FloodControlMiddleware,
+    HandlerTimingMiddleware,
+    MenuActionMiddleware,
+    UserContextMiddleware,
+)
+from .services.history_archive import run_retention
+from .services.llm_limiter import llm_limiter
+from .services.user_service import unknown_user_cache, user_cache
+from .settings import settings
+from .webhook import run_webhook
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,26 +52,79 @@ logger = logging.getLogger(__name__)
 
 async def main() -> None:
     config = load_config()
-    setup_database(config.database_url)
+    setup_database(config.database_url, sqlite_profile=config.sqlite_profile)
     await init_db()
 
-    ai_service = build_ai_nutrition_service(config)
-    ai_dietitian_service = build_ai_dietitian_service(config)
+    bot = build_bot(config)
+    ai_service = bot.ai_service
+    ai_dietitian_service = bot.ai_dietitian_service
+    outbound = bot.outbound
+
+    fsm_storage = SqlAlchemyStorage(get_session_maker())
+    dp = create_dispatcher(fsm_storage)
+
+    retention_task = (
+        asyncio.create_task(run_retention(get_session_maker())) if settings.history_retention.enabled else None
+    )
+
+    logger.info("Bot started (%s)", config.bot_mode)
+    try:
+        if config.bot_mode == "webhook":
+            await run_webhook(dp, bot, config)
+        else:
+            # getUpdates is refused while a webhook is set.
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
+    finally:
+        if retention_task:
+            retention_task.cancel()
+            # Let a pass that is inside a session unwind before the engine is disposed.
+            await asyncio.gather(retention_task, return_exceptions=True)
+        logger.info("User cache stats: %s", user_cache.stats())
+        logger.info("Unknown user cache stats: %s", unknown_user_cache.stats())
+        logger.info("LLM limiter stats: %s", llm_limiter.stats())
+        logger.info("Flood control stats: %s", flood_control.stats())
+        logger.info("Outbound sender stats: %s", outbound.stats())
+        logger.info("Handler latency: %s", handler_timings.stats())
+        await ai_dietitian_service.wait_for_background()
+        # The dispatcher closes the storage on shutdown; this only catches stragglers.
+        await fsm_storage.close()
+        logger.info("FSM storage stats: %s", fsm_storage.stats())
+        logger.info("Dietitian reply stats: %s", ai_dietitian_service.stats())
+        if ai_service.estimate_cache:
+            logger.info("Estimate cache stats: %s", ai_service.estimate_cache.stats())
+        if ai_service.photo_cache:
+            logger.info("Photo cache stats: %s", ai_service.photo_cache.stats())
+        await dispose_database()
 
+
+def build_bot(config: Settings) -> Bot:
+    """Bot with services attached, shared by main() and the load test. Call after setup_database."""
+
+    session = None
+    if config.telegram_api_base:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.telegram_api_base))
     bot = Bot(
         token=config.telegram_bot_token,
+        session=session,
         default=DefaultBotProperties(parse_mode="HTML"),
     )
     # Attach services as attributes for access inside handlers.
-    bot.ai_service = ai_service
-    bot.ai_dietitian_service = ai_dietitian_service
+    bot.ai_service = build_ai_nutrition_service(config, session_maker=get_session_maker())
+    bot.ai_dietitian_service = build_ai_dietitian_service(config, session_maker=get_session_maker())
     # Expose session maker so handlers can safely access DB even if the module-level
     # reference is still None in some contexts.
-    from .db import async_session_maker  # local import to avoid circular issues
+    bot.session_maker = get_session_maker()
+    bot.outbound = OutboundSender()
+    if settings.outbound.enabled:
+        bot.session.middleware(bot.outbound)
+    return bot
 
-    bot.session_maker = async_session_maker
 
-    dp = Dispatcher()
+def create_dispatcher(storage: BaseStorage | None = None) -> Dispatcher:
+    """Routers and middlewares, shared by polling, webhook mode and the load tests."""
+
+    dp = Dispatcher(storage=storage)
 
     dp.include_router(start.router)
     dp.include_router(food.router)
@@ -65,14 +137,22 @@ async def main() -> None:
     dp.include_router(profile.router)
     dp.include_router(help_handler.router)
     dp.include_router(delete_me.router)
+    dp.include_router(export_history.router)
     dp.include_router(misc.router)
 
     # Middlewares: resolve user/lang/session_maker for all updates.
+    dp.message.outer_middleware(MenuActionMiddleware())
+    if settings.flood_control.enabled:
+        dp.message.middleware(FloodControlMiddleware())
+        dp.callback_query.middleware(FloodControlMiddleware())
+    dp.message.middleware(HandlerTimingMiddleware())
+    dp.callback_query.middleware(HandlerTimingMiddleware())
     dp.message.middleware(UserContextMiddleware())
     dp.callback_query.middleware(UserContextMiddleware())
-
-    logger.info("Bot started")
-    await dp.start_polling(bot)
+    # FSM reads/writes of a handler are applied to storage once, after it returns.
+    dp.message.middleware(BufferedFSMMiddleware())
+    dp.callback_query.middleware(BufferedFSMMiddleware())
+    return dp
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+
+from aiogram.filters import BaseFilter
+from aiogram.types import Message
+
+from .i18n import translations
+
+# Reply-keyboard buttons that trigger an action; the i18n key doubles as the action id.
+MENU_KEYS = (
+    "menu_log_meal",
+    "menu_photo_meal",
+    "menu_water",
+    "menu_weight",
+    "menu_stats",
+    "btn_fridge",
+    "btn_budget",
+    "btn_recipes",
+    "menu_ask_dietitian",
+    "btn_profile",
+)
+
+
+def build_menu_index(
+    keys: tuple[str, ...] = MENU_KEYS, strings_by_lang: dict[str, dict[str, str]] | None = None
+) -> MappingProxyType:
+    """Localized button text -> action, over every language in ``i18n.translations``."""
+
+    index: dict[str, str] = {}
+    for lang, strings in (strings_by_lang or translations).items():
+        for key in keys:
+            text = strings.get(key)
+            if not text:
+                continue
+            if index.setdefault(text, key) != key:
+                raise ValueError(f"Menu text {text!r} ({lang}) is used by both {index[text]} and {key}")
+    return MappingProxyType(index)
+
+
+MENU_INDEX = build_menu_index()
+
+
+class MenuAction(BaseFilter):
+    """
+    Matches messages whose text is one of the given menu buttons in any language. The
+    lookup itself happens once per update in ``MenuActionMiddleware``.
+    """
+
+    def __init__(self, *actions: str) -> None:
+        self.actions = frozenset(actions)
+
+    async def __call__(self, message: Message, menu_action: str | None = None) -> bool:
+        return menu_action in self.actions
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Any
+
+
+class LatencyWindow:
+    """Keeps the last ``maxlen`` durations (seconds) and reports percentiles in ms."""
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self._samples: deque[float] = deque(maxlen=maxlen)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    def stats(self, prefix: str = "") -> dict[str, Any]:
+        return {
+            f"{prefix}count": self.count,
+            f"{prefix}p50_ms": self.percentile(0.5),
+            f"{prefix}p95_ms": self.percentile(0.95),
+            f"{prefix}max_ms": round(max(self._samples) * 1000, 1) if self._samples else 0.0,
+        }
+
+
+class HandlerTimings:
+    """A LatencyWindow per handler, fed by ``HandlerTimingMiddleware``."""
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.maxlen = maxlen
+        self.windows: dict[str, LatencyWindow] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        window = self.windows.get(name)
+        if window is None:
+            window = self.windows[name] = LatencyWindow(self.maxlen)
+        window.add(seconds)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {name: window.stats() for name, window in sorted(self.windows.items())}
+
+
+handler_timings = HandlerTimings()
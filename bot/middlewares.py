@@ -1,11 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject
-from sqlalchemy import select
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
 
 from .db import get_session_maker
-from .models import User
+from .flood_control import flood_control
+from .fsm_storage import BufferedFSMContext
+from .i18n import t, translations
+from .metrics import handler_timings
+from .menu import MENU_INDEX
+from .services.user_service import get_cached_user, user_cache
+
+logger = logging.getLogger(__name__)
 
 
 class UserContextMiddleware(BaseMiddleware):
@@ -25,11 +36,107 @@ class UserContextMiddleware(BaseMiddleware):
         # Not every update has from_user (e.g., channel posts), guard accordingly.
         from_user = getattr(event, "from_user", None)
         if from_user:
-            async with session_maker() as session:
-                user = await session.scalar(select(User).where(User.telegram_id == from_user.id))
+            user = await get_cached_user(session_maker, from_user.id)
             if user:
                 lang = user.language
 
         data["user"] = user
         data["lang"] = lang
         return await handler(event, data)
+
+
+class MenuActionMiddleware(BaseMiddleware):
+    """
+    Outer message middleware: resolves the menu button (if any) behind the message text
+    once, so ``MenuAction`` filters compare a precomputed value instead of re-matching text.
+    """
+
+    def __init__(self, index=None) -> None:
+        self.index = MENU_INDEX if index is None else index
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        text = getattr(event, "text", None)
+        data["menu_action"] = self.index.get(text) if text else None
+        return await handler(event, data)
+
+
+class BufferedFSMMiddleware(BaseMiddleware):
+    """
+    Gives the handler a BufferedFSMContext: its get/set/update calls stay local and are
+    written to storage once after it returns. If the handler raises, they are dropped.
+    """
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        state = data.get("state")
+        if state is None or isinstance(state, BufferedFSMContext):
+            return await handler(event, data)
+
+        buffered = BufferedFSMContext(state.storage, state.key, raw_state=data.get("raw_state"))
+        data["state"] = buffered
+        result = await handler(event, data)
+        await buffered.commit()
+        return result
+
+
+class FloodControlMiddleware(BaseMiddleware):
+    """
+    Drops or briefly delays updates from users (or a whole bot) going over the
+    ``FloodControl`` budget. Registered before ``UserContextMiddleware`` so a dropped
+    update costs no database access; the "slow down" reply uses the cached language.
+    """
+
+    def __init__(self, limiter=None) -> None:
+        self.limiter = limiter or flood_control
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        from_user = getattr(event, "from_user", None)
+        if from_user is None:
+            return await handler(event, data)
+
+        delay = self.limiter.admit(from_user.id, self.limiter.cost(event, data))
+        if delay is None:
+            warn = self.limiter.should_warn(from_user.id)
+            if warn or isinstance(event, CallbackQuery):
+                await self._reply(event, self._language(from_user) if warn else None)
+            return None
+        if delay:
+            await asyncio.sleep(delay)
+        return await handler(event, data)
+
+    @staticmethod
+    def _language(from_user) -> str:
+        # peek: throttled updates should not count towards the user cache's hit ratio.
+        user = user_cache.peek(from_user.id)
+        if user:
+            return user.language
+        code = (from_user.language_code or "").split("-", 1)[0]
+        return code if code in translations else "en"
+
+    @staticmethod
+    async def _reply(event: TelegramObject, lang: str | None) -> None:
+        # Button presses are always answered so the client stops its spinner; the
+        # warning (a toast, or a message for texts) is only added when ``lang`` is given.
+        text = t(lang, "flood_slow_down") if lang else None
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text)
+            elif text and isinstance(event, Message):
+                await event.answer(text)
+        except TelegramAPIError as exc:
+            logger.debug("Flood reply not delivered: %s", exc)
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    """Records how long each handler takes (with the inner middlewares after this one)."""
+
+    def __init__(self, timings=None) -> None:
+        self.timings = timings or handler_timings
+
+    async def __call__(self, handler, event: TelegramObject, data: dict):
+        callback = data["handler"].callback
+        name = f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.timings.add(name, time.perf_counter() - started)
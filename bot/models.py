@@ -1,12 +1,15 @@
 from datetime import datetime, date
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Date,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     Text,
     func,
@@ -36,6 +39,7 @@ class User(Base):
     allergies_intolerances: Mapped[str | None] = mapped_column(Text, nullable=True)
     activity_level: Mapped[str | None] = mapped_column(String(20), nullable=True)
     nutrition_goal: Mapped[str | None] = mapped_column(String(30), nullable=True)
+    timezone: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -52,6 +56,15 @@ class User(Base):
         "ConversationMessage", back_populates="user"
     )
     recipes: Mapped[list["Recipe"]] = relationship("Recipe", back_populates="user")
+    daily_summaries: Mapped[list["DailySummary"]] = relationship(
+        "DailySummary", back_populates="user"
+    )
+    conversation_summary: Mapped["ConversationSummary | None"] = relationship(
+        "ConversationSummary", back_populates="user"
+    )
+    conversation_archives: Mapped[list["ConversationArchive"]] = relationship(
+        "ConversationArchive", back_populates="user"
+    )
 
     def __repr__(self) -> str:
         return f"<User telegram_id={self.telegram_id}>"
@@ -59,9 +72,10 @@ class User(Base):
 
 class Meal(Base):
     __tablename__ = "meals"
+    __table_args__ = (Index("ix_meals_user_id_created_at", "user_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -86,9 +100,10 @@ class Meal(Base):
 
 class Recipe(Base):
     __tablename__ = "recipes"
+    __table_args__ = (Index("ix_recipes_user_id_created_at", "user_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     body: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
@@ -103,9 +118,10 @@ class Recipe(Base):
 
 class WaterIntake(Base):
     __tablename__ = "water_intakes"
+    __table_args__ = (Index("ix_water_intakes_user_id_datetime", "user_id", "datetime"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     datetime: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -116,9 +132,10 @@ class WaterIntake(Base):
 
 class WeightLog(Base):
     __tablename__ = "weight_logs"
+    __table_args__ = (Index("ix_weight_logs_user_id_datetime", "user_id", "datetime"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     datetime: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -129,9 +146,10 @@ class WeightLog(Base):
 
 class ConversationMessage(Base):
     __tablename__ = "conversation_messages"
+    __table_args__ = (Index("ix_conversation_messages_user_id_created_at", "user_id", "created_at"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     role: Mapped[str] = mapped_column(String(20), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
@@ -139,3 +157,109 @@ class ConversationMessage(Base):
     )
 
     user: Mapped[User] = relationship("User", back_populates="conversation_messages")
+
+
+class ConversationSummary(Base):
+    """Rolling summary of a user's /ask history up to ``covered_until`` (see conversation_memory)."""
+
+    __tablename__ = "conversation_summaries"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    summary: Mapped[str] = mapped_column(Text, nullable=False)
+    # created_at of the newest message folded into the summary; later ones stay verbatim.
+    covered_until: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    user: Mapped[User] = relationship("User", back_populates="conversation_summary")
+
+
+class ConversationArchive(Base):
+    """A chunk of old /ask messages moved out of conversation_messages (see history_archive)."""
+
+    __tablename__ = "conversation_archives"
+    __table_args__ = (Index("ix_conversation_archives_user_id_first_at", "user_id", "first_at"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    first_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    message_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    # zlib-compressed JSON list of {"role", "content", "created_at"}.
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    user: Mapped[User] = relationship("User", back_populates="conversation_archives")
+
+
+class FsmState(Base):
+    """aiogram FSM state and data per storage key (see bot.fsm_storage)."""
+
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    # JSON; dates and datetimes are tagged so they round-trip.
+    data: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+
+class DailySummary(Base):
+    """Per-user, per-day rollup kept in sync by the logging services (see summary_service)."""
+
+    __tablename__ = "daily_summaries"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    local_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    calories: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    protein_g: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    fat_g: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    carbs_g: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    fiber_g: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    sugar_g: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    water_ml: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    meal_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_weight_kg: Mapped[float | None] = mapped_column(Float, nullable=True)
+    last_weight_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    user: Mapped[User] = relationship("User", back_populates="daily_summaries")
+
+
+class EstimateCacheEntry(Base):
+    """Cached nutrition estimate for a normalized meal text (see services.estimate_cache)."""
+
+    __tablename__ = "estimate_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(64))
+    language: Mapped[str] = mapped_column(String(5))
+    normalized_text: Mapped[str] = mapped_column(Text)
+    payload: Mapped[str] = mapped_column(Text)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+
+class PhotoEstimateCacheEntry(Base):
+    """Cached photo estimate, found by Telegram's file_unique_id or by a perceptual hash."""
+
+    __tablename__ = "photo_estimate_cache"
+    __table_args__ = (Index("ix_photo_estimate_cache_user_id_last_used_at", "user_id", "last_used_at"),)
+
+    file_unique_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    # Who sent the photo; near-duplicate matches are limited to the same user.
+    user_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # 64-bit dHash stored as a signed integer (SQLite INTEGER is signed 64-bit).
+    dhash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    model: Mapped[str] = mapped_column(String(64))
+    payload: Mapped[str] = mapped_column(Text)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    hit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
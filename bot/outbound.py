@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    ForwardMessage,
+    SendAnimation,
+    SendAudio,
+    SendDocument,
+    SendLocation,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendSticker,
+    SendVideo,
+    SendVoice,
+    TelegramMethod,
+)
+
+from .metrics import LatencyWindow
+from .settings import OutboundTuning, settings
+
+logger = logging.getLogger(__name__)
+
+# Calls that post a new message; these are what Telegram's per-chat and global limits count.
+_SHAPED_METHODS = (
+    SendMessage,
+    SendPhoto,
+    SendDocument,
+    SendAnimation,
+    SendAudio,
+    SendVideo,
+    SendVoice,
+    SendSticker,
+    SendLocation,
+    SendMediaGroup,
+    CopyMessage,
+    ForwardMessage,
+)
+MAX_MESSAGE_LENGTH = 4096
+
+
+class _Bucket:
+    __slots__ = ("level", "updated", "rate", "burst")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.level = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take one token (possibly ahead of time); returns how long to wait for it."""
+
+        now = time.monotonic()
+        self.level = min(self.burst, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= 1
+        return max(0.0, -self.level / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        # After a RetryAfter nothing is available until the ban is over.
+        self.level = min(self.level, -seconds * self.rate)
+        self.updated = time.monotonic()
+
+
+@dataclass
+class _Outgoing:
+    make_request: NextRequestMiddlewareType
+    method: TelegramMethod
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class _ChatQueue:
+    __slots__ = ("pending", "bucket", "worker")
+
+    def __init__(self, tuning: OutboundTuning) -> None:
+        self.pending: deque[_Outgoing] = deque()
+        self.bucket = _Bucket(tuning.chat_per_second, tuning.chat_burst)
+        self.worker: asyncio.Task | None = None
+
+
+class OutboundSender(BaseRequestMiddleware):
+    """
+    Request-session middleware that shapes outgoing messages to Telegram's limits.
+
+    Every call that posts a message joins its chat's FIFO queue; one worker per chat sends
+    them in order, each after taking a token from the chat's bucket and the global one.
+    The caller still awaits the real response. A RetryAfter pauses the chat (and, for
+    bot-wide floods, everyone) and the message is retried. With ``merge_texts``, plain
+    text messages already waiting for the same chat are sent as one message. Other
+    calls (edits, callback answers, getFile) pass straight through.
+    """
+
+    def __init__(self, tuning: OutboundTuning | None = None) -> None:
+        self.tuning = tuning or settings.outbound
+        self._global = _Bucket(self.tuning.global_per_second, self.tuning.global_burst)
+        self._chats: dict[Any, _ChatQueue] = {}
+        self._next_sweep = time.monotonic() + self.tuning.idle_seconds
+        self.queue_wait = LatencyWindow()
+        self.sent = 0
+        self.merged = 0
+        self.retries = 0
+        self.failed = 0
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not isinstance(method, _SHAPED_METHODS):
+            return await make_request(bot, method)
+
+        if time.monotonic() >= self._next_sweep:
+            self._sweep()
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = _ChatQueue(self.tuning)
+        item = _Outgoing(make_request, method, asyncio.get_running_loop().create_future())
+        queue.pending.append(item)
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._drain(bot, chat_id, queue))
+        return await item.future
+
+    async def _drain(self, bot: Bot, chat_id: Any, queue: _ChatQueue) -> None:
+        try:
+            while queue.pending:
+                group = self._next_group(queue.pending)
+                if not group:
+                    continue
+                await asyncio.sleep(max(queue.bucket.reserve(), self._global.reserve()))
+                method = group[0].method if len(group) == 1 else self._merged(group)
+                self.queue_wait.add(time.monotonic() - group[0].enqueued_at)
+                try:
+                    response = await self._send(bot, group[0].make_request, method, queue)
+                except Exception as exc:  # noqa: BLE001
+                    self.failed += 1
+                    for item in group:
+                        if not item.future.done():
+                            item.future.set_exception(exc)
+                    continue
+                self.sent += 1
+                self.merged += len(group) - 1
+                for item in group:
+                    if not item.future.done():
+                        item.future.set_result(response)
+        finally:
+            queue.worker = None
+
+    def _sweep(self) -> None:
+        # Chats whose bucket has refilled carry no rate history, so they can be forgotten.
+        cutoff = time.monotonic() - self.tuning.idle_seconds
+        idle = [
+            chat_id
+            for chat_id, queue in self._chats.items()
+            if queue.worker is None and not queue.pending and queue.bucket.updated < cutoff
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+        self._next_sweep = time.monotonic() + self.tuning.idle_seconds
+
+    def _next_group(self, pending: deque[_Outgoing]) -> list[_Outgoing]:
+        group: list[_Outgoing] = []
+        length = 0
+        while pending:
+            item = pending[0]
+            if item.future.done():  # the caller gave up (cancelled)
+                pending.popleft()
+                continue
+            if group and not (self.tuning.merge_texts and self._can_merge(group[-1].method, item.method, length)):
+                break
+            pending.popleft()
+            group.append(item)
+            if isinstance(item.method, SendMessage):
+                length += len(item.method.text) + len(self.tuning.merge_separator)
+        return group
+
+    @staticmethod
+    def _can_merge(previous: TelegramMethod, method: TelegramMethod, length: int) -> bool:
+        if not (isinstance(previous, SendMessage) and isinstance(method, SendMessage)):
+            return False
+        # Only the last message of a merged group may carry a keyboard.
+        if previous.reply_markup is not None or previous.entities or method.entities:
+            return False
+        return (
+            previous.parse_mode == method.parse_mode
+            and previous.message_thread_id == method.message_thread_id
+            and length + len(method.text) <= MAX_MESSAGE_LENGTH
+        )
+
+    def _merged(self, group: list[_Outgoing]) -> SendMessage:
+        last = group[-1].method
+        return group[0].method.model_copy(
+            update={
+                "text": self.tuning.merge_separator.join(item.method.text for item in group),
+                "reply_markup": last.reply_markup,
+            }
+        )
+
+    async def _send(self, bot: Bot, make_request: NextRequestMiddlewareType, method: TelegramMethod, queue: _ChatQueue):
+        for attempt in range(self.tuning.max_retries + 1):
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                if attempt == self.tuning.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning("Telegram asked to retry after %ss (chat %s)", exc.retry_after, method.chat_id)
+                queue.bucket.pause(exc.retry_after)
+                if self.tuning.pause_all_on_retry:
+                    self._global.pause(exc.retry_after)
+                await asyncio.sleep(exc.retry_after)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "merged": self.merged,
+            "retries": self.retries,
+            "failed": self.failed,
+            "chats": len(self._chats),
+            "pending": sum(len(queue.pending) for queue in self._chats.values()),
+            **self.queue_wait.stats("queue_wait_"),
+        }
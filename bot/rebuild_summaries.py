@@ -0,0 +1,52 @@
+"""
+Recompute the daily_summaries rollup from raw meal/water/weight logs.
+
+    python -m bot.rebuild_summaries            # rebuild every user
+    python -m bot.rebuild_summaries --check    # only report rows that drifted
+    python -m bot.rebuild_summaries --user-id 42
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+from . import models  # noqa: F401
+from .config import database_url_from_env, sqlite_profile_from_env
+from .db import dispose_database, get_session_maker, init_db, setup_database
+from .services.summary_service import find_mismatches, rebuild_summaries
+
+
+async def run(check: bool, user_id: int | None) -> int:
+    load_dotenv()
+    setup_database(database_url_from_env(), sqlite_profile=sqlite_profile_from_env())
+    await init_db()
+    try:
+        async with get_session_maker()() as session:
+            if check:
+                problems = await find_mismatches(session, user_id)
+                for line in problems:
+                    print(line)
+                print(f"{len(problems)} mismatching values")
+                return 1 if problems else 0
+
+            count = await rebuild_summaries(session, user_id)
+            print(f"Rebuilt {count} daily summary rows")
+            return 0
+    finally:
+        await dispose_database()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="compare stored rows with raw logs, do not write")
+    parser.add_argument("--user-id", type=int, default=None, help="limit to a single internal user id")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.check, args.user_id)))
+
+
+if __name__ == "__main__":
+    main()
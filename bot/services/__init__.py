@@ -1,17 +1,36 @@
 from __future__ import annotations
 
+from dataclasses import replace
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
 from ..config import Settings
+from ..settings import settings as app_settings
 from .ai_dietitian import AiDietitianService
 from .ai_nutrition import AiNutritionService
+from .estimate_cache import EstimateCache
+from .photo_cache import PhotoEstimateCache
 
 
-def build_ai_nutrition_service(settings: Settings) -> AiNutritionService:
+def build_ai_nutrition_service(
+    settings: Settings, session_maker: async_sessionmaker[AsyncSession] | None = None
+) -> AiNutritionService:
     """Factory for the AI nutrition estimator service."""
 
-    return AiNutritionService(openai_api_key=getattr(settings, "openai_api_key", None))
+    return AiNutritionService(
+        openai_api_key=getattr(settings, "openai_api_key", None),
+        estimate_cache=EstimateCache(session_maker),
+        photo_cache=PhotoEstimateCache(session_maker),
+        batching=replace(
+            app_settings.estimate_batching,
+            enabled=getattr(settings, "estimate_batching", False) or app_settings.estimate_batching.enabled,
+        ),
+    )
 
 
-def build_ai_dietitian_service(settings: Settings) -> AiDietitianService:
+def build_ai_dietitian_service(
+    settings: Settings, session_maker: async_sessionmaker[AsyncSession] | None = None
+) -> AiDietitianService:
     """Factory for the AI dietitian dialog service."""
 
-    return AiDietitianService(openai_api_key=getattr(settings, "openai_api_key", None))
+    return AiDietitianService(openai_api_key=getattr(settings, "openai_api_key", None), session_maker=session_maker)
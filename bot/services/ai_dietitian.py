@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
 
 try:
@@ -8,14 +12,29 @@ try:
 except ImportError:  # pragma: no cover - fallback if dependency не установлена
     AsyncOpenAI = None  # type: ignore
 
-from sqlalchemy import desc, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, Text, cast, desc, literal, null, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from ..models import ConversationMessage, Meal, User, WaterIntake, WeightLog
+from ..metrics import LatencyWindow
+from ..models import ConversationMessage, ConversationSummary, Meal, User, WaterIntake, WeightLog
+from ..settings import DialogMemory, settings
+from .conversation_memory import fit_dialog, load_unsummarized, save_summary
+from .llm_limiter import Priority, estimate_tokens, llm_limiter
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class DietitianContext:
+    """Recent history that goes into the prompt, newest first."""
+
+    dialog: list[str]
+    meal_texts: list[str | None]
+    water_ml: list[float]
+    weights_kg: list[float]
+    summary: str | None = None
+
+
 class AiDietitianService:
     """Stubbed AI dietitian dialog service.
 
@@ -23,89 +42,202 @@ class AiDietitianService:
     that uses the provided user context and recent logs to generate tailored guidance.
     """
 
-    def __init__(self, openai_api_key: str | None):
+    def __init__(
+        self,
+        openai_api_key: str | None,
+        session_maker: async_sessionmaker[AsyncSession] | None = None,
+        memory: DialogMemory | None = None,
+    ):
         self.openai_api_key = openai_api_key
         self.client = AsyncOpenAI(api_key=openai_api_key) if openai_api_key and AsyncOpenAI else None
         self.model = "gpt-4o-mini"
+        self.time_to_first_token = LatencyWindow()
+        self.stream_duration = LatencyWindow()
+        # Older turns are folded into a summary in the background; needs its own sessions.
+        self.session_maker = session_maker
+        self.memory = memory or settings.dialog_memory
+        self._compacting: set[int] = set()
+        self._background: set[asyncio.Task] = set()
+        self.compactions = 0
 
-    async def get_recent_messages(
-        self, session: AsyncSession, user: User, limit: int = 10
-    ) -> list[ConversationMessage]:
-        stmt = (
-            select(ConversationMessage)
-            .where(ConversationMessage.user_id == user.id)
-            .order_by(desc(ConversationMessage.created_at))
-            .limit(limit)
-        )
-        result = await session.scalars(stmt)
-        return list(result)
-
-    async def save_message(
-        self, session: AsyncSession, user: User, role: str, content: str
-    ) -> ConversationMessage:
-        message = ConversationMessage(user_id=user.id, role=role, content=content)
-        session.add(message)
-        await session.commit()
-        await session.refresh(message)
-        return message
-
-    async def get_recent_meals(
-        self, session: AsyncSession, user: User, limit: int = 10
-    ) -> list[Meal]:
-        stmt = (
-            select(Meal)
-            .where(Meal.user_id == user.id)
-            .order_by(desc(Meal.created_at))
-            .limit(limit)
-        )
-        result = await session.scalars(stmt)
-        return list(result)
+    async def load_context(
+        self,
+        session: AsyncSession,
+        user: User,
+        *,
+        messages: int | None = None,
+        meals: int = 5,
+        water_days: int = 1,
+        weights: int = 3,
+    ) -> DietitianContext:
+        """
+        Everything the prompt needs in one UNION ALL round trip, selecting only the
+        columns that end up in the prompt. Each branch walks its (user_id, time) index.
+        """
 
-    async def get_recent_water(
-        self, session: AsyncSession, user: User, days: int = 1
-    ) -> list[WaterIntake]:
         now = datetime.now(timezone.utc)
-        start = now - timedelta(days=days)
-        stmt = (
-            select(WaterIntake)
+        no_text = cast(null(), Text)
+        no_value = cast(null(), Float)
+        covered_until = (
+            select(ConversationSummary.covered_until)
+            .where(ConversationSummary.user_id == user.id)
+            .scalar_subquery()
+        )
+        branches = [
+            select(
+                literal("summary").label("kind"),
+                ConversationSummary.summary.label("text"),
+                no_value.label("value"),
+                ConversationSummary.updated_at.label("at"),
+            ).where(ConversationSummary.user_id == user.id),
+            # Only turns the summary does not cover yet.
+            select(
+                literal("dialog").label("kind"),
+                ConversationMessage.content.label("text"),
+                no_value.label("value"),
+                ConversationMessage.created_at.label("at"),
+            )
             .where(
+                ConversationMessage.user_id == user.id,
+                or_(covered_until.is_(None), ConversationMessage.created_at > covered_until),
+            )
+            .order_by(desc(ConversationMessage.created_at))
+            .limit(messages or self.memory.max_recent_messages),
+            select(
+                literal("meal").label("kind"),
+                Meal.raw_text.label("text"),
+                no_value.label("value"),
+                Meal.created_at.label("at"),
+            )
+            .where(Meal.user_id == user.id)
+            .order_by(desc(Meal.created_at))
+            .limit(meals),
+            select(
+                literal("water").label("kind"),
+                no_text.label("text"),
+                WaterIntake.volume_ml.label("value"),
+                WaterIntake.datetime.label("at"),
+            ).where(
                 WaterIntake.user_id == user.id,
-                WaterIntake.datetime >= start,
+                WaterIntake.datetime >= now - timedelta(days=water_days),
                 WaterIntake.datetime <= now,
+            ),
+            select(
+                literal("weight").label("kind"),
+                no_text.label("text"),
+                WeightLog.weight_kg.label("value"),
+                WeightLog.datetime.label("at"),
             )
-            .order_by(desc(WaterIntake.datetime))
-        )
-        result = await session.scalars(stmt)
-        return list(result)
-
-    async def get_recent_weights(
-        self, session: AsyncSession, user: User, limit: int = 3
-    ) -> list[WeightLog]:
-        stmt = (
-            select(WeightLog)
             .where(WeightLog.user_id == user.id)
             .order_by(desc(WeightLog.datetime))
-            .limit(limit)
+            .limit(weights),
+        ]
+        # SQLite only allows ORDER BY/LIMIT inside a compound select through subqueries.
+        stmt = union_all(*(select(branch.subquery()) for branch in branches))
+        rows = (await session.execute(stmt)).all()
+        # The read is done; don't keep a pooled connection checked out during the LLM call.
+        await session.commit()
+
+        grouped: dict[str, list] = {"summary": [], "dialog": [], "meal": [], "water": [], "weight": []}
+        for row in sorted(rows, key=lambda row: _as_aware(row.at), reverse=True):
+            grouped[row.kind].append(row.value if row.kind in ("water", "weight") else row.text)
+        return DietitianContext(
+            dialog=grouped["dialog"],
+            meal_texts=grouped["meal"],
+            water_ml=grouped["water"],
+            weights_kg=grouped["weight"],
+            summary=grouped["summary"][0] if grouped["summary"] else None,
         )
-        result = await session.scalars(stmt)
-        return list(result)
 
-    async def generate_reply(
+    async def save_exchange(
+        self, session: AsyncSession, user: User, question: str, asked_at: datetime, reply: str
+    ) -> None:
+        """Store the question and the reply in one transaction, once the reply exists."""
+
+        session.add_all(
+            [
+                ConversationMessage(user_id=user.id, role="user", content=question, created_at=asked_at),
+                ConversationMessage(
+                    user_id=user.id, role="assistant", content=reply, created_at=datetime.now(timezone.utc)
+                ),
+            ]
+        )
+        await session.commit()
+
+    def schedule_compaction(self, user: User, context: DietitianContext, *new_turns: str) -> None:
+        """
+        Start folding older turns into the summary in the background once the history the
+        summary does not cover outgrows ``compact_after_tokens``. Cheap to call after every /ask.
+        """
+
+        if not self.client or self.session_maker is None or user.id in self._compacting:
+            return
+        if estimate_tokens(*context.dialog, *new_turns) <= self.memory.compact_after_tokens:
+            return
+        self._compacting.add(user.id)
+        task = asyncio.create_task(self._compact(user.id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def wait_for_background(self) -> None:
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _compact(self, user_id: int) -> None:
+        config = self.memory
+        try:
+            async with self.session_maker() as session:
+                summary, rows = await load_unsummarized(session, user_id, config.max_compact_messages)
+                await session.commit()
+            older = rows[: -config.keep_recent_messages] if config.keep_recent_messages else rows
+            if not older or estimate_tokens(*(row.content for row in rows)) <= config.compact_after_tokens:
+                return
+            text = await self._summarize(summary.summary if summary else None, older, user_id)
+            async with self.session_maker() as session:
+                await save_summary(session, user_id, text, older[-1].created_at)
+            self.compactions += 1
+        except Exception as exc:  # noqa: BLE001
+            # The raw turns are still there; the next /ask simply tries again.
+            logger.warning("Conversation compaction for user %s failed: %s", user_id, exc)
+        finally:
+            self._compacting.discard(user_id)
+
+    async def _summarize(self, previous: str | None, turns: list, user_id: int) -> str:
+        system = (
+            "You maintain a running summary of a conversation between a user and a nutrition coach."
+            " Merge the previous summary with the new turns. Keep the user's goals, preferences,"
+            " symptoms, constraints and the advice already given; drop small talk."
+            f" Plain text, at most {self.memory.summary_max_tokens * 3 // 4} words."
+        )
+        dialog = "\n".join(f"{row.role}: {row.content}" for row in turns)
+        user_prompt = f"Previous summary: {previous or '-'}\n\nNew turns:\n{dialog}"
+        async with llm_limiter.slot(
+            priority=Priority.BACKGROUND,
+            user_id=user_id,
+            tokens=estimate_tokens(system, user_prompt, max_tokens=self.memory.summary_max_tokens),
+        ) as ticket:
+            resp = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=self.memory.summary_max_tokens,
+                temperature=0.2,
+            )
+            ticket.record_usage(getattr(resp, "usage", None))
+        return resp.choices[0].message.content.strip()
+
+    def _build_messages(
         self,
         user: User,
-        recent_meals: list[Meal],
-        recent_water: list[WaterIntake],
-        recent_weights: list[WeightLog],
-        recent_messages: list[ConversationMessage],
+        context: DietitianContext,
         user_message: str,
         language: str,
-    ) -> str:
-        # Без ключа работаем по старой заглушке.
-        if not self.client:
-            return _fallback(language)
-
+    ) -> list[dict[str, str]]:
         age = _calculate_age(user.date_of_birth)
-        messages = [
+        dialog = fit_dialog(context.summary, context.dialog, self.memory.prompt_dialog_tokens)
+        return [
             {
                 "role": "system",
                 "content": (
@@ -122,28 +254,106 @@ class AiDietitianService:
                     f"GI diagnoses={user.gi_diagnoses}, other diagnoses={user.other_diagnoses}, "
                     f"medications={user.medications}, allergies={user.allergies_intolerances}, "
                     f"activity_level={user.activity_level}, nutrition_goal={user.nutrition_goal}. "
-                    f"Recent meals: {[m.raw_text for m in recent_meals[:5]]}. "
-                    f"Water last {len(recent_water)} entries (ml): {[w.volume_ml for w in recent_water]}. "
-                    f"Recent weights: {[w.weight_kg for w in recent_weights]}. "
-                    f"Recent dialog: {[m.content for m in recent_messages]}. "
+                    f"Recent meals: {context.meal_texts}. "
+                    f"Water last {len(context.water_ml)} entries (ml): {context.water_ml}. "
+                    f"Recent weights: {context.weights_kg}. "
+                    f"Earlier conversation (summary): {context.summary or '-'}. "
+                    f"Recent dialog: {dialog}. "
                     f"User says: {user_message}. Language: {language}."
                 ),
             },
         ]
 
+    async def generate_reply(
+        self,
+        user: User,
+        context: DietitianContext,
+        user_message: str,
+        language: str,
+    ) -> str:
+        # Без ключа работаем по старой заглушке.
+        if not self.client:
+            return _fallback(language)
+
+        messages = self._build_messages(user, context, user_message, language)
         try:
-            resp = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=350,
-                temperature=0.4,
-            )
+            async with llm_limiter.slot(
+                priority=Priority.INTERACTIVE,
+                user_id=user.id,
+                tokens=estimate_tokens(*(m["content"] for m in messages), max_tokens=350),
+            ) as ticket:
+                resp = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=350,
+                    temperature=0.4,
+                )
+                ticket.record_usage(getattr(resp, "usage", None))
             return resp.choices[0].message.content
         except Exception as exc:  # noqa: BLE001
             logger.warning("Dietitian reply failed, falling back to stub: %s", exc)
             return _fallback(language)
 
-    async def suggest_recipe(self, title: str, language: str) -> str:
+    async def stream_reply(
+        self,
+        user: User,
+        context: DietitianContext,
+        user_message: str,
+        language: str,
+    ) -> AsyncIterator[str]:
+        """
+        Same reply as ``generate_reply`` but yields the text accumulated so far as
+        tokens arrive. Falls back to the stub only if nothing was received yet; if the
+        stream breaks later, the error is re-raised so the partial text is not taken
+        for a complete reply.
+        """
+
+        if not self.client:
+            yield _fallback(language)
+            return
+
+        messages = self._build_messages(user, context, user_message, language)
+        text = ""
+        started = time.monotonic()
+        try:
+            async with llm_limiter.slot(
+                priority=Priority.INTERACTIVE,
+                user_id=user.id,
+                tokens=estimate_tokens(*(m["content"] for m in messages), max_tokens=350),
+            ):
+                # Time to first token is measured from the user's side, so it includes queueing.
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=350,
+                    temperature=0.4,
+                    stream=True,
+                )
+                # Closes the HTTP response too if the consumer stops early.
+                async with stream:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        if not text:
+                            self.time_to_first_token.add(time.monotonic() - started)
+                        text += delta
+                        yield text
+            self.stream_duration.add(time.monotonic() - started)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Dietitian reply stream failed after %s chars: %s", len(text), exc)
+            if text:
+                raise
+            yield _fallback(language)
+
+    def stats(self) -> dict[str, object]:
+        return {
+            **self.time_to_first_token.stats("ttft_"),
+            **self.stream_duration.stats("stream_"),
+            "compactions": self.compactions,
+        }
+
+    async def suggest_recipe(self, title: str, language: str, user_id: int | None = None) -> str:
         """
         Generate a short home-cooking recipe draft with ingredients and steps.
         Falls back to a local stub if no OpenAI client is configured.
@@ -159,21 +369,32 @@ class AiDietitianService:
         )
         user_prompt = f"Title: {title}. Language: {language}."
         try:
-            resp = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user_prompt},
-                ],
-                max_tokens=400,
-                temperature=0.5,
-            )
+            async with llm_limiter.slot(
+                priority=Priority.BACKGROUND,
+                user_id=user_id,
+                tokens=estimate_tokens(system, user_prompt, max_tokens=400),
+            ) as ticket:
+                resp = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    max_tokens=400,
+                    temperature=0.5,
+                )
+                ticket.record_usage(getattr(resp, "usage", None))
             return resp.choices[0].message.content
         except Exception as exc:  # noqa: BLE001
             logger.warning("Recipe suggestion failed, falling back to stub: %s", exc)
             return _recipe_fallback(language, title)
 
 
+def _as_aware(moment: datetime) -> datetime:
+    # SQLite hands back naive datetimes (stored as UTC).
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
 def _calculate_age(birth_date: date | None) -> int | None:
     if not birth_date:
         return None
@@ -1,24 +1,85 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from typing import Any
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
 
 try:
     from openai import AsyncOpenAI
 except ImportError:  # pragma: no cover - fallback if dependency не установлена
     AsyncOpenAI = None  # type: ignore
 
+from ..settings import EstimateBatching, settings
+from .llm_limiter import Priority, estimate_tokens, llm_limiter
+from .photo_pipeline import encode_data_url
+
+if TYPE_CHECKING:
+    from .estimate_cache import EstimateCache
+    from .photo_cache import PhotoEstimateCache
+
 logger = logging.getLogger(__name__)
 
+_TEXT_SYSTEM_PROMPT = (
+    "You are a nutrition analyzer. Given a meal description, estimate calories,"
+    " protein_g, fat_g, carbs_g, fiber_g, sugar_g. Respond JSON with keys:"
+    ' {"calories": number|null, "protein_g": number|null, "fat_g": number|null,'
+    ' "carbs_g": number|null, "fiber_g": number|null, "sugar_g": number|null,'
+    ' "ai_notes": string}. Use metric units. Keep ai_notes short.'
+)
+_BATCH_SYSTEM_PROMPT = (
+    "You are a nutrition analyzer. You get a JSON array of meal descriptions, each with"
+    " an id and language. Estimate calories, protein_g, fat_g, carbs_g, fiber_g, sugar_g"
+    ' for every one. Respond JSON: {"items": [{"id": number, "calories": number|null,'
+    ' "protein_g": number|null, "fat_g": number|null, "carbs_g": number|null,'
+    ' "fiber_g": number|null, "sugar_g": number|null, "ai_notes": string}]}, one item per'
+    " input id. Use metric units. Keep ai_notes short."
+)
+_ESTIMATE_KEYS = ("calories", "protein_g", "fat_g", "carbs_g", "fiber_g", "sugar_g", "ai_notes")
+
+
+def _pick_estimates(parsed: dict[str, Any]) -> dict[str, Any]:
+    return {key: parsed.get(key) for key in _ESTIMATE_KEYS}
+
+
+@dataclass
+class _PendingEstimate:
+    text: str
+    language: str | None
+    user_id: int | None
+    future: asyncio.Future
+
+
+class _UsageShare:
+    """One item's share of a batched request's token usage."""
+
+    def __init__(self, usage: Any, items: int) -> None:
+        self.prompt_tokens = (getattr(usage, "prompt_tokens", 0) or 0) // items
+        self.completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) // items
+
 
 class AiNutritionService:
     """Stub service that will later call a real LLM or food database."""
 
-    def __init__(self, openai_api_key: str | None) -> None:
+    def __init__(
+        self,
+        openai_api_key: str | None,
+        estimate_cache: EstimateCache | None = None,
+        photo_cache: PhotoEstimateCache | None = None,
+        batching: EstimateBatching | None = None,
+    ) -> None:
         self.openai_api_key = openai_api_key
+        self.estimate_cache = estimate_cache
+        self.photo_cache = photo_cache
         self.client = AsyncOpenAI(api_key=openai_api_key) if openai_api_key and AsyncOpenAI else None
         self.model = "gpt-4o-mini"
+        self.batching = batching or settings.estimate_batching
+        self._pending: list[_PendingEstimate] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._batch_tasks: set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.batched_items = 0
         self._fallback = {
             "calories": 500.0,
             "protein_g": 20.0,
@@ -29,7 +90,9 @@ class AiNutritionService:
             "ai_notes": "Approximate values based on user description.",
         }
 
-    async def estimate_meal_from_text(self, text: str, language: str | None = None) -> dict[str, Any]:
+    async def estimate_meal_from_text(
+        self, text: str, language: str | None = None, user_id: int | None = None
+    ) -> dict[str, Any]:
         """
         Estimate macros via OpenAI. Falls back to stub if ключа нет или ответ не удалось распарсить.
         """
@@ -37,44 +100,164 @@ class AiNutritionService:
         if not self.client:
             return {**self._fallback, "language": language}
 
-        system_prompt = (
-            "You are a nutrition analyzer. Given a meal description, estimate calories,"
-            " protein_g, fat_g, carbs_g, fiber_g, sugar_g. Respond JSON with keys:"
-            ' {"calories": number|null, "protein_g": number|null, "fat_g": number|null,'
-            ' "carbs_g": number|null, "fiber_g": number|null, "sugar_g": number|null,'
-            ' "ai_notes": string}. Use metric units. Keep ai_notes short.'
-        )
-        user_prompt = f"Meal description ({language or 'en'}): {text}"
+        if self.estimate_cache:
+            cached = await self.estimate_cache.get(text, language or "en", self.model)
+            if cached is not None:
+                return {**cached, "language": language}
 
         try:
+            if self.batching.enabled:
+                estimates, usage = await self._estimate_batched(text, language, user_id)
+            else:
+                estimates, usage = await self._request_text_estimate(text, language, user_id)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Nutrition estimation failed, falling back to stub: %s", exc)
+            return {**self._fallback, "language": language}
+
+        if self.estimate_cache and estimates["calories"] is not None:
+            await self.estimate_cache.put(
+                text,
+                language or "en",
+                self.model,
+                estimates,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            )
+        return {**estimates, "language": language}
+
+    async def _request_text_estimate(
+        self, text: str, language: str | None, user_id: int | None
+    ) -> tuple[dict[str, Any], Any]:
+        user_prompt = f"Meal description ({language or 'en'}): {text}"
+        async with llm_limiter.slot(
+            priority=Priority.ESTIMATE,
+            user_id=user_id,
+            tokens=estimate_tokens(_TEXT_SYSTEM_PROMPT, user_prompt, max_tokens=200),
+        ) as ticket:
             resp = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": _TEXT_SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt},
                 ],
                 response_format={"type": "json_object"},
                 max_tokens=200,
                 temperature=0.2,
             )
-            content = resp.choices[0].message.content
-            parsed = json.loads(content) if content else {}
-            return {
-                "calories": parsed.get("calories"),
-                "protein_g": parsed.get("protein_g"),
-                "fat_g": parsed.get("fat_g"),
-                "carbs_g": parsed.get("carbs_g"),
-                "fiber_g": parsed.get("fiber_g"),
-                "sugar_g": parsed.get("sugar_g"),
-                "ai_notes": parsed.get("ai_notes"),
-                "language": language,
-            }
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("Nutrition estimation failed, falling back to stub: %s", exc)
-            return {**self._fallback, "language": language}
+            ticket.record_usage(getattr(resp, "usage", None))
+        content = resp.choices[0].message.content
+        parsed = json.loads(content) if content else {}
+        return _pick_estimates(parsed), getattr(resp, "usage", None)
+
+    async def _estimate_batched(
+        self, text: str, language: str | None, user_id: int | None
+    ) -> tuple[dict[str, Any], Any]:
+        """
+        Queue the description and wait: the batch is sent after ``max_wait_ms`` or as
+        soon as ``max_items`` descriptions are pending, whichever comes first.
+        """
+
+        loop = asyncio.get_running_loop()
+        pending = _PendingEstimate(text, language, user_id, loop.create_future())
+        self._pending.append(pending)
+        if len(self._pending) >= self.batching.max_items:
+            self._flush_batch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batching.max_wait_ms / 1000, self._flush_batch)
+        return await pending.future
+
+    def _flush_batch(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: list[_PendingEstimate]) -> None:
+        results: dict[int, dict[str, Any]] = {}
+        usage = None
+        if len(batch) > 1:
+            try:
+                results, usage = await self._request_batch(batch)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Batched estimation of %s meals failed, retrying one by one: %s", len(batch), exc)
+
+        # Usage is shared evenly so cached entries still report a realistic cost saved.
+        share = _UsageShare(usage, len(batch))
+
+        async def settle(index: int, pending: _PendingEstimate) -> None:
+            if pending.future.done():
+                return
+            estimates = results.get(index)
+            try:
+                if estimates is None or estimates["calories"] is None:
+                    # Only this item is retried with its own request.
+                    outcome = await self._request_text_estimate(pending.text, pending.language, pending.user_id)
+                else:
+                    outcome = (estimates, share)
+            except Exception as exc:  # noqa: BLE001
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+                return
+            if not pending.future.done():
+                pending.future.set_result(outcome)
+
+        await asyncio.gather(*(settle(index, pending) for index, pending in enumerate(batch)))
+
+    async def _request_batch(self, batch: list[_PendingEstimate]) -> tuple[dict[int, dict[str, Any]], Any]:
+        items = [
+            {"id": index, "language": pending.language or "en", "description": pending.text}
+            for index, pending in enumerate(batch)
+        ]
+        user_prompt = json.dumps(items, ensure_ascii=False)
+        max_tokens = 120 * len(batch)
+        async with llm_limiter.slot(
+            priority=Priority.ESTIMATE,
+            tokens=estimate_tokens(_BATCH_SYSTEM_PROMPT, user_prompt, max_tokens=max_tokens),
+        ) as ticket:
+            resp = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": _BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=max_tokens,
+                temperature=0.2,
+            )
+            ticket.record_usage(getattr(resp, "usage", None))
+        self.batches_sent += 1
+        self.batched_items += len(batch)
+
+        content = resp.choices[0].message.content
+        parsed = json.loads(content) if content else {}
+        results = {}
+        for item in parsed.get("items") or []:
+            if isinstance(item, dict) and isinstance(item.get("id"), int) and 0 <= item["id"] < len(batch):
+                results[item["id"]] = _pick_estimates(item)
+        return results, getattr(resp, "usage", None)
+
+    async def cached_photo_estimate(
+        self, file_unique_id: str | None, photo_metadata: dict[str, Any] | None = None
+    ) -> dict[str, Any] | None:
+        """
+        Estimate for a photo Telegram has already seen (same file_unique_id), so the
+        caller can skip downloading it. None when there is nothing cached.
+        """
+
+        if not self.client or not self.photo_cache or not file_unique_id:
+            return None
+        cached = await self.photo_cache.get_by_file(file_unique_id)
+        return {**cached, "metadata": photo_metadata} if cached is not None else None
 
     async def estimate_meal_from_photo(
-        self, photo_bytes: bytes | None = None, photo_metadata: dict[str, Any] | None = None
+        self,
+        photo_bytes: bytes | memoryview | None = None,
+        photo_metadata: dict[str, Any] | None = None,
+        user_id: int | None = None,
     ) -> dict[str, Any]:
         """
         Estimate meal from photo. Если нет байт или vision недоступно — возвращаем оценку из текста метаданных.
@@ -84,45 +267,61 @@ class AiNutritionService:
         if not self.client or not photo_bytes:
             return {**self._fallback, "metadata": photo_metadata}
 
+        file_unique_id = (photo_metadata or {}).get("file_unique_id")
+        photo_hash = None
+        if self.photo_cache:
+            # Near-identical shot of something already estimated: reuse that answer and
+            # remember this file_unique_id so a resend is an exact hit next time.
+            photo_hash = await self.photo_cache.hash_photo(photo_bytes)
+            cached = await self.photo_cache.get_similar(user_id, photo_hash)
+            if cached is not None:
+                if file_unique_id:
+                    await self.photo_cache.put(file_unique_id, user_id, photo_hash, self.model, cached)
+                return {**cached, "metadata": photo_metadata}
+
         try:
             # Используем vision-модель через base64-байты.
-            import base64
-
-            b64_image = base64.b64encode(photo_bytes).decode()
-            resp = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a nutrition analyzer. Estimate macros from the meal photo."
-                            " Reply JSON with keys as in text mode: calories, protein_g, fat_g,"
-                            " carbs_g, fiber_g, sugar_g, ai_notes."
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Estimate nutrition for this meal photo.",
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{b64_image}",
+            image_url = encode_data_url(photo_bytes, (photo_metadata or {}).get("mime_type", "image/jpeg"))
+            async with llm_limiter.slot(
+                priority=Priority.ESTIMATE,
+                user_id=user_id,
+                tokens=settings.llm.photo_prompt_tokens + 200,
+            ) as ticket:
+                resp = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": (
+                                "You are a nutrition analyzer. Estimate macros from the meal photo."
+                                " Reply JSON with keys as in text mode: calories, protein_g, fat_g,"
+                                " carbs_g, fiber_g, sugar_g, ai_notes."
+                            ),
+                        },
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text",
+                                    "text": "Estimate nutrition for this meal photo.",
                                 },
-                            },
-                        ],
-                    },
-                ],
-                response_format={"type": "json_object"},
-                max_tokens=200,
-                temperature=0.2,
-            )
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": image_url,
+                                    },
+                                },
+                            ],
+                        },
+                    ],
+                    response_format={"type": "json_object"},
+                    max_tokens=200,
+                    temperature=0.2,
+                )
+                ticket.record_usage(getattr(resp, "usage", None))
             content = resp.choices[0].message.content
             parsed = json.loads(content) if content else {}
-            return {
+            estimates = {
                 "calories": parsed.get("calories"),
                 "protein_g": parsed.get("protein_g"),
                 "fat_g": parsed.get("fat_g"),
@@ -130,8 +329,20 @@ class AiNutritionService:
                 "fiber_g": parsed.get("fiber_g"),
                 "sugar_g": parsed.get("sugar_g"),
                 "ai_notes": parsed.get("ai_notes"),
-                "metadata": photo_metadata,
             }
         except Exception as exc:  # noqa: BLE001
             logger.warning("Vision nutrition estimation failed, falling back to stub: %s", exc)
             return {**self._fallback, "metadata": photo_metadata}
+
+        if self.photo_cache and file_unique_id and estimates["calories"] is not None:
+            usage = getattr(resp, "usage", None)
+            await self.photo_cache.put(
+                file_unique_id,
+                user_id,
+                photo_hash,
+                self.model,
+                estimates,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            )
+        return {**estimates, "metadata": photo_metadata}
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import contextlib
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import User
@@ -13,20 +17,45 @@ async def handle_question(
     question: str,
     lang: str,
 ) -> str:
-    await ai_service.save_message(session, user, "user", question)
-    recent_messages = await ai_service.get_recent_messages(session, user)
-    recent_meals = await ai_service.get_recent_meals(session, user)
-    recent_water = await ai_service.get_recent_water(session, user)
-    recent_weights = await ai_service.get_recent_weights(session, user)
-
+    # The question is stored together with the reply, so one write transaction per /ask.
+    asked_at = datetime.now(timezone.utc)
+    context = await ai_service.load_context(session, user)
     reply_text = await ai_service.generate_reply(
         user=user,
-        recent_meals=recent_meals,
-        recent_water=recent_water,
-        recent_weights=recent_weights,
-        recent_messages=recent_messages,
+        context=context,
         user_message=question,
         language=lang,
     )
-    await ai_service.save_message(session, user, "assistant", reply_text)
+    await ai_service.save_exchange(session, user, question, asked_at, reply_text)
+    ai_service.schedule_compaction(user, context, question, reply_text)
     return reply_text
+
+
+async def stream_question(
+    session: AsyncSession,
+    ai_service: AiDietitianService,
+    user: User,
+    question: str,
+    lang: str,
+) -> AsyncIterator[str]:
+    """
+    Like ``handle_question`` but yields the growing reply; it is saved once complete.
+    If the stream breaks midway the error propagates and nothing is saved.
+    """
+
+    asked_at = datetime.now(timezone.utc)
+    context = await ai_service.load_context(session, user)
+    reply_text = ""
+    async with contextlib.aclosing(
+        ai_service.stream_reply(
+            user=user,
+            context=context,
+            user_message=question,
+            language=lang,
+        )
+    ) as replies:
+        async for reply_text in replies:
+            yield reply_text
+    if reply_text:
+        await ai_service.save_exchange(session, user, question, asked_at, reply_text)
+        ai_service.schedule_compaction(user, context, question, reply_text)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from datetime import datetime, timezone
+
+from sqlalchemy import desc, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import ConversationMessage, ConversationSummary
+from .llm_limiter import estimate_tokens
+
+
+def fit_dialog(summary: str | None, dialog: Sequence[str], budget_tokens: int) -> list[str]:
+    """
+    Newest-first turns that fit in ``budget_tokens`` next to the summary. A newest turn
+    that is too long on its own is cut down to whatever budget the summary leaves.
+    """
+
+    remaining = budget_tokens - (estimate_tokens(summary) if summary else 0)
+    fitted: list[str] = []
+    for turn in dialog:
+        cost = estimate_tokens(turn)
+        if cost > remaining:
+            if not fitted and remaining > 0:
+                fitted.append(turn[: remaining * 4])
+            break
+        fitted.append(turn)
+        remaining -= cost
+    return fitted
+
+
+async def load_unsummarized(
+    session: AsyncSession, user_id: int, limit: int
+) -> tuple[ConversationSummary | None, list[Row]]:
+    """The current summary and up to ``limit`` newer messages, oldest first."""
+
+    summary = await session.get(ConversationSummary, user_id)
+    stmt = (
+        select(ConversationMessage.role, ConversationMessage.content, ConversationMessage.created_at)
+        .where(ConversationMessage.user_id == user_id)
+        .order_by(desc(ConversationMessage.created_at))
+        .limit(limit)
+    )
+    if summary is not None:
+        stmt = stmt.where(ConversationMessage.created_at > summary.covered_until)
+    rows = (await session.execute(stmt)).all()
+    return summary, rows[::-1]
+
+
+async def save_summary(session: AsyncSession, user_id: int, summary: str, covered_until: datetime) -> None:
+    insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+    values = {
+        "user_id": user_id,
+        "summary": summary,
+        "covered_until": covered_until,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    stmt = insert(ConversationSummary).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ConversationSummary.user_id],
+        set_={key: stmt.excluded[key] for key in ("summary", "covered_until", "updated_at")},
+    )
+    await session.execute(stmt)
+    await session.commit()
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+_OFFSET_RE = re.compile(r"^(?:UTC|GMT)?\s*([+-])(\d{1,2})(?::?(\d{2}))?$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DayWindow:
+    """A user's current local day expressed as a half-open UTC range [start, end)."""
+
+    local_date: date
+    start: datetime
+    end: datetime
+
+
+# Windows are cached per time zone name until that zone's next local midnight, so the
+# day-scoped queries of every user in the zone share one computation per day.
+_windows: dict[str, DayWindow] = {}
+_zones: dict[str, tzinfo] = {}
+
+
+def normalize_timezone(value: str) -> str | None:
+    """Validate user input ("Europe/Warsaw", "UTC+3", "-05:30") and return the stored form."""
+
+    text = value.strip()
+    match = _OFFSET_RE.match(text)
+    if match:
+        sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3) or 0)
+        if hours > 14 or minutes >= 60:
+            return None
+        return f"UTC{sign}{hours:02d}:{minutes:02d}"
+    if text.upper() in ("UTC", "GMT", "Z"):
+        return "UTC"
+    try:
+        ZoneInfo(text)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return text
+
+
+def resolve_timezone(name: str | None) -> tzinfo:
+    if not name or name == "UTC":
+        return timezone.utc
+    zone = _zones.get(name)
+    if zone is not None:
+        return zone
+
+    match = _OFFSET_RE.match(name)
+    if match:
+        sign = -1 if match.group(1) == "-" else 1
+        offset = timedelta(hours=int(match.group(2)), minutes=int(match.group(3) or 0))
+        zone = timezone(sign * offset, name)
+    else:
+        try:
+            zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            zone = timezone.utc
+    _zones[name] = zone
+    return zone
+
+
+def current_day(tz_name: str | None = None, now: datetime | None = None) -> DayWindow:
+    """Return today's window for the time zone, recomputing only after local midnight."""
+
+    key = tz_name or "UTC"
+    now = now or datetime.now(timezone.utc)
+    cached = _windows.get(key)
+    if cached is not None and cached.start <= now < cached.end:
+        return cached
+
+    zone = resolve_timezone(tz_name)
+    local_date = now.astimezone(zone).date()
+    window = DayWindow(
+        local_date=local_date,
+        start=datetime.combine(local_date, time(), tzinfo=zone).astimezone(timezone.utc),
+        end=datetime.combine(local_date + timedelta(days=1), time(), tzinfo=zone).astimezone(timezone.utc),
+    )
+    _windows[key] = window
+    return window
+
+
+def local_date_of(moment: datetime, tz_name: str | None = None) -> date:
+    """Local calendar date of a stored timestamp (naive values are treated as UTC)."""
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(resolve_timezone(tz_name)).date()
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..cache import TTLCache
+from ..models import EstimateCacheEntry
+from ..settings import EstimateCacheSettings, settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+(?:[.,]\d+)*")
+_REFRESHED_COLUMNS = ("payload", "prompt_tokens", "completion_tokens", "last_used_at", "expires_at")
+
+
+def normalize_meal_text(text: str) -> str:
+    """Lowercase, drop punctuation and sort tokens: "Banana,  oatmeal" == "oatmeal banana"."""
+
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return " ".join(text.lower().split())
+    return " ".join(sorted(tokens))
+
+
+def cache_key(normalized_text: str, language: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x1f{language}\x1f{normalized_text}".encode()).hexdigest()
+
+
+def _aware(moment: datetime) -> datetime:
+    # SQLite hands DateTime(timezone=True) values back naive; they are stored as UTC.
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class CachedEstimate:
+    estimates: dict[str, Any]
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class EstimateCache:
+    """
+    Two-level cache for text meal estimates: an in-process LRU in front of the
+    ``estimate_cache`` table, so repeats are served from memory and survive restarts.
+    Only real model answers are stored; fallback stubs never reach the cache.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession] | None = None,
+        config: EstimateCacheSettings | None = None,
+    ) -> None:
+        self.session_maker = session_maker
+        self.config = config or settings.estimate_cache
+        self.memory: TTLCache[str, CachedEstimate] = TTLCache(
+            maxsize=self.config.memory_size, ttl=self.config.memory_ttl_seconds
+        )
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.prompt_tokens_saved = 0
+        self.completion_tokens_saved = 0
+        self._writes = 0
+
+    async def get(self, text: str, language: str, model: str) -> dict[str, Any] | None:
+        key = cache_key(normalize_meal_text(text), language, model)
+        entry = self.memory.get(key)
+        if entry is None and self.session_maker is not None:
+            try:
+                entry = await self._load(key)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Estimate cache lookup failed: %s", exc)
+                entry = None
+            if entry is not None:
+                self.db_hits += 1
+                self.memory.set(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.prompt_tokens_saved += entry.prompt_tokens
+        self.completion_tokens_saved += entry.completion_tokens
+        return dict(entry.estimates)
+
+    async def put(
+        self,
+        text: str,
+        language: str,
+        model: str,
+        estimates: dict[str, Any],
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        normalized = normalize_meal_text(text)
+        key = cache_key(normalized, language, model)
+        entry = CachedEstimate(dict(estimates), prompt_tokens, completion_tokens)
+        self.memory.set(key, entry)
+        if self.session_maker is None:
+            return
+
+        try:
+            async with self.session_maker() as session:
+                await self._store(session, key, normalized, language, model, entry)
+                self._writes += 1
+                if self._writes % self.config.evict_every_writes == 0:
+                    await self.evict(session)
+                await session.commit()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Estimate cache write failed: %s", exc)
+
+    async def _load(self, key: str) -> CachedEstimate | None:
+        now = datetime.now(timezone.utc)
+        async with self.session_maker() as session:
+            row = await session.get(EstimateCacheEntry, key)
+            if row is None or _aware(row.expires_at) <= now:
+                return None
+            entry = CachedEstimate(json.loads(row.payload), row.prompt_tokens, row.completion_tokens)
+            await session.execute(
+                update(EstimateCacheEntry)
+                .where(EstimateCacheEntry.key == key)
+                .values(last_used_at=now, hit_count=EstimateCacheEntry.hit_count + 1)
+            )
+            await session.commit()
+        return entry
+
+    async def _store(
+        self,
+        session: AsyncSession,
+        key: str,
+        normalized: str,
+        language: str,
+        model: str,
+        entry: CachedEstimate,
+    ) -> None:
+        now = datetime.now(timezone.utc)
+        values = {
+            "key": key,
+            "model": model,
+            "language": language,
+            "normalized_text": normalized,
+            "payload": json.dumps(entry.estimates, ensure_ascii=False),
+            "prompt_tokens": entry.prompt_tokens,
+            "completion_tokens": entry.completion_tokens,
+            "hit_count": 0,
+            "last_used_at": now,
+            "expires_at": now + timedelta(days=self.config.ttl_days),
+        }
+        insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(EstimateCacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EstimateCacheEntry.key],
+            set_={name: stmt.excluded[name] for name in _REFRESHED_COLUMNS},
+        )
+        await session.execute(stmt)
+
+    async def evict(self, session: AsyncSession) -> None:
+        """Drop expired rows, then the least recently used ones above ``max_rows``."""
+
+        now = datetime.now(timezone.utc)
+        await session.execute(delete(EstimateCacheEntry).where(EstimateCacheEntry.expires_at <= now))
+        cutoff = await session.scalar(
+            select(EstimateCacheEntry.last_used_at)
+            .order_by(EstimateCacheEntry.last_used_at.desc())
+            .offset(self.config.max_rows)
+            .limit(1)
+        )
+        if cutoff is not None:
+            await session.execute(delete(EstimateCacheEntry).where(EstimateCacheEntry.last_used_at <= cutoff))
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def cost_saved_usd(self) -> float:
+        return (
+            self.prompt_tokens_saved * self.config.input_usd_per_1m_tokens
+            + self.completion_tokens_saved * self.config.output_usd_per_1m_tokens
+        ) / 1_000_000
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+            "tokens_saved": self.prompt_tokens_saved + self.completion_tokens_saved,
+            "cost_saved_usd": round(self.cost_saved_usd, 6),
+            "memory": self.memory.stats(),
+        }
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, desc, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..models import ConversationArchive, ConversationMessage, User
+from ..settings import HistoryRetention, settings
+
+logger = logging.getLogger(__name__)
+
+
+def _pack(messages: list[dict]) -> bytes:
+    return zlib.compress(json.dumps(messages, ensure_ascii=False, separators=(",", ":")).encode(), 6)
+
+
+def _unpack(payload: bytes) -> list[dict]:
+    return json.loads(zlib.decompress(payload))
+
+
+def _iso(moment: datetime) -> str:
+    return (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).isoformat()
+
+
+async def archive_user_history(
+    session: AsyncSession, user_id: int, config: HistoryRetention | None = None, now: datetime | None = None
+) -> int:
+    """
+    Move one chunk of the user's old messages into a compressed archive row. Returns
+    how many were moved; 0 if fewer than ``min_chunk`` are due.
+    """
+
+    config = config or settings.history_retention
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=config.keep_days)
+    # created_at of the keep_messages-th newest message; anything older is over the count.
+    boundary = (
+        select(ConversationMessage.created_at)
+        .where(ConversationMessage.user_id == user_id)
+        .order_by(desc(ConversationMessage.created_at))
+        .offset(config.keep_messages - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            ConversationMessage.id,
+            ConversationMessage.role,
+            ConversationMessage.content,
+            ConversationMessage.created_at,
+        )
+        .where(
+            ConversationMessage.user_id == user_id,
+            or_(ConversationMessage.created_at < cutoff, ConversationMessage.created_at < boundary),
+        )
+        .order_by(ConversationMessage.created_at)
+        .limit(config.max_chunk)
+    )
+    rows = (await session.execute(stmt)).all()
+    if len(rows) < config.min_chunk:
+        await session.commit()
+        return 0
+
+    session.add(
+        ConversationArchive(
+            user_id=user_id,
+            first_at=rows[0].created_at,
+            last_at=rows[-1].created_at,
+            message_count=len(rows),
+            payload=_pack(
+                [{"role": row.role, "content": row.content, "created_at": _iso(row.created_at)} for row in rows]
+            ),
+        )
+    )
+    await session.execute(delete(ConversationMessage).where(ConversationMessage.id.in_([row.id for row in rows])))
+    await session.commit()
+    return len(rows)
+
+
+async def export_history(session: AsyncSession, user_id: int) -> list[dict]:
+    """All of the user's /ask messages, archived and hot, oldest first."""
+
+    archives = await session.scalars(
+        select(ConversationArchive.payload)
+        .where(ConversationArchive.user_id == user_id)
+        .order_by(ConversationArchive.first_at)
+    )
+    messages = [message for payload in archives for message in _unpack(payload)]
+    hot = await session.execute(
+        select(ConversationMessage.role, ConversationMessage.content, ConversationMessage.created_at)
+        .where(ConversationMessage.user_id == user_id)
+        .order_by(ConversationMessage.created_at)
+    )
+    messages.extend({"role": row.role, "content": row.content, "created_at": _iso(row.created_at)} for row in hot)
+    return messages
+
+
+async def run_retention_pass(
+    session_maker: async_sessionmaker[AsyncSession], config: HistoryRetention | None = None
+) -> int:
+    """One sweep over all users, walking the users table by primary key."""
+
+    config = config or settings.history_retention
+    moved = 0
+    last_id = 0
+    while True:
+        async with session_maker() as session:
+            user_ids = list(
+                await session.scalars(
+                    select(User.id).where(User.id > last_id).order_by(User.id).limit(config.users_per_batch)
+                )
+            )
+        if not user_ids:
+            return moved
+        for user_id in user_ids:
+            while True:
+                async with session_maker() as session:
+                    count = await archive_user_history(session, user_id, config)
+                moved += count
+                if not count:
+                    break
+        last_id = user_ids[-1]
+
+
+async def run_retention(session_maker: async_sessionmaker[AsyncSession], config: HistoryRetention | None = None) -> None:
+    """Background task: archive old history every ``interval_seconds`` until cancelled."""
+
+    config = config or settings.history_retention
+    while True:
+        try:
+            moved = await run_retention_pass(session_maker, config)
+            if moved:
+                logger.info("Archived %s conversation messages", moved)
+        except Exception:  # noqa: BLE001
+            logger.exception("Conversation retention pass failed")
+        await asyncio.sleep(config.interval_seconds)
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any
+
+from ..metrics import LatencyWindow
+from ..settings import LlmLimits, settings
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value is admitted first when calls are queued."""
+
+    INTERACTIVE = 0  # /ask replies, the user is waiting on the answer
+    ESTIMATE = 1  # meal text / photo estimates
+    BACKGROUND = 2  # recipe drafts and other work nobody is staring at
+
+
+class LlmBusyError(RuntimeError):
+    """Raised when a call waited longer than ``max_wait_seconds`` for admission."""
+
+
+def estimate_tokens(*texts: str, max_tokens: int = 0) -> int:
+    # ~4 characters per token is close enough for budgeting; the bucket is corrected
+    # with the real usage once the response arrives.
+    return sum(len(text) for text in texts) // 4 + max_tokens
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    user_id: int | None = field(compare=False)
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+@dataclass
+class Ticket:
+    """Handed out by ``LlmLimiter.slot``; report real usage to correct the TPM bucket."""
+
+    limiter: LlmLimiter
+    reserved_tokens: int
+
+    def record_usage(self, usage: Any) -> None:
+        total = getattr(usage, "total_tokens", None)
+        if total is None:
+            return
+        self.limiter._tokens.give_back(self.reserved_tokens - total)
+        self.reserved_tokens = total
+
+
+class LlmLimiter:
+    """
+    Admission control shared by every OpenAI call: at most ``max_concurrency`` calls
+    in flight, ``per_user_concurrency`` per user, and RPM/TPM token buckets. Waiting
+    calls are admitted by priority, then in arrival order.
+    """
+
+    def __init__(self, config: LlmLimits | None = None) -> None:
+        self.config = config or settings.llm
+        self._requests = _TokenBucket(self.config.requests_per_minute)
+        self._tokens = _TokenBucket(self.config.tokens_per_minute)
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._per_user: Counter[int] = Counter()
+        self._wakeup: asyncio.TimerHandle | None = None
+        self.waits = LatencyWindow()
+        self.admitted = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+
+    @asynccontextmanager
+    async def slot(
+        self, *, priority: Priority, user_id: int | None = None, tokens: int = 0
+    ) -> AsyncIterator[Ticket]:
+        await self._acquire(priority, user_id, tokens)
+        try:
+            yield Ticket(self, tokens)
+        finally:
+            self._release(user_id)
+
+    async def _acquire(self, priority: Priority, user_id: int | None, tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            priority=int(priority),
+            seq=next(self._seq),
+            user_id=user_id,
+            tokens=tokens,
+            future=loop.create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._queue, waiter)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.config.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted in the same tick the wait gave up: hand the slot back.
+                self._release(user_id)
+            else:
+                waiter.future.cancel()
+                self._dispatch()
+            if isinstance(exc, asyncio.TimeoutError):
+                self.timed_out += 1
+                logger.warning(
+                    "LLM call (%s) not admitted within %.1fs", priority.name.lower(), self.config.max_wait_seconds
+                )
+                raise LlmBusyError("LLM admission queue is full") from exc
+            raise
+
+    def _release(self, user_id: int | None) -> None:
+        self._in_flight -= 1
+        if user_id is not None:
+            self._per_user[user_id] -= 1
+            if self._per_user[user_id] <= 0:
+                del self._per_user[user_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        now = time.monotonic()
+        blocked_users: list[_Waiter] = []
+        while self._queue and self._in_flight < self.config.max_concurrency:
+            waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if waiter.user_id is not None and self._per_user[waiter.user_id] >= self.config.per_user_concurrency:
+                # Only this user is saturated; let the next caller in line go ahead.
+                blocked_users.append(heapq.heappop(self._queue))
+                continue
+            delay = max(self._requests.wait_time(1, now), self._tokens.wait_time(waiter.tokens, now))
+            if delay > 0:
+                # Rate limited: nobody behind the head may overtake it, just wait for refill.
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                break
+
+            heapq.heappop(self._queue)
+            self._requests.take(1)
+            self._tokens.take(waiter.tokens)
+            self._in_flight += 1
+            if waiter.user_id is not None:
+                self._per_user[waiter.user_id] += 1
+            self.admitted += 1
+            self.waits.add(now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+        for waiter in blocked_users:
+            heapq.heappush(self._queue, waiter)
+
+    def stats(self) -> dict[str, Any]:
+        depth_by_priority = Counter(
+            Priority(waiter.priority).name.lower() for waiter in self._queue if not waiter.future.done()
+        )
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": sum(depth_by_priority.values()),
+            "queue_depth_by_priority": dict(depth_by_priority),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "timed_out": self.timed_out,
+            **self.waits.stats("wait_"),
+        }
+
+
+# Один лимитер на процесс: все сервисы делят одни и те же лимиты провайдера.
+llm_limiter = LlmLimiter()
@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Meal
 from ..services.ai_nutrition import AiNutritionService
+from .day_boundaries import current_day
+from .summary_service import record_meal
 
 
 async def log_text_meal(
@@ -13,9 +15,10 @@ async def log_text_meal(
     raw_text: str,
     lang: str,
     ai_service: AiNutritionService | None,
+    tz: str | None = None,
 ) -> tuple[Meal, dict]:
     estimates = (
-        await ai_service.estimate_meal_from_text(raw_text, language=lang)
+        await ai_service.estimate_meal_from_text(raw_text, language=lang, user_id=user_id)
         if ai_service
         else {}
     )
@@ -33,6 +36,7 @@ async def log_text_meal(
         ai_notes=estimates.get("ai_notes"),
     )
     session.add(meal)
+    await record_meal(session, user_id, estimates, current_day(tz).local_date)
     await session.commit()
     await session.refresh(meal)
     return meal, estimates
@@ -46,14 +50,19 @@ async def log_photo_meal(
     caption: str | None,
     photo_file_id: str,
     ai_service: AiNutritionService | None,
-    photo_bytes: bytes | None,
+    photo_bytes: bytes | memoryview | None,
     photo_metadata: dict | None = None,
+    tz: str | None = None,
+    estimates: dict | None = None,
 ) -> tuple[Meal, dict]:
-    estimates = (
-        await ai_service.estimate_meal_from_photo(photo_bytes=photo_bytes, photo_metadata=photo_metadata)
-        if ai_service
-        else {}
-    )
+    if estimates is None:
+        estimates = (
+            await ai_service.estimate_meal_from_photo(
+                photo_bytes=photo_bytes, photo_metadata=photo_metadata, user_id=user_id
+            )
+            if ai_service
+            else {}
+        )
     meal = Meal(
         user_id=user_id,
         meal_type=meal_type,
@@ -70,6 +79,7 @@ async def log_photo_meal(
         ai_notes=estimates.get("ai_notes"),
     )
     session.add(meal)
+    await record_meal(session, user_id, estimates, current_day(tz).local_date)
     await session.commit()
     await session.refresh(meal)
     return meal, estimates
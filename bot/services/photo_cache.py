@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..cache import TTLCache
+from ..models import PhotoEstimateCacheEntry
+from ..settings import PhotoCacheSettings, settings
+from .estimate_cache import CachedEstimate
+from .photo_pipeline import BufferReader
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow не установлен, остаётся только точное совпадение
+    Image = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_HASH_BITS = 64
+_REFRESHED_COLUMNS = (
+    "user_id",
+    "dhash",
+    "model",
+    "payload",
+    "prompt_tokens",
+    "completion_tokens",
+    "last_used_at",
+    "expires_at",
+)
+
+
+def dhash(photo_bytes: bytes | memoryview) -> int | None:
+    """64-bit difference hash: compares neighbouring pixels of a 9x8 grayscale thumbnail."""
+
+    if Image is None:
+        return None
+    try:
+        with Image.open(BufferReader(photo_bytes)) as image:
+            pixels = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Could not hash photo: %s", exc)
+        return None
+
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << _HASH_BITS) if value >= 1 << (_HASH_BITS - 1) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << _HASH_BITS) if value < 0 else value
+
+
+class PhotoEstimateCache:
+    """
+    Photo estimate cache with two lookups: Telegram's ``file_unique_id`` (checked
+    before the photo is downloaded) and a dHash compared by Hamming distance, which
+    catches re-uploads and near-identical shots of the same plate. The hash lookup only
+    compares against the same user's recent photos, so another user's estimate and
+    notes are never served for a merely similar picture.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession] | None = None,
+        config: PhotoCacheSettings | None = None,
+    ) -> None:
+        self.session_maker = session_maker
+        self.config = config or settings.photo_cache
+        self.memory: TTLCache[str, CachedEstimate] = TTLCache(
+            maxsize=self.config.memory_size, ttl=self.config.memory_ttl_seconds
+        )
+        # user_id -> {dhash: file_unique_id}; most recently used users and hashes last.
+        self._hashes: OrderedDict[int, OrderedDict[int, str]] = OrderedDict()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    async def get_by_file(self, file_unique_id: str) -> dict[str, Any] | None:
+        entry = await self._entry(file_unique_id)
+        if entry is None:
+            return None
+        self.exact_hits += 1
+        return dict(entry.estimates)
+
+    async def get_similar(self, user_id: int | None, photo_hash: int | None) -> dict[str, Any] | None:
+        if photo_hash is None or user_id is None:
+            self.misses += 1
+            return None
+        hashes = await self._user_hashes(user_id)
+
+        best_id, best_distance = None, self.config.max_hamming_distance + 1
+        for known_hash, file_unique_id in hashes.items():
+            distance = (known_hash ^ photo_hash).bit_count()
+            if distance < best_distance:
+                best_id, best_distance = file_unique_id, distance
+                if not distance:
+                    break
+
+        entry = await self._entry(best_id) if best_id else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.similar_hits += 1
+        return dict(entry.estimates)
+
+    async def hash_photo(self, photo_bytes: bytes | memoryview) -> int | None:
+        # Decoding and resizing a full-size JPEG takes milliseconds; keep it off the event loop.
+        return await asyncio.to_thread(dhash, photo_bytes)
+
+    async def put(
+        self,
+        file_unique_id: str,
+        user_id: int | None,
+        photo_hash: int | None,
+        model: str,
+        estimates: dict[str, Any],
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ) -> None:
+        entry = CachedEstimate(dict(estimates), prompt_tokens, completion_tokens)
+        self.memory.set(file_unique_id, entry)
+        if photo_hash is not None and user_id is not None:
+            self._remember_hash(user_id, photo_hash, file_unique_id)
+        if self.session_maker is None:
+            return
+
+        now = datetime.now(timezone.utc)
+        values = {
+            "file_unique_id": file_unique_id,
+            "user_id": user_id,
+            "dhash": _to_signed(photo_hash) if photo_hash is not None else None,
+            "model": model,
+            "payload": json.dumps(entry.estimates, ensure_ascii=False),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "hit_count": 0,
+            "last_used_at": now,
+            "expires_at": now + timedelta(days=self.config.ttl_days),
+        }
+        try:
+            async with self.session_maker() as session:
+                insert = pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+                stmt = insert(PhotoEstimateCacheEntry).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[PhotoEstimateCacheEntry.file_unique_id],
+                    set_={name: stmt.excluded[name] for name in _REFRESHED_COLUMNS},
+                )
+                await session.execute(stmt)
+                self._writes += 1
+                if self._writes % self.config.evict_every_writes == 0:
+                    await self.evict(session)
+                await session.commit()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Photo cache write failed: %s", exc)
+
+    async def evict(self, session: AsyncSession) -> None:
+        """Drop expired rows, then the least recently used ones above ``max_rows``."""
+
+        now = datetime.now(timezone.utc)
+        await session.execute(
+            delete(PhotoEstimateCacheEntry).where(PhotoEstimateCacheEntry.expires_at <= now)
+        )
+        cutoff = await session.scalar(
+            select(PhotoEstimateCacheEntry.last_used_at)
+            .order_by(PhotoEstimateCacheEntry.last_used_at.desc())
+            .offset(self.config.max_rows)
+            .limit(1)
+        )
+        if cutoff is not None:
+            await session.execute(
+                delete(PhotoEstimateCacheEntry).where(PhotoEstimateCacheEntry.last_used_at <= cutoff)
+            )
+
+    async def _entry(self, file_unique_id: str) -> CachedEstimate | None:
+        entry = self.memory.get(file_unique_id)
+        if entry is not None or self.session_maker is None:
+            return entry
+        try:
+            entry = await self._load(file_unique_id)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Photo cache lookup failed: %s", exc)
+            return None
+        if entry is not None:
+            self.memory.set(file_unique_id, entry)
+        return entry
+
+    async def _load(self, file_unique_id: str) -> CachedEstimate | None:
+        now = datetime.now(timezone.utc)
+        async with self.session_maker() as session:
+            row = await session.get(PhotoEstimateCacheEntry, file_unique_id)
+            if row is None:
+                return None
+            # SQLite returns DateTime(timezone=True) values naive; they are stored as UTC.
+            expires_at = row.expires_at
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= now:
+                return None
+            entry = CachedEstimate(json.loads(row.payload), row.prompt_tokens, row.completion_tokens)
+            await session.execute(
+                update(PhotoEstimateCacheEntry)
+                .where(PhotoEstimateCacheEntry.file_unique_id == file_unique_id)
+                .values(last_used_at=now, hit_count=PhotoEstimateCacheEntry.hit_count + 1)
+            )
+            await session.commit()
+        return entry
+
+    async def _user_hashes(self, user_id: int) -> OrderedDict[int, str]:
+        hashes = self._hashes.get(user_id)
+        if hashes is not None:
+            self._hashes.move_to_end(user_id)
+            return hashes
+        hashes = OrderedDict()
+        if self.session_maker is not None:
+            try:
+                async with self.session_maker() as session:
+                    rows = await session.execute(
+                        select(PhotoEstimateCacheEntry.dhash, PhotoEstimateCacheEntry.file_unique_id)
+                        .where(PhotoEstimateCacheEntry.user_id == user_id)
+                        .order_by(PhotoEstimateCacheEntry.last_used_at.desc())
+                        .limit(self.config.hash_index_per_user)
+                    )
+                    recent = [(value, file_unique_id) for value, file_unique_id in rows if value is not None]
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Photo hash index load failed: %s", exc)
+                return hashes
+            for value, file_unique_id in reversed(recent):
+                hashes[_to_unsigned(value)] = file_unique_id
+        # A put() may have started this user's index while the query was in flight.
+        hashes.update(self._hashes.get(user_id, {}))
+        self._hashes[user_id] = hashes
+        while len(self._hashes) > self.config.hash_index_users:
+            self._hashes.popitem(last=False)
+        return hashes
+
+    def forget_user(self, user_id: int) -> None:
+        """Drop a user's hash index, e.g. after their data was deleted."""
+
+        self._hashes.pop(user_id, None)
+
+    def _remember_hash(self, user_id: int, photo_hash: int, file_unique_id: str) -> None:
+        hashes = self._hashes.get(user_id)
+        if hashes is None:
+            if self.session_maker is not None:
+                # Not loaded yet: the first lookup reads it from the table, this row included.
+                return
+            hashes = self._hashes[user_id] = OrderedDict()
+        hashes[photo_hash] = file_unique_id
+        hashes.move_to_end(photo_hash)
+        while len(hashes) > self.config.hash_index_per_user:
+            hashes.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.exact_hits + self.similar_hits) / lookups, 4) if lookups else 0.0,
+            "hash_users": len(self._hashes),
+            "hashes": sum(len(hashes) for hashes in self._hashes.values()),
+            "memory": self.memory.stats(),
+        }
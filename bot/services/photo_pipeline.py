@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import binascii
+import io
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.types import PhotoSize
+
+from ..settings import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - без Pillow фото только проверяется, но не пережимается
+    Image = ImageOps = None  # type: ignore
+
+
+class PhotoRejected(ValueError):
+    """The photo breaks the configured limits; ``message_key`` is the i18n key for the user."""
+
+    def __init__(self, message_key: str) -> None:
+        super().__init__(message_key)
+        self.message_key = message_key
+
+
+# Multiple of 3 so every chunk encodes to whole base64 quads without padding.
+_B64_CHUNK = 3 * 16 * 1024
+
+
+@dataclass(frozen=True)
+class PreparedPhoto:
+    data: bytes | memoryview
+    mime_type: str
+    width: int | None = None
+    height: int | None = None
+
+
+class DownloadBuffer(io.RawIOBase):
+    """
+    Write target for ``Bot.download``: chunks land in one bytearray sized from the
+    reported file size, and the result is exposed as a memoryview instead of a copy.
+    """
+
+    def __init__(self, expected_size: int, max_size: int) -> None:
+        super().__init__()
+        self._buffer = bytearray(expected_size)
+        self._size = 0
+        self._max_size = max_size
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, chunk) -> int:
+        end = self._size + len(chunk)
+        if end > self._max_size:
+            raise PhotoRejected("error_photo_too_large")
+        # Slice assignment copies in place and only grows if file_size was understated.
+        self._buffer[self._size : end] = chunk
+        self._size = end
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return 0 if whence == io.SEEK_SET and offset == 0 else self._size
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self._buffer)[: self._size]
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file over a memoryview, so Pillow can decode without a copy."""
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        super().__init__()
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        chunk = self._view[self._pos : self._pos + len(target)]
+        target[: len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+async def download_photo(bot: Bot, photo: PhotoSize) -> memoryview:
+    """Download a photo into a preallocated buffer, refusing oversized files up front."""
+
+    max_size = settings.limits.max_photo_size_bytes
+    if photo.file_size and photo.file_size > max_size:
+        raise PhotoRejected("error_photo_too_large")
+    file = await bot.get_file(photo.file_id)
+    if file.file_size and file.file_size > max_size:
+        raise PhotoRejected("error_photo_too_large")
+
+    buffer = DownloadBuffer(file.file_size or photo.file_size or 0, max_size)
+    await bot.download(file, destination=buffer)
+    return buffer.getbuffer()
+
+
+def encode_data_url(data: bytes | memoryview, mime_type: str) -> str:
+    """
+    ``data:<mime>;base64,...`` built chunk by chunk into one preallocated bytearray,
+    so the only full-size copy is the final str the API client needs.
+    """
+
+    view = memoryview(data)
+    prefix = f"data:{mime_type};base64,".encode("ascii")
+    out = bytearray(len(prefix) + 4 * ((len(view) + 2) // 3))
+    out[: len(prefix)] = prefix
+    pos = len(prefix)
+    for start in range(0, len(view), _B64_CHUNK):
+        encoded = binascii.b2a_base64(view[start : start + _B64_CHUNK], newline=False)
+        out[pos : pos + len(encoded)] = encoded
+        pos += len(encoded)
+    return out.decode("ascii")
+
+
+def pick_photo_size(sizes: Sequence[PhotoSize], min_edge_px: int | None = None) -> PhotoSize:
+    """Smallest size whose longer edge reaches ``min_edge_px``; the largest one otherwise."""
+
+    min_edge = min_edge_px or settings.photo.min_edge_px
+    ordered = sorted(sizes, key=lambda size: size.width * size.height)
+    for size in ordered:
+        if max(size.width, size.height) >= min_edge:
+            return size
+    return ordered[-1]
+
+
+def sniff_mime_type(data: bytes | memoryview) -> str | None:
+    head = bytes(data[:12])
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def prepare_photo(data: bytes | memoryview) -> PreparedPhoto:
+    """
+    Validate the upload against ``settings.limits`` and re-encode it as a JPEG no larger
+    than ``max_edge_px`` on its longer side. Re-encoding drops EXIF (GPS, camera data).
+    CPU-bound: call through ``prepare_photo_async`` from handlers.
+    """
+
+    limits = settings.limits
+    if len(data) > limits.max_photo_size_bytes:
+        raise PhotoRejected("error_photo_too_large")
+    mime_type = sniff_mime_type(data)
+    if mime_type not in limits.allowed_photo_mime:
+        raise PhotoRejected("error_photo_unsupported")
+    if Image is None:
+        return PreparedPhoto(data=data, mime_type=mime_type)
+
+    config = settings.photo
+    try:
+        with Image.open(BufferReader(data)) as image:
+            # JPEGs are decoded straight at 1/2..1/8 scale when that still covers the
+            # target edge, which avoids materialising the full-resolution bitmap.
+            image.draft("RGB", (config.max_edge_px, config.max_edge_px))
+            # Apply the EXIF orientation before the metadata is dropped.
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            image.thumbnail((config.max_edge_px, config.max_edge_px), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=config.jpeg_quality, optimize=True)
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise PhotoRejected("error_photo_unsupported") from exc
+    return PreparedPhoto(
+        data=output.getbuffer(), mime_type="image/jpeg", width=image.width, height=image.height
+    )
+
+
+async def prepare_photo_async(data: bytes | memoryview) -> PreparedPhoto:
+    # Pillow releases the GIL while decoding and resizing, so a worker thread is enough
+    # to keep the event loop responsive.
+    return await asyncio.to_thread(prepare_photo, data)
@@ -1,76 +1,183 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
 
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.sql import desc
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Meal, WaterIntake, WeightLog
+from ..cache import TTLCache
+from ..models import DailySummary, Meal, WaterIntake, WeightLog
+from .day_boundaries import current_day
+from .summary_service import clear_day, data_version, delete_summaries, get_summary
 
+RANGE_PRESETS = {"week": 7, "month": 30}
+MAX_RANGE_DAYS = 92
 
-def today_range_utc() -> tuple[datetime, datetime]:
-    now = datetime.now(timezone.utc)
-    start = datetime(year=now.year, month=now.month, day=now.day, tzinfo=timezone.utc)
-    end = start + timedelta(days=1)
-    return start, end
 
+@dataclass
+class DailyStats:
+    calories: float = 0.0
+    protein_g: float = 0.0
+    fat_g: float = 0.0
+    carbs_g: float = 0.0
+    fiber_g: float = 0.0
+    sugar_g: float = 0.0
+    water_ml: float = 0.0
+    meal_count: int = 0
+    last_weight_kg: float | None = None
+    last_weight_at: datetime | None = None
+    day: date | None = None
 
-async def fetch_daily_stats(session: AsyncSession, user_id: int) -> tuple[tuple, float | None, WeightLog | None]:
-    start, end = today_range_utc()
 
-    totals_stmt = (
-        select(
-            func.sum(Meal.calories),
-            func.sum(Meal.protein_g),
-            func.sum(Meal.fat_g),
-            func.sum(Meal.carbs_g),
-            func.sum(Meal.fiber_g),
-            func.sum(Meal.sugar_g),
+@dataclass
+class RangeStats:
+    start: date
+    end: date
+    days: list[DailyStats] = field(default_factory=list)
+
+    @property
+    def total_days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    @property
+    def logged(self) -> list[DailyStats]:
+        return [stats for stats in self.days if stats.meal_count]
+
+    def average(self, name: str) -> float:
+        logged = self.logged
+        if not logged:
+            return 0.0
+        return sum(getattr(stats, name) for stats in logged) / len(logged)
+
+    @property
+    def average_water_ml(self) -> float:
+        watered = [stats.water_ml for stats in self.days if stats.water_ml]
+        return sum(watered) / len(watered) if watered else 0.0
+
+    @property
+    def calories_by_day(self) -> list[float | None]:
+        by_day = {stats.day: stats.calories for stats in self.logged}
+        return [by_day.get(self.start + timedelta(days=offset)) for offset in range(self.total_days)]
+
+    @property
+    def calories_slope(self) -> float | None:
+        """Least-squares slope of daily calories (kcal/day) over logged days."""
+
+        points = [((stats.day - self.start).days, stats.calories) for stats in self.logged]
+        if len(points) < 2:
+            return None
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        if not var_x:
+            return None
+        return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+    @property
+    def weights(self) -> list[float]:
+        return [stats.last_weight_kg for stats in self.days if stats.last_weight_kg is not None]
+
+
+# Finished ranges keyed by (user_id, start, end, data_version); a new log bumps the
+# version, so stale entries are simply never looked up again and age out.
+range_cache: TTLCache[tuple[int, date, date, int], RangeStats] = TTLCache(maxsize=5_000, ttl=600)
+
+
+async def fetch_daily_stats(session: AsyncSession, user_id: int, tz: str | None = None) -> DailyStats:
+    # Today's totals are a single primary-key lookup on the daily rollup.
+    summary = await get_summary(session, user_id, current_day(tz).local_date)
+    stats = DailyStats()
+    if summary:
+        stats = DailyStats(
+            calories=summary.calories,
+            protein_g=summary.protein_g,
+            fat_g=summary.fat_g,
+            carbs_g=summary.carbs_g,
+            fiber_g=summary.fiber_g,
+            sugar_g=summary.sugar_g,
+            water_ml=summary.water_ml,
+            meal_count=summary.meal_count,
+            last_weight_kg=summary.last_weight_kg,
+            last_weight_at=summary.last_weight_at,
         )
-        .where(
-            Meal.user_id == user_id,
-            Meal.created_at >= start,
-            Meal.created_at < end,
+
+    if stats.last_weight_kg is None:
+        # No weigh-in today: fall back to the latest one (index-only, LIMIT 1).
+        last_weight = await session.scalar(
+            select(WeightLog)
+            .where(WeightLog.user_id == user_id)
+            .order_by(desc(WeightLog.datetime))
+            .limit(1)
         )
-    )
-    totals = (await session.execute(totals_stmt)).one_or_none()
+        if last_weight:
+            stats.last_weight_kg = last_weight.weight_kg
+            stats.last_weight_at = last_weight.datetime
+    return stats
+
+
+def preset_range(name: str, tz: str | None = None) -> tuple[date, date]:
+    end = current_day(tz).local_date
+    return end - timedelta(days=RANGE_PRESETS[name] - 1), end
+
 
-    water_stmt = (
-        select(func.sum(WaterIntake.volume_ml))
+async def fetch_range_stats(session: AsyncSession, user_id: int, start: date, end: date) -> RangeStats:
+    """Per-day rollups for [start, end] in one indexed range query, cached per data version."""
+
+    key = (user_id, start, end, data_version(user_id))
+    cached = range_cache.get(key)
+    if cached is not None:
+        return cached
+
+    rows = await session.scalars(
+        select(DailySummary)
         .where(
-            WaterIntake.user_id == user_id,
-            WaterIntake.datetime >= start,
-            WaterIntake.datetime < end,
+            DailySummary.user_id == user_id,
+            DailySummary.local_date >= start,
+            DailySummary.local_date <= end,
         )
-        .limit(1)
+        .order_by(DailySummary.local_date)
     )
-    water_total = await session.scalar(water_stmt)
-
-    last_weight = await session.scalar(
-        select(WeightLog)
-        .where(WeightLog.user_id == user_id)
-        .order_by(desc(WeightLog.datetime))
-    )
-    return totals, water_total, last_weight
+    result = RangeStats(start=start, end=end)
+    for row in rows:
+        result.days.append(
+            DailyStats(
+                calories=row.calories,
+                protein_g=row.protein_g,
+                fat_g=row.fat_g,
+                carbs_g=row.carbs_g,
+                fiber_g=row.fiber_g,
+                sugar_g=row.sugar_g,
+                water_ml=row.water_ml,
+                meal_count=row.meal_count,
+                last_weight_kg=row.last_weight_kg,
+                last_weight_at=row.last_weight_at,
+                day=row.local_date,
+            )
+        )
+    range_cache.set(key, result)
+    return result
 
 
-async def reset_today(session: AsyncSession, user_id: int) -> None:
-    start, end = today_range_utc()
+async def reset_today(session: AsyncSession, user_id: int, tz: str | None = None) -> None:
+    today = current_day(tz)
     await session.execute(
         Meal.__table__.delete().where(
             Meal.user_id == user_id,
-            Meal.created_at >= start,
-            Meal.created_at < end,
+            Meal.created_at >= today.start,
+            Meal.created_at < today.end,
         )
     )
     await session.execute(
         WaterIntake.__table__.delete().where(
             WaterIntake.user_id == user_id,
-            WaterIntake.datetime >= start,
-            WaterIntake.datetime < end,
+            WaterIntake.datetime >= today.start,
+            WaterIntake.datetime < today.end,
         )
     )
+    await clear_day(session, user_id, today.local_date)
     await session.commit()
 
 
@@ -78,4 +185,5 @@ async def reset_all(session: AsyncSession, user_id: int) -> None:
     await session.execute(Meal.__table__.delete().where(Meal.user_id == user_id))
     await session.execute(WaterIntake.__table__.delete().where(WaterIntake.user_id == user_id))
     await session.execute(WeightLog.__table__.delete().where(WeightLog.user_id == user_id))
+    await delete_summaries(session, user_id)
     await session.commit()
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..models import DailySummary, Meal, User, WaterIntake, WeightLog
+from .day_boundaries import current_day, local_date_of
+
+MACRO_FIELDS = ("calories", "protein_g", "fat_g", "carbs_g", "fiber_g", "sugar_g")
+ADDITIVE_FIELDS = (*MACRO_FIELDS, "water_ml", "meal_count")
+COMPARED_FIELDS = (*ADDITIVE_FIELDS, "last_weight_kg")
+
+_DIRTY_KEY = "summary_dirty_users"
+# Per-user counter bumped after every commit that changed a user's rollup rows. Readers
+# use it as part of cache keys, so cached ranges go stale as soon as new data lands.
+_data_versions: dict[int, int] = {}
+
+
+def data_version(user_id: int) -> int:
+    return _data_versions.get(user_id, 0)
+
+
+def _mark_dirty(session: AsyncSession, user_id: int) -> None:
+    session.info.setdefault(_DIRTY_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_data_versions(session: Session) -> None:
+    for user_id in session.info.pop(_DIRTY_KEY, ()):
+        _data_versions[user_id] = _data_versions.get(user_id, 0) + 1
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_dirty_users(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+
+
+def _insert(session: AsyncSession):
+    return pg_insert if session.bind.dialect.name == "postgresql" else sqlite_insert
+
+
+def _zero_row(user_id: int, day: date) -> dict[str, Any]:
+    return {"user_id": user_id, "local_date": day, **{name: 0 for name in ADDITIVE_FIELDS}}
+
+
+async def _add(session: AsyncSession, user_id: int, day: date, **deltas: float) -> DailySummary | None:
+    values = _zero_row(user_id, day)
+    values.update(deltas)
+    stmt = _insert(session)(DailySummary).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySummary.user_id, DailySummary.local_date],
+        set_={name: getattr(DailySummary, name) + stmt.excluded[name] for name in deltas},
+    ).returning(DailySummary.water_ml)
+    _mark_dirty(session, user_id)
+    return await session.scalar(stmt)
+
+
+async def record_meal(session: AsyncSession, user_id: int, estimates: dict, day: date | None = None) -> None:
+    """Add one meal's estimates to the day's rollup inside the caller's transaction."""
+
+    deltas = {name: float(estimates.get(name) or 0) for name in MACRO_FIELDS}
+    await _add(session, user_id, day or current_day().local_date, meal_count=1, **deltas)
+
+
+async def record_water(session: AsyncSession, user_id: int, volume_ml: float, day: date | None = None) -> float:
+    """Add water to the day's rollup and return the new daily total."""
+
+    total = await _add(session, user_id, day or current_day().local_date, water_ml=float(volume_ml))
+    return float(total or 0)
+
+
+async def record_weight(
+    session: AsyncSession,
+    user_id: int,
+    weight_kg: float,
+    logged_at: datetime | None = None,
+    day: date | None = None,
+) -> None:
+    values = _zero_row(user_id, day or current_day().local_date)
+    values.update(last_weight_kg=weight_kg, last_weight_at=logged_at or datetime.now(timezone.utc))
+    stmt = _insert(session)(DailySummary).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailySummary.user_id, DailySummary.local_date],
+        set_={
+            "last_weight_kg": stmt.excluded.last_weight_kg,
+            "last_weight_at": stmt.excluded.last_weight_at,
+        },
+    )
+    _mark_dirty(session, user_id)
+    await session.execute(stmt)
+
+
+async def get_summary(session: AsyncSession, user_id: int, day: date | None = None) -> DailySummary | None:
+    return await session.get(DailySummary, (user_id, day or current_day().local_date))
+
+
+async def clear_day(session: AsyncSession, user_id: int, day: date | None = None) -> None:
+    """Zero meal and water totals for a day; the last weight of that day is kept."""
+
+    _mark_dirty(session, user_id)
+    await session.execute(
+        update(DailySummary)
+        .where(DailySummary.user_id == user_id, DailySummary.local_date == (day or current_day().local_date))
+        .values(**{name: 0 for name in ADDITIVE_FIELDS})
+    )
+
+
+async def delete_summaries(session: AsyncSession, user_id: int) -> None:
+    _mark_dirty(session, user_id)
+    await session.execute(delete(DailySummary).where(DailySummary.user_id == user_id))
+
+
+async def compute_summaries(
+    session: AsyncSession, user_id: int | None = None
+) -> dict[tuple[int, date], dict[str, Any]]:
+    """Recompute every rollup row from the raw Meal/WaterIntake/WeightLog tables."""
+
+    rows: dict[tuple[int, date], dict[str, Any]] = defaultdict(dict)
+    zone_stmt = select(User.id, User.timezone)
+    if user_id is not None:
+        zone_stmt = zone_stmt.where(User.id == user_id)
+    zones = dict((await session.execute(zone_stmt)).all())
+
+    def row_for(uid: int, day: date) -> dict[str, Any]:
+        row = rows[(uid, day)]
+        if not row:
+            row.update(_zero_row(uid, day), last_weight_kg=None, last_weight_at=None)
+        return row
+
+    meal_stmt = select(Meal.user_id, Meal.created_at, *(getattr(Meal, name) for name in MACRO_FIELDS))
+    water_stmt = select(WaterIntake.user_id, WaterIntake.datetime, WaterIntake.volume_ml)
+    weight_stmt = select(WeightLog.user_id, WeightLog.datetime, WeightLog.weight_kg).order_by(
+        WeightLog.user_id, WeightLog.datetime
+    )
+    if user_id is not None:
+        meal_stmt = meal_stmt.where(Meal.user_id == user_id)
+        water_stmt = water_stmt.where(WaterIntake.user_id == user_id)
+        weight_stmt = weight_stmt.where(WeightLog.user_id == user_id)
+
+    for uid, created_at, *macros in await session.execute(meal_stmt):
+        row = row_for(uid, local_date_of(created_at, zones.get(uid)))
+        row["meal_count"] += 1
+        for name, value in zip(MACRO_FIELDS, macros):
+            row[name] += float(value or 0)
+
+    for uid, logged_at, volume_ml in await session.execute(water_stmt):
+        row_for(uid, local_date_of(logged_at, zones.get(uid)))["water_ml"] += float(volume_ml or 0)
+
+    for uid, logged_at, weight_kg in await session.execute(weight_stmt):
+        row = row_for(uid, local_date_of(logged_at, zones.get(uid)))
+        row["last_weight_kg"] = weight_kg
+        row["last_weight_at"] = logged_at
+
+    return dict(rows)
+
+
+async def find_mismatches(session: AsyncSession, user_id: int | None = None) -> list[str]:
+    expected = await compute_summaries(session, user_id)
+    stmt = select(DailySummary)
+    if user_id is not None:
+        stmt = stmt.where(DailySummary.user_id == user_id)
+    stored = {(row.user_id, row.local_date): row for row in await session.scalars(stmt)}
+
+    problems = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(key), stored.get(key)
+        for name in COMPARED_FIELDS:
+            want_value = want.get(name) if want else (0 if name in ADDITIVE_FIELDS else None)
+            have_value = getattr(have, name) if have else (0 if name in ADDITIVE_FIELDS else None)
+            if want_value is None or have_value is None:
+                equal = want_value == have_value
+            else:
+                equal = abs(float(want_value) - float(have_value)) < 1e-6
+            if not equal:
+                problems.append(f"user={key[0]} date={key[1]} {name}: stored={have_value} expected={want_value}")
+    return problems
+
+
+async def rebuild_summaries(session: AsyncSession, user_id: int | None = None) -> int:
+    """Replace stored rollups with values recomputed from raw logs. Returns row count."""
+
+    expected = await compute_summaries(session, user_id)
+    stmt = delete(DailySummary)
+    if user_id is not None:
+        stmt = stmt.where(DailySummary.user_id == user_id)
+    await session.execute(stmt)
+    session.add_all(DailySummary(**values) for values in expected.values())
+    for user_key in {uid for uid, _ in expected} | set(_data_versions):
+        _mark_dirty(session, user_key)
+    await session.commit()
+    return len(expected)
@@ -1,15 +1,77 @@
 from __future__ import annotations
 
-from sqlalchemy import delete
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import ConversationMessage, Meal, Recipe, User, WaterIntake, WeightLog
+from ..cache import TTLCache
+from ..models import (
+    ConversationArchive,
+    ConversationMessage,
+    ConversationSummary,
+    Meal,
+    PhotoEstimateCacheEntry,
+    Recipe,
+    User,
+    WaterIntake,
+    WeightLog,
+)
+from ..settings import settings
+from .summary_service import delete_summaries
+
+# Detached User snapshots keyed by telegram_id. Every code path that writes a user
+# must call invalidate_user()/cache_user() so the middleware never serves stale data.
+user_cache: TTLCache[int, User] = TTLCache(
+    maxsize=settings.cache.user_cache_size,
+    ttl=settings.cache.user_cache_ttl_seconds,
+)
+# Short-lived set of telegram_ids known to have no User row (drive-by senders who never
+# finished /start), so repeated messages from them skip the DB entirely.
+unknown_user_cache: TTLCache[int, bool] = TTLCache(
+    maxsize=settings.cache.unknown_user_cache_size,
+    ttl=settings.cache.unknown_user_ttl_seconds,
+)
+
+
+def cache_user(user: User) -> None:
+    # Both updates happen without yielding to the event loop, so no lookup can observe
+    # the user as registered and unknown at the same time.
+    unknown_user_cache.invalidate(user.telegram_id)
+    user_cache.set(user.telegram_id, user)
+
+
+def invalidate_user(telegram_id: int | None) -> None:
+    if telegram_id is not None:
+        user_cache.invalidate(telegram_id)
+
+
+async def get_cached_user(session_maker, telegram_id: int) -> User | None:
+    user = user_cache.get(telegram_id)
+    if user is not None:
+        return user
+    if unknown_user_cache.get(telegram_id):
+        return None
+
+    async with session_maker() as session:
+        user = await session.scalar(select(User).where(User.telegram_id == telegram_id))
+    if user:
+        cache_user(user)
+    elif telegram_id not in user_cache:
+        # The user may have registered while the query was in flight.
+        unknown_user_cache.set(telegram_id, True)
+    return user
 
 
 async def delete_user_with_data(session: AsyncSession, user_id: int) -> None:
+    # The caller invalidates the cached user once the transaction has committed; until
+    # then a concurrent lookup would still read (and re-cache) the committed row.
     await session.execute(delete(Meal).where(Meal.user_id == user_id))
     await session.execute(delete(WaterIntake).where(WaterIntake.user_id == user_id))
     await session.execute(delete(WeightLog).where(WeightLog.user_id == user_id))
     await session.execute(delete(ConversationMessage).where(ConversationMessage.user_id == user_id))
+    await session.execute(delete(ConversationSummary).where(ConversationSummary.user_id == user_id))
+    await session.execute(delete(ConversationArchive).where(ConversationArchive.user_id == user_id))
     await session.execute(delete(Recipe).where(Recipe.user_id == user_id))
+    # Bumps the user's data version on commit, so cached /stats ranges are not served again.
+    await delete_summaries(session, user_id)
+    await session.execute(delete(PhotoEstimateCacheEntry).where(PhotoEstimateCacheEntry.user_id == user_id))
     await session.execute(delete(User).where(User.id == user_id))
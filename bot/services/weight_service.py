@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import User, WeightLog
+from .day_boundaries import current_day
+from .summary_service import record_weight
+from .user_service import invalidate_user
 
 
 async def log_weight(session: AsyncSession, user: User, weight: float) -> tuple[WeightLog, WeightLog | None]:
@@ -15,8 +18,11 @@ async def log_weight(session: AsyncSession, user: User, weight: float) -> tuple[
 
     new_log = WeightLog(user_id=user.id, weight_kg=weight)
     session.add(new_log)
-    user.current_weight_kg = weight
+    # `user` usually comes detached from the middleware cache, so persist explicitly.
+    await session.execute(update(User).where(User.id == user.id).values(current_weight_kg=weight))
+    await record_weight(session, user.id, weight, day=current_day(user.timezone).local_date)
 
     await session.commit()
     await session.refresh(new_log)
+    invalidate_user(user.telegram_id)
     return new_log, last_log
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import set as set_type
 
 
 @dataclass
@@ -10,14 +9,198 @@ class Limits:
     max_recipe_body: int = 5000
     max_meal_text: int = 2000
     max_photo_size_bytes: int = 5 * 1024 * 1024
-    allowed_photo_mime: set_type[str] = field(
+    allowed_photo_mime: set[str] = field(
         default_factory=lambda: {"image/jpeg", "image/png", "image/webp"}
     )
 
 
+@dataclass
+class PhotoProcessing:
+    # Smallest Telegram PhotoSize whose longer edge reaches this is downloaded.
+    min_edge_px: int = 768
+    max_edge_px: int = 1024
+    jpeg_quality: int = 80
+
+
+@dataclass
+class CacheSettings:
+    user_cache_size: int = 10_000
+    user_cache_ttl_seconds: float = 300.0
+    unknown_user_cache_size: int = 50_000
+    unknown_user_ttl_seconds: float = 60.0
+
+
+@dataclass
+class EstimateCacheSettings:
+    memory_size: int = 5_000
+    memory_ttl_seconds: float = 3600.0
+    ttl_days: int = 30
+    max_rows: int = 50_000
+    evict_every_writes: int = 200
+    # gpt-4o-mini list prices, used only for the "cost saved" metric.
+    input_usd_per_1m_tokens: float = 0.15
+    output_usd_per_1m_tokens: float = 0.60
+
+
+@dataclass
+class PhotoCacheSettings:
+    memory_size: int = 5_000
+    memory_ttl_seconds: float = 3600.0
+    # Perceptual hashes kept in memory for the Hamming-distance lookup, which only
+    # matches a user's own photos: up to this many per user, for this many users.
+    hash_index_per_user: int = 200
+    hash_index_users: int = 2_000
+    max_hamming_distance: int = 6
+    ttl_days: int = 30
+    max_rows: int = 50_000
+    evict_every_writes: int = 200
+
+
+@dataclass
+class LlmLimits:
+    # Keep below the account's OpenAI limits so bursts queue here instead of hitting 429s.
+    max_concurrency: int = 8
+    per_user_concurrency: int = 2
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 200_000
+    max_wait_seconds: float = 30.0
+    # Rough prompt size of one downscaled meal photo, for the TPM budget.
+    photo_prompt_tokens: int = 1_000
+
+
+@dataclass
+class EstimateBatching:
+    # Off by default: batching trades up to max_wait_ms of latency for fewer requests.
+    enabled: bool = False
+    max_wait_ms: float = 150.0
+    max_items: int = 8
+
+
+@dataclass
+class AskStreaming:
+    enabled: bool = True
+    # Telegram throttles frequent edits of one message; about one per second is safe.
+    edit_interval_seconds: float = 1.0
+
+
+@dataclass
+class DialogMemory:
+    # Token counts are estimated locally (~4 characters per token), see conversation_memory.
+    max_recent_messages: int = 10
+    prompt_dialog_tokens: int = 600  # summary + verbatim turns in one /ask prompt
+    compact_after_tokens: int = 800  # unsummarized history that triggers a compaction
+    keep_recent_messages: int = 4  # left verbatim when older turns are summarized
+    max_compact_messages: int = 60
+    summary_max_tokens: int = 250
+
+
+@dataclass
+class HistoryRetention:
+    enabled: bool = True
+    # Messages older than keep_days, or beyond the newest keep_messages, leave the hot table.
+    keep_days: int = 30
+    keep_messages: int = 200
+    # Archive in chunks of at least min_chunk messages so archives compress well.
+    min_chunk: int = 50
+    max_chunk: int = 500
+    interval_seconds: float = 3600.0
+    users_per_batch: int = 200
+
+
+@dataclass
+class FsmStorageSettings:
+    # Changed states are written in one batch at most this often (write-behind).
+    flush_interval_ms: float = 300.0
+    max_batch: int = 500
+    # In-memory entries unused for this long are dropped; the database copy stays.
+    idle_seconds: float = 900.0
+    # Flows abandoned for this long are deleted from the database.
+    expire_after_days: int = 14
+    expire_check_seconds: float = 3600.0
+
+
+@dataclass
+class FloodControlSettings:
+    enabled: bool = True
+    # Per-user bucket: sustained cost units per second and how much can be spent at once.
+    user_rate_per_second: float = 0.5
+    user_burst: float = 10.0
+    # Shared by all users; when it runs dry, updates wait up to max_delay_seconds.
+    global_rate_per_second: float = 100.0
+    global_burst: float = 200.0
+    max_delay_seconds: float = 3.0
+    # The "slow down" reply is sent at most once per window per user.
+    warn_window_seconds: float = 30.0
+    idle_seconds: float = 300.0
+    # Cost by command, menu action or content type; anything else costs 1.
+    costs: dict[str, float] = field(
+        default_factory=lambda: {
+            "water": 0.5,
+            "menu_water": 0.5,
+            "stats": 2.0,
+            "menu_stats": 2.0,
+            "export_history": 5.0,
+            "photo": 4.0,
+            "ask": 2.0,
+            "menu_ask_dietitian": 2.0,
+        }
+    )
+    # Messages answered inside these StatesGroups (text that goes to the LLM).
+    state_costs: dict[str, float] = field(default_factory=lambda: {"AskDialog": 4.0, "MealLog": 2.0})
+
+
+@dataclass
+class OutboundTuning:
+    enabled: bool = True
+    # Telegram: ~30 messages/s per bot, ~1/s per chat with short bursts allowed.
+    global_per_second: float = 30.0
+    global_burst: float = 30.0
+    chat_per_second: float = 1.0
+    chat_burst: float = 3.0
+    max_retries: int = 3
+    # Per-chat buckets idle this long (long enough to refill) are dropped.
+    idle_seconds: float = 60.0
+    # Treat a RetryAfter in one chat as a bot-wide flood ban.
+    pause_all_on_retry: bool = False
+    # Send plain texts queued for the same chat at the same time as one message.
+    merge_texts: bool = False
+    merge_separator: str = "\n\n"
+
+
+@dataclass
+class WebhookTuning:
+    # setWebhook max_connections: how many requests Telegram keeps open to us at once.
+    max_connections: int = 40
+    # On shutdown, updates already accepted get this long to finish.
+    drain_timeout_seconds: float = 25.0
+
+
+@dataclass
+class SqliteTuning:
+    read_pool_size: int = 4
+    writer_queue_timeout_seconds: float = 30.0
+    busy_timeout_ms: int = 5000
+    mmap_size_bytes: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+
+
 @dataclass
 class AppSettings:
     limits: Limits = field(default_factory=Limits)
+    photo: PhotoProcessing = field(default_factory=PhotoProcessing)
+    cache: CacheSettings = field(default_factory=CacheSettings)
+    sqlite: SqliteTuning = field(default_factory=SqliteTuning)
+    estimate_cache: EstimateCacheSettings = field(default_factory=EstimateCacheSettings)
+    photo_cache: PhotoCacheSettings = field(default_factory=PhotoCacheSettings)
+    llm: LlmLimits = field(default_factory=LlmLimits)
+    estimate_batching: EstimateBatching = field(default_factory=EstimateBatching)
+    ask_streaming: AskStreaming = field(default_factory=AskStreaming)
+    dialog_memory: DialogMemory = field(default_factory=DialogMemory)
+    history_retention: HistoryRetention = field(default_factory=HistoryRetention)
+    webhook: WebhookTuning = field(default_factory=WebhookTuning)
+    fsm_storage: FsmStorageSettings = field(default_factory=FsmStorageSettings)
+    flood_control: FloodControlSettings = field(default_factory=FloodControlSettings)
+    outbound: OutboundTuning = field(default_factory=OutboundTuning)
 
 
 settings = AppSettings()
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from .config import Settings
+from .settings import WebhookTuning, settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    aiogram's webhook handler with a cap on updates processed at once and a graceful
+    drain. Updates are acknowledged as soon as they are accepted and handled in the
+    background. At the cap, the request waits for a free slot before it is acknowledged,
+    which pushes back on Telegram, since it never has more than ``max_connections``
+    requests open.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str | None,
+        max_in_flight: int,
+        tuning: WebhookTuning | None = None,
+        **data: Any,
+    ) -> None:
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.tuning = tuning or settings.webhook
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._draining = False
+        self.in_flight = 0
+        self.max_in_flight_seen = 0
+        self.handled = 0
+        self.failed = 0
+        self.refused = 0
+
+    def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+        # Drain before the base class closes the bot session on shutdown.
+        app.on_shutdown.append(self._drain_on_shutdown)
+        super().register(app, path=path, **kwargs)
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        await self._slots.acquire()
+        if self._draining:
+            # Not acknowledged, so Telegram delivers it again once we are back.
+            self._slots.release()
+            self.refused += 1
+            return web.Response(status=503)
+        self.in_flight += 1
+        self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+        task = asyncio.create_task(self._feed(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed(self, bot: Bot, update: dict[str, Any]) -> None:
+        try:
+            await self._background_feed_update(bot=bot, update=update)
+            self.handled += 1
+        except Exception:  # noqa: BLE001
+            self.failed += 1
+            logger.exception("Webhook update failed")
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def drain(self, timeout: float | None = None) -> None:
+        """Refuse new updates and wait up to ``timeout`` for the accepted ones."""
+
+        self._draining = True
+        pending = set(self._background_feed_update_tasks)
+        if not pending:
+            return
+        logger.info("Draining %s in-flight updates", len(pending))
+        _, still_running = await asyncio.wait(pending, timeout=timeout or self.tuning.drain_timeout_seconds)
+        for task in still_running:
+            task.cancel()
+        if still_running:
+            logger.warning("Cancelled %s updates still running after the drain timeout", len(still_running))
+
+    async def _drain_on_shutdown(self, app: web.Application) -> None:
+        await self.drain()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight_seen,
+            "handled": self.handled,
+            "failed": self.failed,
+            "refused_while_draining": self.refused,
+        }
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, config: Settings) -> tuple[web.Application, BoundedRequestHandler]:
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dp, bot, secret_token=config.webhook_secret, max_in_flight=config.webhook_max_in_flight
+    )
+    handler.register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app, handler
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: Settings) -> None:
+    """Serve the webhook until SIGINT/SIGTERM, then drain accepted updates and stop."""
+
+    app, handler = create_webhook_app(dp, bot, config)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, config.webhook_host, config.webhook_port).start()
+    logger.info("Webhook server listening on %s:%s%s", config.webhook_host, config.webhook_port, config.webhook_path)
+
+    if config.webhook_url:
+        await bot.set_webhook(
+            url=config.webhook_url.rstrip("/") + config.webhook_path,
+            secret_token=config.webhook_secret,
+            max_connections=settings.webhook.max_connections,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # pragma: no cover - Windows
+            pass
+    try:
+        await stop.wait()
+    finally:
+        # Stops listening first, then on_shutdown drains and closes the bot session.
+        await runner.cleanup()
+        logger.info("Webhook stats: %s", handler.stats())